@@ -0,0 +1,166 @@
+from collections import OrderedDict
+from starlette.responses import JSONResponse
+from typing import NamedTuple, Optional
+from database import env_bool
+from auth import cached_user
+from metrics import ADMISSION_REJECTED, ADMISSION_QUEUED
+import asyncio
+import math
+import os
+import time
+
+# Admission control: requests are rate limited per user (or per client IP for
+# anonymous callers) with token buckets, then admitted into a bounded number of
+# in-flight slots. Excess load is answered at once with 429 or 503 and a
+# Retry-After instead of queueing behind the threadpool and database pool.
+#
+# Buckets and slots live in each worker process's memory, with no shared store
+# to consult on every request. The in-flight cap and queue protect the server
+# as a whole, so each worker takes its share of them: divided by WEB_CONCURRENCY
+# (serve.py passes the worker count on). Per-user and per-IP buckets keep their
+# full configured size in every worker, because a keep-alive or HTTP/2 client
+# stays on one worker and must get its whole quota there; a client spreading
+# requests over several connections can reach up to N times its rate.
+ADMISSION_CONTROL = env_bool("ADMISSION_CONTROL", "true")
+ADMISSION_WORKERS = max(1, int(os.getenv("WEB_CONCURRENCY") or "1"))
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "64"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))  # requests waiting for a slot before 503s start
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2"))  # seconds waiting for a slot
+ADMISSION_MAX_KEYS = int(os.getenv("ADMISSION_MAX_KEYS", "10000"))  # buckets kept per limit, least recently used go first
+
+# First path segment -> route group. Anything not listed is CRUD; health,
+# metrics and the docs are never limited.
+ROUTE_GROUPS = {"ai": "ai", "workspaces": "marketplace", "widgets": "marketplace", "blobs": "marketplace"}
+EXEMPT_PATHS = {"", "health", "metrics", "docs", "redoc", "openapi.json"}
+
+class TokenBuckets:
+    """Token buckets by key: rate tokens per second, holding up to burst."""
+
+    def __init__(self, rate: float, burst: float, maxsize: int = ADMISSION_MAX_KEYS):
+        self.rate = rate
+        self.burst = burst
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+
+    def take(self, key: str) -> float:
+        """Spend a token for key. Returns 0 when allowed, else seconds until one is available."""
+        if self.rate <= 0:
+            # Unlimited
+            return 0.0
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        # A forgotten key comes back with a full bucket, so only idle ones are evicted in practice
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+        return wait
+
+class GroupLimits(NamedTuple):
+    user: TokenBuckets
+    ip: TokenBuckets  # callers with no known identity
+
+def _group_limits(group: str, user_rate: str, user_burst: str, ip_rate: str, ip_burst: str) -> GroupLimits:
+    # e.g. RATE_LIMIT_CRUD_USER_RATE=20 (requests per second), RATE_LIMIT_CRUD_USER_BURST=40; a rate of 0 disables
+    prefix = f"RATE_LIMIT_{group.upper()}_"
+    return GroupLimits(
+        user=TokenBuckets(float(os.getenv(prefix + "USER_RATE", user_rate)), float(os.getenv(prefix + "USER_BURST", user_burst))),
+        ip=TokenBuckets(float(os.getenv(prefix + "IP_RATE", ip_rate)), float(os.getenv(prefix + "IP_BURST", ip_burst))),
+    )
+
+LIMITS = {
+    "crud": _group_limits("crud", "20", "40", "20", "40"),
+    "marketplace": _group_limits("marketplace", "10", "20", "10", "20"),
+    # Generations are expensive and already capped by llm.limiter; this keeps one user from filling its queue
+    "ai": _group_limits("ai", "0.5", "5", "0.2", "2"),
+}
+
+class InFlightLimiter:
+    """Caps concurrently handled requests; a bounded number wait briefly for a slot."""
+
+    def __init__(self, limit: int = ADMISSION_MAX_IN_FLIGHT, max_queue: int = ADMISSION_MAX_QUEUE, timeout: float = ADMISSION_QUEUE_TIMEOUT):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def acquire(self) -> bool:
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            return False
+        self.waiting += 1
+        ADMISSION_QUEUED.inc()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiting -= 1
+            ADMISSION_QUEUED.dec()
+
+    def release(self):
+        self._semaphore.release()
+
+# This worker's share of the server-wide slots, at least one
+in_flight = InFlightLimiter(
+    limit=max(1, math.ceil(ADMISSION_MAX_IN_FLIGHT / ADMISSION_WORKERS)),
+    max_queue=math.ceil(ADMISSION_MAX_QUEUE / ADMISSION_WORKERS),
+)
+
+def route_group(path: str) -> Optional[str]:
+    segment = path.lstrip("/").split("/", 1)[0]
+    if segment in EXEMPT_PATHS:
+        return None
+    return ROUTE_GROUPS.get(segment, "crud")
+
+def _bearer_token(scope) -> Optional[str]:
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            return token.strip() if scheme.lower() == "bearer" else None
+    return None
+
+def _rejection(status: int, detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse({"detail": detail}, status_code=status, headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware applying the rate limits and the in-flight cap."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        group = route_group(scope["path"]) if scope["type"] == "http" and ADMISSION_CONTROL else None
+        if group is None:
+            await self.app(scope, receive, send)
+            return
+
+        # Identity comes from the verified-token cache, so this costs no signature check;
+        # a token seen for the first time is limited by IP until get_current_user verifies it
+        limits = LIMITS[group]
+        user = cached_user(_bearer_token(scope))
+        if user is not None:
+            reason, wait = "user", limits.user.take(user["user_id"])
+        else:
+            client = scope.get("client")
+            reason, wait = "ip", limits.ip.take(client[0] if client else "unknown")
+        if wait:
+            ADMISSION_REJECTED.inc(group, reason)
+            await _rejection(429, "Too many requests, slow down", wait)(scope, receive, send)
+            return
+
+        if not await in_flight.acquire():
+            ADMISSION_REJECTED.inc(group, "overload")
+            await _rejection(503, "Server is busy, try again shortly", in_flight.timeout)(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            in_flight.release()
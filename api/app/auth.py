@@ -1,37 +1,171 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt
+from starlette.concurrency import run_in_threadpool
+from jose import jwt, jwk
+from collections import OrderedDict
+import asyncio
+import hashlib
 import os
+import time
 import requests
 from typing import Optional
 from dotenv import load_dotenv
+from metrics import JWKS_FETCH_LATENCY, JWKS_FETCH_FAILURES
 
 load_dotenv()
 
 # Supabase Configuration
 SUPABASE_URL = os.getenv("SUPABASE_URL")
-JWKS_URL = f"{SUPABASE_URL}/auth/v1/.well-known/jwks.json" if SUPABASE_URL else None
+# SUPABASE_JWKS_URL lets us point at a local stand-in JWKS server
+JWKS_URL = os.getenv("SUPABASE_JWKS_URL") or (f"{SUPABASE_URL}/auth/v1/.well-known/jwks.json" if SUPABASE_URL else None)
 
 # Algorithms
 ALGORITHM = "RS256"
 
+# Cache tuning
+JWKS_CACHE_TTL = int(os.getenv("JWKS_CACHE_TTL", "3600"))  # seconds before keys are refetched
+JWKS_MIN_REFRESH_INTERVAL = int(os.getenv("JWKS_MIN_REFRESH_INTERVAL", "30"))  # throttle refetches on unknown kid
+JWKS_FETCH_TIMEOUT = float(os.getenv("JWKS_FETCH_TIMEOUT", "5"))
+JWKS_FAILURE_BACKOFF = int(os.getenv("JWKS_FAILURE_BACKOFF", "30"))  # seconds before retrying a failed fetch
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "1024"))
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
 
 def get_jwks():
     if not JWKS_URL:
         return None
+    start = time.perf_counter()
     try:
-        response = requests.get(JWKS_URL)
+        response = requests.get(JWKS_URL, timeout=JWKS_FETCH_TIMEOUT)
         response.raise_for_status()
         return response.json()
     except Exception as e:
         print(f"Error fetching JWKS: {e}")
+        JWKS_FETCH_FAILURES.inc()
         return None
+    finally:
+        JWKS_FETCH_LATENCY.observe(time.perf_counter() - start)
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
+class JWKSCache:
+    """Public keys by kid, refetched after the TTL or when an unknown kid shows up."""
+
+    def __init__(self, ttl: int = JWKS_CACHE_TTL, min_refresh_interval: int = JWKS_MIN_REFRESH_INTERVAL,
+                 failure_backoff: int = JWKS_FAILURE_BACKOFF):
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.failure_backoff = failure_backoff
+        self._keys = {}
+        self._fetched_at = 0.0
+        self._failed_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self._keys)
+
+    def _is_fresh(self) -> bool:
+        return bool(self._keys) and time.monotonic() - self._fetched_at < self.ttl
+
+    def _backing_off(self) -> bool:
+        return self._failed_at is not None and time.monotonic() - self._failed_at < self.failure_backoff
+
+    def _cached(self, kid: str) -> bool:
+        # While Supabase is unreachable the stale keys keep working, and nobody waits on another fetch
+        return (kid in self._keys and self._is_fresh()) or self._backing_off()
+
+    async def get_key(self, kid: str):
+        if self._cached(kid):
+            return self._keys.get(kid)
+
+        async with self._lock:
+            # Another request may have refreshed (or failed to) while we waited on the lock
+            if self._cached(kid):
+                return self._keys.get(kid)
+
+            # Don't let a stream of bogus kids turn into a stream of fetches
+            if self._is_fresh() and time.monotonic() - self._fetched_at < self.min_refresh_interval:
+                return None
+
+            await self.refresh()
+            return self._keys.get(kid)
+
+    async def refresh(self):
+        # requests is blocking, keep it off the event loop
+        jwks = await run_in_threadpool(get_jwks)
+        if not jwks:
+            # Keep serving the keys we already have if Supabase is unreachable
+            self._failed_at = time.monotonic()
+            return
+
+        keys = {}
+        for k in jwks.get("keys", []):
+            if "kid" not in k:
+                continue
+            try:
+                keys[k["kid"]] = jwk.construct(k, k.get("alg", ALGORITHM))
+            except Exception as e:
+                print(f"Skipping unusable JWKS key {k.get('kid')}: {e}")
+        self._keys = keys
+        self._fetched_at = time.monotonic()
+        self._failed_at = None
+
+    def clear(self):
+        self._keys = {}
+        self._fetched_at = 0.0
+        self._failed_at = None
+
+class TokenCache:
+    """Bounded LRU of verified token claims, entries expire with the token's exp."""
+
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        user, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return user
+
+    def set(self, token: str, user: dict, expires_at: Optional[float]):
+        # Tokens without an exp are never cached
+        if self.maxsize <= 0 or not expires_at or expires_at <= time.time():
+            return
+        key = self._key(token)
+        self._entries[key] = (user, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+jwks_cache = JWKSCache()
+token_cache = TokenCache()
+
+def _is_mock_mode() -> bool:
     # Mock user for development if no Supabase URL is set
-    is_mock_mode = not SUPABASE_URL or "supabase.co" not in SUPABASE_URL
-    
+    return not SUPABASE_URL or "supabase.co" not in SUPABASE_URL
+
+def cached_user(token: Optional[str]) -> Optional[dict]:
+    """The user get_current_user returns for token when that is known without verifying anything."""
+    if not token:
+        return {"user_id": "mock-user-123", "email": "mock@example.com"} if _is_mock_mode() else None
+    return token_cache.get(token)
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    is_mock_mode = _is_mock_mode()
+
     if is_mock_mode and not token:
         return {"user_id": "mock-user-123", "email": "mock@example.com"}
 
@@ -40,50 +174,52 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
+
     if not token:
         raise credentials_exception
 
-    try:
-        # Fetch public keys from Supabase
-        jwks = get_jwks()
-        if not jwks:
-            # Fallback for dev if JWKS fails but we want things to work
-            if is_mock_mode:
-                return {"user_id": "mock-user-123", "email": "mock@example.com"}
-            raise HTTPException(status_code=500, detail="Could not fetch auth keys from Supabase")
+    cached_user = token_cache.get(token)
+    if cached_user is not None:
+        return cached_user
 
+    try:
         # Decode without verification first to get the key ID (kid)
         headers = jwt.get_unverified_header(token)
         kid = headers.get("kid")
         if not kid:
             raise credentials_exception
 
-        # Find the matching key in JWKS
-        key = next((k for k in jwks["keys"] if k["kid"] == kid), None)
-        if not key:
+        # Find the matching key, fetching public keys from Supabase only when needed
+        key = await jwks_cache.get_key(kid)
+        if key is None:
+            if not jwks_cache.loaded:
+                # Fallback for dev if JWKS fails but we want things to work
+                if is_mock_mode:
+                    return {"user_id": "mock-user-123", "email": "mock@example.com"}
+                raise HTTPException(status_code=500, detail="Could not fetch auth keys from Supabase")
             raise credentials_exception
 
         # Decode and verify using the public key
         payload = jwt.decode(
-            token, 
-            key, 
-            algorithms=[ALGORITHM], 
+            token,
+            key,
+            algorithms=[ALGORITHM],
             options={"verify_aud": False}
         )
-        
+
         user_id: str = payload.get("sub")
         email: str = payload.get("email")
-        
+
         if user_id is None:
             raise credentials_exception
-            
-        return {"user_id": user_id, "email": email}
-        
+
+        user = {"user_id": user_id, "email": email}
+        token_cache.set(token, user, payload.get("exp"))
+        return user
+
     except Exception as e:
         print(f"Auth error: {e}")
         # Fallback to mock user if we are in dev/mock mode
         if is_mock_mode:
              return {"user_id": "mock-user-123", "email": "mock@example.com"}
         raise credentials_exception
-
@@ -0,0 +1,123 @@
+from fastapi import Request, Response
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session, select
+from typing import Dict, Iterable, Optional, Tuple
+from models import ContentBlob
+from cache import TTLCache
+from datetime import datetime
+from versions import etag_matches
+import gzip
+import hashlib
+import json
+import os
+
+try:
+    import brotli
+except ImportError:  # Optional; without it clients get gzip
+    brotli = None
+
+# Payloads never change once stored, so decoded copies are only bounded by count
+BLOB_CACHE_SIZE = int(os.getenv("BLOB_CACHE_SIZE", "1024"))
+BLOB_CACHE_TTL = int(os.getenv("BLOB_CACHE_TTL", "86400"))
+
+def normalize_json(text: str) -> str:
+    """Canonical form of a JSON document, so equal content hashes equally. Raises ValueError."""
+    return json.dumps(json.loads(text), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+def blob_row(text: str) -> dict:
+    raw = text.encode()
+    # mtime=0 keeps the compressed bytes a pure function of the content
+    return {
+        "hash": hashlib.sha256(raw).hexdigest(),
+        "size": len(raw),
+        "data": gzip.compress(raw, compresslevel=9, mtime=0),
+        "created_at": datetime.utcnow(),
+    }
+
+def insert_blob(session: Session, row: dict):
+    connection = session.connection()
+    dialect_insert = postgresql.insert if connection.dialect.name == "postgresql" else sqlite.insert
+    # The same template shared twice, even concurrently, keeps one row
+    connection.execute(dialect_insert(ContentBlob).values(row).on_conflict_do_nothing(index_elements=["hash"]))
+
+def store_blob(session: Session, text: str) -> Tuple[str, str]:
+    """Store normalized JSON once and return (hash, normalized text). Raises ValueError on invalid JSON."""
+    normalized = normalize_json(text)
+    row = blob_row(normalized)
+    insert_blob(session, row)
+    return row["hash"], normalized
+
+class Payload:
+    """One stored blob, decoded, with its compressed encodings ready to send."""
+
+    def __init__(self, blob_hash: str, gzipped: bytes):
+        self.hash = blob_hash
+        self.gzip = gzipped
+        self.raw = gzip.decompress(gzipped)
+        self._br: Optional[bytes] = None
+
+    @property
+    def text(self) -> str:
+        return self.raw.decode()
+
+    @property
+    def br(self) -> Optional[bytes]:
+        if self._br is None and brotli is not None:
+            self._br = brotli.compress(self.raw, quality=11)
+        return self._br
+
+payload_cache = TTLCache(ttl=BLOB_CACHE_TTL, maxsize=BLOB_CACHE_SIZE)
+
+def load_payloads(session: Session, hashes: Iterable[str]) -> Dict[str, Payload]:
+    """Payloads by hash, from memory where possible and one query for the rest."""
+    found = {}
+    missing = []
+    for blob_hash in set(hashes):
+        payload = payload_cache.get(blob_hash)
+        if payload is None:
+            missing.append(blob_hash)
+        else:
+            found[blob_hash] = payload
+    if missing:
+        for blob_hash, data in session.exec(select(ContentBlob.hash, ContentBlob.data).where(ContentBlob.hash.in_(missing))):
+            found[blob_hash] = Payload(blob_hash, data)
+            payload_cache.set(blob_hash, found[blob_hash])
+    return found
+
+def load_payload(session: Session, blob_hash: str) -> Optional[Payload]:
+    return load_payloads(session, [blob_hash]).get(blob_hash)
+
+def _accepted(accept_encoding: str) -> set:
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, *params = part.split(";")
+        q = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        # q=0 means "not this one"
+        if q > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+def payload_response(request: Request, payload: Payload) -> Response:
+    """Serve the stored bytes in the best encoding the client takes, with a strong ETag per encoding."""
+    accepted = _accepted(request.headers.get("accept-encoding", ""))
+    encoding, body = "identity", payload.raw
+    if ("br" in accepted or "*" in accepted) and payload.br is not None:
+        encoding, body = "br", payload.br
+    elif "gzip" in accepted or "*" in accepted:
+        encoding, body = "gzip", payload.gzip
+
+    etag = f'"{payload.hash}"' if encoding == "identity" else f'"{payload.hash}-{encoding}"'
+    # Addressed by content hash, so a URL's bytes can never change
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable", "Vary": "Accept-Encoding"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
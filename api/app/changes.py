@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+from sqlalchemy import delete, event, insert
+from sqlmodel import Session, select
+from typing import Iterable, List, Optional
+from models import Client, Invoice, Note, InvoiceItem, ChangeLog
+import os
+
+# Days of change log kept by prune_changelog; sync tokens older than this get a 410
+CHANGELOG_RETENTION_DAYS = int(os.getenv("CHANGELOG_RETENTION_DAYS", "30"))
+
+# Models whose writes are recorded in the change log, with their name in /sync/changes
+TRACKED_MODELS = {
+    Client: "clients",
+    Invoice: "invoices",
+    InvoiceItem: "invoice_items",
+    Note: "notes",
+}
+
+def log_changes(session: Session, model, ids: Iterable[int], user_id: str, deleted: bool = False):
+    """Record changes made outside the ORM unit of work (bulk inserts, set-based deletes)."""
+    now = datetime.utcnow()
+    rows = [
+        {"user_id": user_id, "resource": TRACKED_MODELS[model], "resource_id": row_id, "deleted": deleted, "changed_at": now}
+        for row_id in ids
+    ]
+    if rows:
+        session.connection().execute(insert(ChangeLog), rows)
+
+def prune_changelog(session: Session, days: int = CHANGELOG_RETENTION_DAYS) -> int:
+    """Delete change log entries older than the retention period. Returns how many went."""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    deleted = session.connection().execute(delete(ChangeLog).where(ChangeLog.changed_at < cutoff)).rowcount
+    session.commit()
+    return deleted
+
+def item_owners(session: Session, items: list) -> dict:
+    # InvoiceItem has no user_id of its own, it belongs to whoever owns the invoice
+    invoice_ids = {item.invoice_id for item in items}
+    if not invoice_ids:
+        return {}
+    statement = select(Invoice.id, Invoice.user_id).where(Invoice.id.in_(invoice_ids))
+    return dict(session.connection().execute(statement).all())
+
+@event.listens_for(Session, "before_flush")
+def _touch_updated_at(session, flush_context, instances):
+    now = datetime.utcnow()
+    for obj in session.dirty:
+        if type(obj) in TRACKED_MODELS and session.is_modified(obj, include_collections=False):
+            obj.updated_at = now
+
+@event.listens_for(Session, "after_flush")
+def _record_flushed_changes(session, flush_context):
+    changed = []
+    for obj in session.new:
+        if type(obj) in TRACKED_MODELS:
+            changed.append((obj, False))
+    for obj in session.dirty:
+        if type(obj) in TRACKED_MODELS and session.is_modified(obj, include_collections=False):
+            changed.append((obj, False))
+    for obj in session.deleted:
+        if type(obj) in TRACKED_MODELS:
+            changed.append((obj, True))
+    if not changed:
+        return
+
+    owners = item_owners(session, [obj for obj, _ in changed if isinstance(obj, InvoiceItem)])
+    now = datetime.utcnow()
+    rows = []
+    for obj, deleted in changed:
+        user_id = owners.get(obj.invoice_id) if isinstance(obj, InvoiceItem) else obj.user_id
+        if user_id is None:
+            continue
+        rows.append({"user_id": user_id, "resource": TRACKED_MODELS[type(obj)], "resource_id": obj.id, "deleted": deleted, "changed_at": now})
+    if rows:
+        session.connection().execute(insert(ChangeLog), rows)
+
+def owned_by(statement, model, user_id: str):
+    """Restrict a select over a tracked model to one user's rows."""
+    if model is InvoiceItem:
+        return statement.join(Invoice, InvoiceItem.invoice_id == Invoice.id).where(Invoice.user_id == user_id)
+    return statement.where(model.user_id == user_id)
+
+def read_rows(session: Session, model, user_id: str, ids: Optional[List[int]] = None) -> list:
+    """Current rows of a tracked model for a user, optionally restricted to ids."""
+    statement = owned_by(select(model), model, user_id)
+    if ids is not None:
+        if not ids:
+            return []
+        statement = statement.where(model.id.in_(ids))
+    return session.exec(statement.order_by(model.id)).all()
@@ -0,0 +1,165 @@
+from fastapi import HTTPException, Response
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import delete, insert
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+from typing import List, Optional
+from models import BatchCreateResult, Client, Invoice, InvoiceItem, InvoiceSummary, Note
+from changes import log_changes
+from summaries import record_bulk_invoices
+from search import index_bulk, unindex_bulk
+from versions import bump_versions
+from replicas import record_writers
+from database import env_bool
+from jobs import job_handler
+import base64
+import json
+import os
+
+# Upper bound on rows accepted by a single /batch request
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+
+def _existing_ids(session: Session, model, user_id: str, keys: List[str]) -> dict:
+    if not keys:
+        return {}
+    statement = select(model.idempotency_key, model.id).where(
+        model.user_id == user_id,
+        model.idempotency_key.in_(keys),
+    )
+    return dict(session.exec(statement).all())
+
+def _row(model, item, user_id: str) -> dict:
+    # Items are already validated by their Create schema. Building the insert
+    # parameters directly skips constructing a table model instance per row,
+    # which dominates the cost of large batches and imports.
+    row = item.model_dump()
+    row["user_id"] = user_id
+    for name, field in model.model_fields.items():
+        if name not in row and name != "id" and field.default_factory is not None:
+            row[name] = field.default_factory()
+    return row
+
+def bulk_create(session: Session, model, items: list, user_id: str) -> BatchCreateResult:
+    """Insert items for a user in one transaction, returning ids in input order.
+
+    Items whose idempotency_key was already stored (by an earlier replay of the
+    same batch) are not inserted again; their existing id is returned instead.
+    """
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_MAX_ITEMS} items")
+
+    keys = list({item.idempotency_key for item in items if item.idempotency_key})
+
+    # A concurrent replay can insert the same keys between our lookup and insert,
+    # in which case the unique constraint fires and one more pass picks them up
+    for attempt in range(2):
+        key_ids = _existing_ids(session, model, user_id, keys)
+
+        # For each item, either an id we already have or the index of the row to insert
+        plan = []
+        pending = {}
+        rows = []
+        for item in items:
+            key = item.idempotency_key
+            if key in key_ids:
+                plan.append((key_ids[key], None))
+            elif key in pending:
+                # Repeated key within the batch resolves to its first occurrence
+                plan.append((None, pending[key]))
+            else:
+                if key:
+                    pending[key] = len(rows)
+                plan.append((None, len(rows)))
+                rows.append(_row(model, item, user_id))
+
+        try:
+            new_ids = []
+            if rows:
+                statement = insert(model).returning(model.id, sort_by_parameter_order=True)
+                new_ids = session.execute(statement, rows).scalars().all()
+                log_changes(session, model, new_ids, user_id)
+                if model is Invoice:
+                    record_bulk_invoices(session, rows)
+                index_bulk(session, model, new_ids, rows)
+                bump_versions(session, model, [user_id])
+                record_writers(session, [user_id])
+            session.commit()
+            break
+        except IntegrityError:
+            session.rollback()
+            if attempt:
+                raise
+
+    ids = [existing_id if row_index is None else new_ids[row_index] for existing_id, row_index in plan]
+    return BatchCreateResult(ids=ids, created=len(rows))
+
+@job_handler("delete_clients")
+def delete_clients(session: Session, user_id: str, client_ids: List[int]) -> dict:
+    """Delete clients with their invoices, line items and notes, one statement per table.
+
+    Runs as a background job; the caller commits. Returns counts per resource.
+    """
+    client_ids = session.exec(select(Client.id).where(Client.id.in_(client_ids), Client.user_id == user_id)).all()
+    if not client_ids:
+        raise HTTPException(status_code=404, detail="Client not found")
+
+    invoices = select(Invoice.id).where(Invoice.client_id.in_(client_ids))
+    invoice_ids = session.exec(invoices).all()
+    item_ids = session.exec(select(InvoiceItem.id).where(InvoiceItem.invoice_id.in_(invoices))).all()
+    note_ids = session.exec(select(Note.id).where(Note.client_id.in_(client_ids))).all()
+
+    # Core statements skip the ORM hooks, so the derived state is kept here instead
+    connection = session.connection()
+    connection.execute(delete(InvoiceItem).where(InvoiceItem.invoice_id.in_(invoices)))
+    connection.execute(delete(Invoice).where(Invoice.client_id.in_(client_ids)))
+    connection.execute(delete(Note).where(Note.client_id.in_(client_ids)))
+    connection.execute(delete(InvoiceSummary).where(InvoiceSummary.user_id == user_id, InvoiceSummary.client_id.in_(client_ids)))
+    connection.execute(delete(Client).where(Client.id.in_(client_ids)))
+
+    deleted = {Client: client_ids, Invoice: invoice_ids, InvoiceItem: item_ids, Note: note_ids}
+    for model, ids in deleted.items():
+        log_changes(session, model, ids, user_id, deleted=True)
+        unindex_bulk(session, model, ids)
+        if ids:
+            bump_versions(session, model, [user_id])
+    record_writers(session, [user_id])
+    return {"clients": len(client_ids), "invoices": len(invoice_ids), "invoice_items": len(item_ids), "notes": len(note_ids)}
+
+# Keyset pagination. List endpoints walk (user_id, id) in id order, so page N
+# costs an index seek instead of scanning past N * limit rows like OFFSET does.
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"id": last_id}).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return int(json.loads(base64.urlsafe_b64decode(padded))["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def paginate(statement, model, cursor: Optional[str], offset: int, limit: int):
+    statement = statement.order_by(model.id).limit(limit)
+    if cursor:
+        return statement.where(model.id > decode_cursor(cursor))
+    return statement.offset(offset)
+
+def set_next_cursor(response: Response, rows: list, limit: int):
+    # A short page means we reached the end
+    if rows and len(rows) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].id)
+
+# Opt-in fast path for list endpoints: rows are selected as plain columns and
+# encoded by orjson, skipping ORM instances and the response_model re-validation
+FAST_JSON = env_bool("FAST_JSON", "false")
+
+def read_columns(model, read_model) -> list:
+    """Table columns backing each field of a read model, in field order."""
+    return [getattr(model, name) for name in read_model.model_fields]
+
+def fast_list(rows: list, limit: int, response: Response) -> Response:
+    # Returning a Response bypasses the injected one, so carry its headers over
+    fast_response = ORJSONResponse([row._asdict() for row in rows], headers=response.headers)
+    set_next_cursor(fast_response, rows, limit)
+    return fast_response
@@ -1,34 +1,180 @@
-from sqlmodel import SQLModel, create_engine, Session
-from typing import Generator
+from sqlmodel import create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from typing import AsyncGenerator, Generator, Optional, Tuple
 import os
+import threading
+import time
 from dotenv import load_dotenv, find_dotenv
+from metrics import instrument_engine
 
 # Search for the .env file in parent directories (monorepo support)
 load_dotenv(find_dotenv())
 
+def split_database_url(url: str) -> Tuple[str, Optional[str]]:
+    """The sync URL of a configured database and, for async drivers, its async URL."""
+    if url.startswith("postgresql://"):
+        # SQLAlchemy requires postgresql+psycopg2:// for Postgres
+        url = url.replace("postgresql://", "postgresql+psycopg2://", 1)
+    if "+asyncpg" in url or "+aiosqlite" in url:
+        return url.replace("+asyncpg", "+psycopg2", 1).replace("+aiosqlite", "", 1), url
+    return url, None
+
 # Use SQLite for local development if DATABASE_URL is not set or empty
-DATABASE_URL = os.getenv("DATABASE_URL")
-if not DATABASE_URL:
-    DATABASE_URL = "sqlite:///./local.db"
-elif DATABASE_URL.startswith("postgresql://"):
-    # SQLAlchemy requires postgresql+psycopg2:// for Postgres
-    DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+psycopg2://", 1)
+DATABASE_URL = os.getenv("DATABASE_URL") or "sqlite:///./local.db"
+
+# An async driver in DATABASE_URL (postgresql+asyncpg:// or sqlite+aiosqlite://)
+# opts the CRUD routers into the async engine. The sync engine is still built
+# from the equivalent sync URL for startup tasks and the remaining sync routes.
+DATABASE_URL, ASYNC_DATABASE_URL = split_database_url(DATABASE_URL)
+ASYNC_MODE = ASYNC_DATABASE_URL is not None
+
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+def env_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+# Connection pool settings
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds before a connection is replaced
+DB_POOL_PRE_PING = env_bool("DB_POOL_PRE_PING", "true")
+DB_POOL_SLOW_CHECKOUT = float(os.getenv("DB_POOL_SLOW_CHECKOUT", "0.01"))  # seconds of waiting counted as slow
+
+# SQLite pragmas applied to every new connection
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-64000"))  # negative means KiB, so ~64MB
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))  # milliseconds
+
+class PoolWaitStats:
+    """Time spent waiting for a pooled connection, to tell when the pool is saturated."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+            if seconds > DB_POOL_SLOW_CHECKOUT:
+                self.slow_checkouts += 1
+
+    def reset(self):
+        self.checkouts = 0
+        self.slow_checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "slow_checkouts": self.slow_checkouts,
+                "total_wait_seconds": round(self.total_wait, 6),
+                "avg_wait_seconds": round(self.total_wait / self.checkouts, 6) if self.checkouts else 0.0,
+                "max_wait_seconds": round(self.max_wait, 6),
+            }
 
-# If using SQLite, we need connect_args to allow multiple threads
-connect_args = {"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
+pool_wait_stats = PoolWaitStats()
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args)
+class _TimedCheckoutMixin:
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_wait_stats.record(time.perf_counter() - start)
 
-from models import Client, Invoice, Note, InvoiceItem, SharedWorkspace, SharedWidget
+class TimedQueuePool(_TimedCheckoutMixin, QueuePool):
+    pass
 
-def create_db_and_tables():
-    SQLModel.metadata.create_all(engine)
+class TimedAsyncQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+def _pool_kwargs(url: str, poolclass) -> dict:
+    # In-memory SQLite needs its own single-connection pool
+    if ":memory:" in url:
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers run alongside a writer instead of serializing on the rollback journal
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}")
+    cursor.close()
+
+def create_engines(url: str, async_url: Optional[str]):
+    """A sync engine for url, plus an async one when async_url is set, both pooled and instrumented."""
+    sqlite = url.startswith("sqlite")
+    # If using SQLite, we need connect_args to allow multiple threads
+    connect_args = {"check_same_thread": False} if sqlite else {}
+    sync_engine = create_engine(url, connect_args=connect_args, **_pool_kwargs(url, TimedQueuePool))
+    async_engine = create_async_engine(async_url, **_pool_kwargs(async_url, TimedAsyncQueuePool)) if async_url else None
+
+    if sqlite:
+        event.listen(sync_engine, "connect", _set_sqlite_pragmas)
+        if async_engine is not None:
+            event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+
+    # Per-request statement counts and timings for /metrics
+    instrument_engine(sync_engine)
+    if async_engine is not None:
+        instrument_engine(async_engine.sync_engine)
+    return sync_engine, async_engine
+
+engine, async_engine = create_engines(DATABASE_URL, ASYNC_DATABASE_URL)
+
+def _describe_pool(pool) -> dict:
+    if not isinstance(pool, QueuePool):
+        return {"status": pool.status()}
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "max_overflow": DB_MAX_OVERFLOW,
+    }
+
+def pool_status() -> dict:
+    status = {"pool": _describe_pool(engine.pool), "wait": pool_wait_stats.snapshot()}
+    if async_engine is not None:
+        status["async_pool"] = _describe_pool(async_engine.pool)
+    return status
+
+from models import Client, Invoice, Note, InvoiceItem
+import changes # Registers the change-log session hooks
+import summaries # Registers the invoice summary session hooks
+import search # Registers the full-text index session hooks
+import versions # Registers the collection version session hooks
 
 def get_session() -> Generator[Session, None, None]:
     with Session(engine) as session:
         yield session
 
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSession(async_engine) as session:
+        yield session
+
 def seed_data():
+    # Demo rows for local development; run with `python manage.py seed`, never at startup
     with Session(engine) as session:
         # Check if we already have clients
         if session.query(Client).first():
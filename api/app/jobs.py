@@ -0,0 +1,266 @@
+from fastapi import HTTPException, Response
+from sqlalchemy import and_, func, or_, update
+from sqlmodel import Session, select
+from starlette.concurrency import run_in_threadpool
+from typing import Callable, Dict, Optional
+from datetime import datetime, timedelta
+from database import engine
+from models import Job, JobRead
+from metrics import JOBS_FINISHED, JOB_DURATION
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+
+logger = logging.getLogger("api.jobs")
+
+# Background jobs: slow work (AI generations, cascade deletes) is stored in the
+# job table and run by a small pool of workers in every server process, so the
+# request that triggers it only pays for one insert. Jobs survive restarts;
+# any process may pick up a queued job, claims are compare-and-set updates.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))  # concurrent jobs per process, 0 = enqueue only
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "20"))  # queued or running jobs per user
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BASE = float(os.getenv("JOB_RETRY_BASE", "2"))  # seconds before the first retry, doubled for each one after
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))  # seconds; enqueues in this process wake workers at once
+# A job still running after this long is presumed lost with its process and is claimed again
+JOB_TIMEOUT = int(os.getenv("JOB_TIMEOUT", "600"))
+JOB_SHUTDOWN_TIMEOUT = float(os.getenv("JOB_SHUTDOWN_TIMEOUT", "10"))  # seconds to let running jobs finish on shutdown
+
+PENDING = ("queued", "running")
+
+# Handlers by job kind. Sync handlers are called as fn(session, user_id, **payload)
+# in a worker thread, and the job is marked done in the same transaction as their
+# writes. Async handlers are awaited as fn(user_id, **payload). Both return a
+# JSON-serializable result; an HTTPException below 500 fails the job without retrying.
+HANDLERS: Dict[str, Callable] = {}
+
+def job_handler(kind: str):
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+def job_read(job: Job) -> JobRead:
+    return JobRead(**job.model_dump(exclude={"result"}), result=json.loads(job.result) if job.result else None)
+
+def enqueue(session: Session, user_id: str, kind: str, payload: dict, max_attempts: int = JOB_MAX_ATTEMPTS) -> Job:
+    """Persist a job and wake a worker. Raises 429 when the user already has too many pending."""
+    pending = session.exec(
+        select(func.count()).select_from(Job).where(Job.user_id == user_id, Job.status.in_(PENDING))
+    ).one()
+    if pending >= JOB_MAX_PENDING:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many background jobs in progress, try again shortly",
+            headers={"Retry-After": str(max(1, round(JOB_POLL_INTERVAL)))},
+        )
+    job = Job(user_id=user_id, kind=kind, payload=json.dumps(payload), max_attempts=max_attempts)
+    session.add(job)
+    session.commit()
+    session.refresh(job)
+    runner.notify()
+    return job
+
+def accepted(response: Response, job: Job) -> JobRead:
+    """Body and headers for a 202 response that hands back a job to poll."""
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return job_read(job)
+
+def get_job(session: Session, user_id: str, job_id: str) -> Job:
+    job = session.get(Job, job_id)
+    if not job or job.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+def cancel(session: Session, job: Job) -> Job:
+    """Cancel a queued or running job. A running sync job's writes are rolled back.
+
+    SQLite has one writer at a time, so there a cancel waits out a sync job's
+    transaction and usually finds the job already finished.
+    """
+    now = datetime.utcnow()
+    session.connection().execute(
+        update(Job).where(Job.id == job.id, Job.status.in_(PENDING)).values(status="cancelled", finished_at=now)
+    )
+    session.commit()
+    session.refresh(job)
+    runner.interrupt(job.id)
+    return job
+
+def _claimable(now: datetime):
+    stale = now - timedelta(seconds=JOB_TIMEOUT)
+    return or_(
+        and_(Job.status == "queued", Job.run_after <= now),
+        and_(Job.status == "running", Job.started_at < stale),
+    )
+
+def _owned(job: Job):
+    # Still this attempt's: not cancelled, finished or claimed again since
+    return and_(Job.id == job.id, Job.status == "running", Job.attempts == job.attempts)
+
+def claim_next() -> Optional[Job]:
+    now = datetime.utcnow()
+    with Session(engine, expire_on_commit=False) as session:
+        candidates = session.exec(select(Job.id).where(_claimable(now)).order_by(Job.run_after).limit(max(1, JOB_WORKERS))).all()
+        for job_id in candidates:
+            # Another worker or process may have claimed it since the select
+            claimed = session.connection().execute(
+                update(Job)
+                .where(Job.id == job_id, _claimable(now))
+                .values(status="running", attempts=Job.attempts + 1, started_at=now)
+            )
+            if claimed.rowcount == 1:
+                session.commit()
+                return session.get(Job, job_id)
+        return None
+
+def _complete(session: Session, job: Job, result) -> bool:
+    finished = session.connection().execute(
+        update(Job).where(_owned(job)).values(
+            status="succeeded", result=json.dumps(result), error=None, finished_at=datetime.utcnow()
+        )
+    )
+    return finished.rowcount == 1
+
+def _run_sync(handler: Callable, job: Job, payload: dict) -> bool:
+    with Session(engine) as session:
+        result = handler(session, job.user_id, **payload)
+        if not _complete(session, job, result):
+            # Cancelled while running: drop everything the handler wrote
+            session.rollback()
+            return False
+        session.commit()
+        return True
+
+def _finish(job: Job, result) -> bool:
+    with Session(engine) as session:
+        done = _complete(session, job, result)
+        session.commit()
+        return done
+
+def _failed(job: Job, error: Exception) -> str:
+    permanent = isinstance(error, HTTPException) and error.status_code < 500
+    message = str(error.detail) if isinstance(error, HTTPException) else f"{type(error).__name__}: {error}"
+    now = datetime.utcnow()
+    if permanent or job.attempts >= job.max_attempts:
+        values = {"status": "failed", "error": message, "finished_at": now}
+    else:
+        # Exponential backoff with jitter, never sooner than a Retry-After the failure asked for
+        delay = JOB_RETRY_BASE * 2 ** (job.attempts - 1) * random.uniform(0.5, 1.5)
+        retry_after = (getattr(error, "headers", None) or {}).get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        values = {"status": "queued", "error": message, "run_after": now + timedelta(seconds=delay)}
+    with Session(engine) as session:
+        session.connection().execute(update(Job).where(_owned(job)).values(**values))
+        session.commit()
+    return "retrying" if values["status"] == "queued" else "failed"
+
+def _requeue(job: Job):
+    # Interrupted by shutdown, not by the job itself, so the attempt doesn't count
+    with Session(engine) as session:
+        session.connection().execute(
+            update(Job).where(_owned(job)).values(status="queued", attempts=Job.attempts - 1, run_after=datetime.utcnow())
+        )
+        session.commit()
+
+class JobRunner:
+    """A fixed pool of asyncio workers claiming jobs from the job table."""
+
+    def __init__(self, workers: int = JOB_WORKERS):
+        self.workers = workers
+        self.running: Dict[str, asyncio.Task] = {}
+        self._tasks = []
+        self._stopping = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def start(self):
+        if self.workers <= 0:
+            return
+        self._stopping = False
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        self._stopping = True
+        if not self._tasks:
+            return
+        # Idle workers stop at once, busy ones once their job is done
+        self._wakeup.set()
+        _, unfinished = await asyncio.wait(self._tasks, timeout=JOB_SHUTDOWN_TIMEOUT)
+        # Jobs still running are requeued for the next process. A sync job's
+        # thread can't be stopped; it runs on, but its writes are rolled back.
+        for task in unfinished:
+            task.cancel()
+        if unfinished:
+            await asyncio.wait(unfinished)
+        self._tasks = []
+
+    def _call_soon(self, fn):
+        # Enqueues and cancels arrive from threadpool threads as well as the loop
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(fn)
+
+    def notify(self):
+        if self._wakeup is not None:
+            self._call_soon(self._wakeup.set)
+
+    def interrupt(self, job_id: str):
+        task = self.running.get(job_id)
+        if task is not None:
+            self._call_soon(task.cancel)
+
+    async def _work(self):
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                job = await run_in_threadpool(claim_next)
+            except Exception:
+                logger.exception("Claiming a job failed")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _execute(self, job: Job) -> bool:
+        handler = HANDLERS.get(job.kind)
+        if handler is None:
+            raise HTTPException(status_code=400, detail=f"Unknown job kind {job.kind!r}")
+        if job.attempts > job.max_attempts:
+            # Reclaimed after JOB_TIMEOUT with no attempts left
+            raise HTTPException(status_code=408, detail="Job timed out")
+        payload = json.loads(job.payload)
+        if asyncio.iscoroutinefunction(handler):
+            result = await handler(job.user_id, **payload)
+            return await run_in_threadpool(_finish, job, result)
+        return await run_in_threadpool(_run_sync, handler, job, payload)
+
+    async def _run(self, job: Job):
+        start = time.perf_counter()
+        task = asyncio.create_task(self._execute(job))
+        self.running[job.id] = task
+        try:
+            status = "succeeded" if await task else "cancelled"
+        except asyncio.CancelledError:
+            if self._stopping:
+                await asyncio.shield(run_in_threadpool(_requeue, job))
+                raise
+            status = "cancelled"
+        except Exception as e:
+            logger.warning("Job %s (%s) attempt %d failed: %s", job.id, job.kind, job.attempts, e)
+            status = await run_in_threadpool(_failed, job, e)
+        finally:
+            self.running.pop(job.id, None)
+        JOBS_FINISHED.inc(job.kind, status)
+        JOB_DURATION.observe(time.perf_counter() - start, job.kind)
+
+runner = JobRunner()
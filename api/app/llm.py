@@ -0,0 +1,276 @@
+from fastapi import HTTPException
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session, select
+from starlette.concurrency import run_in_threadpool
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from cache import TTLCache
+from database import engine
+from models import PartialSummary
+import asyncio
+import hashlib
+import httpx
+import json
+import logging
+import os
+import re
+import time
+
+logger = logging.getLogger("api.llm")
+
+# Which backend writes the text: "local" is a deterministic stand-in, "openai" calls the API
+AI_PROVIDER = os.getenv("AI_PROVIDER") or ("openai" if os.getenv("OPENAI_API_KEY") else "local")
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+LOCAL_AI_DELAY = float(os.getenv("LOCAL_AI_DELAY", "0"))  # seconds between stand-in chunks
+
+# Generations running at once per process, and how many more may wait for a slot
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "4"))
+AI_MAX_QUEUE = int(os.getenv("AI_MAX_QUEUE", "32"))
+AI_QUEUE_TIMEOUT = float(os.getenv("AI_QUEUE_TIMEOUT", "10"))  # seconds waiting for a slot
+AI_GENERATION_TIMEOUT = float(os.getenv("AI_GENERATION_TIMEOUT", "60"))  # seconds for one generation
+
+AI_CACHE_TTL = int(os.getenv("AI_CACHE_TTL", "3600"))
+AI_CACHE_SIZE = int(os.getenv("AI_CACHE_SIZE", "1024"))
+
+@dataclass(frozen=True)
+class Prompt:
+    """A normalized generation request; equal prompts share a cached response."""
+    task: str
+    fields: Tuple[Tuple[str, str], ...]
+
+    def get(self, name: str) -> Optional[str]:
+        return dict(self.fields).get(name)
+
+    @property
+    def key(self) -> str:
+        return hashlib.sha256(json.dumps([self.task, self.fields]).encode()).hexdigest()
+
+def _normalize(value: str) -> str:
+    lines = [" ".join(line.split()) for line in value.strip().splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines))
+
+def make_prompt(task: str, **fields) -> Prompt:
+    # Whitespace differences don't change what the model is asked, so they don't change the key
+    normalized = {name: _normalize(value) for name, value in fields.items() if value and value.strip()}
+    return Prompt(task=task, fields=tuple(sorted(normalized.items())))
+
+def instructions(prompt: Prompt) -> str:
+    if prompt.task == "email":
+        text = f"Write a short, friendly follow-up email to {prompt.get('client_name')} about {prompt.get('topic')}."
+        if prompt.get("context"):
+            text += f" Context: {prompt.get('context')}"
+        return text
+    if prompt.task == "combine":
+        return f"Combine these partial summaries of one client's notes into a single summary of a few sentences:\n\n{prompt.get('summaries')}"
+    return f"Summarize these client meeting notes in two or three sentences:\n\n{prompt.get('notes')}"
+
+class LocalProvider:
+    """Deterministic templated text, streamed a word at a time."""
+
+    def render(self, prompt: Prompt) -> str:
+        if prompt.task == "email":
+            return f"Subject: Follow-up regarding {prompt.get('topic')}\n\nHi {prompt.get('client_name')},\n\nI hope this email finds you well. I'm writing to follow up on our discussion about {prompt.get('topic')}.\n\n{prompt.get('context') or 'Let me know when you have a moment to chat about next steps.'}\n\nBest regards,\n[Your Name]"
+        if prompt.task == "combine":
+            parts = (prompt.get("summaries") or "").split("\n\n")
+            return f"Overall summary of {len(parts)} parts: " + " ".join(part[:80] for part in parts)
+        return f"Summary of notes: The discussion focused on project requirements and timelines. Key takeaways include prioritizing the {(prompt.get('notes') or '')[:50]}... and ensuring all stakeholders are aligned."
+
+    async def stream(self, prompt: Prompt) -> AsyncIterator[str]:
+        for chunk in re.findall(r"\S+\s*|\s+", self.render(prompt)):
+            if LOCAL_AI_DELAY:
+                await asyncio.sleep(LOCAL_AI_DELAY)
+            yield chunk
+
+class OpenAIProvider:
+    """Chat completions with stream=true, yielding content deltas as they arrive."""
+
+    url = "https://api.openai.com/v1/chat/completions"
+
+    def __init__(self):
+        self._client = None
+
+    async def stream(self, prompt: Prompt) -> AsyncIterator[str]:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=httpx.Timeout(AI_GENERATION_TIMEOUT, connect=5))
+        body = {
+            "model": OPENAI_MODEL,
+            "stream": True,
+            "messages": [{"role": "user", "content": instructions(prompt)}],
+        }
+        headers = {"Authorization": f"Bearer {os.getenv('OPENAI_API_KEY')}"}
+        try:
+            async with self._client.stream("POST", self.url, json=body, headers=headers) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    logger.warning("OpenAI error %d: %s", response.status_code, response.text[:200])
+                    raise HTTPException(status_code=502, detail="AI provider request failed")
+                async for line in response.aiter_lines():
+                    if not line.startswith("data: "):
+                        continue
+                    data = line[len("data: "):]
+                    if data == "[DONE]":
+                        break
+                    content = json.loads(data)["choices"][0]["delta"].get("content")
+                    if content:
+                        yield content
+        except httpx.TimeoutException:
+            raise HTTPException(status_code=504, detail="AI provider timed out")
+        except httpx.HTTPError as e:
+            logger.warning("OpenAI request failed: %s", e)
+            raise HTTPException(status_code=502, detail="AI provider request failed")
+
+PROVIDERS = {"local": LocalProvider, "openai": OpenAIProvider}
+
+class ConcurrencyLimiter:
+    """Caps concurrent generations; excess requests queue briefly, then get a 503."""
+
+    def __init__(self, limit: int = AI_MAX_CONCURRENCY, max_queue: int = AI_MAX_QUEUE, timeout: float = AI_QUEUE_TIMEOUT):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.running = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    def _busy(self) -> HTTPException:
+        return HTTPException(
+            status_code=503,
+            detail="AI assistant is busy, try again shortly",
+            headers={"Retry-After": str(max(1, round(self.timeout)))},
+        )
+
+    def check(self):
+        # Cheap early rejection, before a streaming response has started
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            raise self._busy()
+
+    @asynccontextmanager
+    async def slot(self):
+        self.check()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            raise self._busy()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self._semaphore.release()
+
+provider = PROVIDERS[AI_PROVIDER]()
+limiter = ConcurrencyLimiter()
+response_cache = TTLCache(ttl=AI_CACHE_TTL, maxsize=AI_CACHE_SIZE)
+
+async def generate(prompt: Prompt) -> AsyncIterator[str]:
+    """Stream the text for prompt, replaying the cached text when it was generated before."""
+    cached = response_cache.get(prompt.key)
+    if cached is not None:
+        yield cached
+        return
+
+    async with limiter.slot():
+        deadline = time.monotonic() + AI_GENERATION_TIMEOUT
+        parts = []
+        async for chunk in provider.stream(prompt):
+            parts.append(chunk)
+            yield chunk
+            if time.monotonic() > deadline:
+                raise HTTPException(status_code=504, detail="AI generation timed out")
+        # Only complete generations are cached; a dropped stream leaves nothing behind
+        response_cache.set(prompt.key, "".join(parts))
+
+async def complete(prompt: Prompt) -> str:
+    return "".join([chunk async for chunk in generate(prompt)])
+
+# Map-reduce over long note histories. Texts are packed into chunks in order,
+# so appending a note only changes the last chunk. Partial summaries are stored
+# in the partial summary table keyed by their prompt's hash (and cached in
+# memory like any response), so unchanged chunks are never summarized twice,
+# across restarts and by every worker. Map steps take a slot from map_limiter
+# before a global one, so long histories can't hold every generation slot.
+AI_CHUNK_CHARS = int(os.getenv("AI_CHUNK_CHARS", "4000"))  # text per map step
+AI_MAP_CONCURRENCY = int(os.getenv("AI_MAP_CONCURRENCY", "4"))  # map steps in flight per request
+AI_MAP_MAX_CONCURRENCY = int(os.getenv("AI_MAP_MAX_CONCURRENCY", str(max(1, AI_MAX_CONCURRENCY // 2))))  # per process
+
+map_limiter = ConcurrencyLimiter(limit=AI_MAP_MAX_CONCURRENCY)
+
+def provider_model() -> str:
+    # A partial is only reused for the backend that wrote it
+    return f"openai:{OPENAI_MODEL}" if AI_PROVIDER == "openai" else AI_PROVIDER
+
+def load_partials(keys: List[str]) -> Dict[str, str]:
+    with Session(engine) as session:
+        statement = select(PartialSummary.key, PartialSummary.summary).where(
+            PartialSummary.key.in_(keys), PartialSummary.model == provider_model()
+        )
+        return dict(session.exec(statement).all())
+
+def store_partial(key: str, summary: str):
+    with Session(engine) as session:
+        connection = session.connection()
+        dialect_insert = postgresql.insert if connection.dialect.name == "postgresql" else sqlite.insert
+        # Two requests summarizing the same chunk at once keep the first row
+        connection.execute(
+            dialect_insert(PartialSummary)
+            .values(key=key, model=provider_model(), summary=summary, created_at=datetime.utcnow())
+            .on_conflict_do_nothing(index_elements=["key", "model"])
+        )
+        session.commit()
+
+def pack_chunks(texts: List[str], budget: int = AI_CHUNK_CHARS) -> List[List[str]]:
+    chunks = []
+    size = 0
+    for text in texts:
+        if not chunks or size + len(text) > budget:
+            chunks.append([])
+            size = 0
+        chunks[-1].append(text)
+        size += len(text)
+    return chunks
+
+async def summarize_partials(prompts: List[Prompt]) -> List[str]:
+    """One map step: the text for each prompt, from memory, the table or the provider."""
+    texts = {prompt.key: response_cache.get(prompt.key) for prompt in prompts}
+    missing = [key for key, text in texts.items() if text is None]
+    if missing:
+        # One query for every stored partial in the step
+        for key, summary in (await run_in_threadpool(load_partials, missing)).items():
+            texts[key] = summary
+            response_cache.set(key, summary)
+
+    semaphore = asyncio.Semaphore(AI_MAP_CONCURRENCY)
+
+    async def run(prompt: Prompt) -> str:
+        async with semaphore, map_limiter.slot():
+            summary = await complete(prompt)
+        await run_in_threadpool(store_partial, prompt.key, summary)
+        return summary
+
+    todo = {prompt.key: prompt for prompt in prompts if texts[prompt.key] is None}
+    for key, summary in zip(todo, await asyncio.gather(*[run(prompt) for prompt in todo.values()])):
+        texts[key] = summary
+    return [texts[prompt.key] for prompt in prompts]
+
+async def summarize_history(notes: List[str]) -> Prompt:
+    """Summarize notes chunk by chunk and return the prompt for the final summary.
+
+    The final prompt is returned rather than its text so the caller can stream it.
+    """
+    # A note too long to share a chunk is condensed on its own first
+    texts = list(notes)
+    long_notes = [i for i, note in enumerate(notes) if len(note) > AI_CHUNK_CHARS]
+    condensed = await summarize_partials([make_prompt("summary", notes=notes[i]) for i in long_notes])
+    for i, summary in zip(long_notes, condensed):
+        texts[i] = summary
+
+    prompts = [make_prompt("summary", notes="\n\n".join(chunk)) for chunk in pack_chunks(texts)]
+    while len(prompts) > 1:
+        partials = await summarize_partials(prompts)
+        prompts = [make_prompt("combine", summaries="\n\n".join(chunk)) for chunk in pack_chunks(partials)]
+    return prompts[0]
@@ -2,26 +2,63 @@ from fastapi import FastAPI, Depends, HTTPException, status # Backend Refresh
 from fastapi.security import OAuth2PasswordBearer
 from typing import Annotated
 from contextlib import asynccontextmanager
-from database import create_db_and_tables, seed_data
-from routers import clients, invoices, notes, ai, marketplace
+from database import engine, async_engine, pool_status, ASYNC_MODE
+from migrations import ensure_schema
+from replicas import replica_set, replica_status, ReadYourWritesMiddleware
+from jobs import runner as job_runner
+from crud import FAST_JSON
+from routers import clients, invoices, notes, ai, marketplace, sync, search, export, imports, jobs
 from dotenv import load_dotenv, find_dotenv
+import anyio
 
 # Load environment variables from parent folders (monorepo support)
 load_dotenv(find_dotenv())
 
-# Lifecycle manager to create tables on startup
+# Startup only checks the schema version row; migrations and demo data
+# are applied by manage.py (or automatically when AUTO_MIGRATE is on)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    create_db_and_tables()
-    seed_data()
+    start = time.perf_counter()
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    version = ensure_schema()
+    logger.info("Started in %.1fms, schema version %d", (time.perf_counter() - start) * 1000, version)
+    replica_set.start()
+    job_runner.start()
+    registry.start()
     yield
+    # The server has drained in-flight requests by now; close pooled connections cleanly
+    await job_runner.stop()
+    replica_set.stop()
+    registry.stop()
+    engine.dispose()
+    if async_engine is not None:
+        await async_engine.dispose()
 
 import os
 import logging
-from fastapi.responses import JSONResponse
+import time
+from fastapi import Request
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from metrics import MetricsMiddleware, registry
+from admission import AdmissionMiddleware
 
-app = FastAPI(lifespan=lifespan)
+logger = logging.getLogger("api")
+
+# Threads available to sync handlers and run_in_threadpool per worker process.
+# Each one may hold a DB connection, so keep DB_POOL_SIZE + DB_MAX_OVERFLOW in step.
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", "40"))
+
+# FAST_JSON=1 encodes every response with orjson instead of the stdlib json
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse if FAST_JSON else JSONResponse)
+
+# Rate limits and the in-flight cap. Added first so it sits inside CORS (browsers
+# can read its 429/503s) and the metrics middleware still counts what it sheds.
+app.add_middleware(AdmissionMiddleware)
+
+# Hands clients the commit time of their writes when read replicas are configured
+app.add_middleware(ReadYourWritesMiddleware)
 
 # Configure CORS
 origins_raw = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000,http://127.0.0.1:3000")
@@ -33,8 +70,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Content-Disposition", "ETag", "Last-Modified", "Location", "Retry-After", "X-Last-Write"],
 )
 
+# Compress larger responses for clients that accept gzip. Responses that are
+# already encoded (marketplace blobs) and event streams pass through untouched.
+GZIP_MIN_SIZE = int(os.getenv("GZIP_MIN_SIZE", "1000"))  # bytes; smaller bodies aren't worth it
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "5"))
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_SIZE, compresslevel=GZIP_LEVEL)
+
+# Added last so it wraps everything else and times the whole request
+app.add_middleware(MetricsMiddleware)
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     logger.error(f"Unhandled exception: {exc}", exc_info=True)
@@ -55,13 +102,40 @@ async def global_exception_handler(request, exc):
 
 from auth import get_current_user
 
-app.include_router(clients.router)
-app.include_router(invoices.router)
-app.include_router(notes.router)
+if ASYNC_MODE:
+    # Async driver configured: serve CRUD from the async engine instead of the threadpool
+    from routers import clients_async, invoices_async, notes_async, marketplace_async
+    app.include_router(clients_async.router)
+    app.include_router(invoices_async.router)
+    app.include_router(notes_async.router)
+    app.include_router(marketplace_async.router)
+else:
+    app.include_router(clients.router)
+    app.include_router(invoices.router)
+    app.include_router(notes.router)
+    app.include_router(marketplace.router)
 app.include_router(ai.router)
-app.include_router(marketplace.router)
+app.include_router(sync.router)
+app.include_router(search.router)
+app.include_router(export.router)
+app.include_router(imports.router)
+app.include_router(jobs.router)
 
 
 @app.get("/")
 def read_root():
     return {"message": "Freelancer Toolkit API is running"}
+
+@app.get("/health/db")
+def read_db_health():
+    # Pool occupancy and checkout wait times; rising waits mean the pool is saturated
+    return {**pool_status(), "read_replicas": replica_status()}
+
+# Set METRICS_TOKEN to require "Authorization: Bearer <token>" from the scraper
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics(request: Request):
+    if METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,34 @@
+"""Database tasks kept out of the serving process.
+
+    python manage.py migrate   # apply pending schema migrations
+    python manage.py seed      # migrate, then add demo data to an empty database
+    python manage.py version   # print the applied and latest schema versions
+    python manage.py prune     # drop change log entries past CHANGELOG_RETENTION_DAYS (run daily)
+"""
+import argparse
+import logging
+from sqlmodel import Session
+from database import engine, seed_data
+from changes import prune_changelog
+from migrations import LATEST_VERSION, current_version, migrate
+
+def main():
+    parser = argparse.ArgumentParser(description="FlowSpace database tasks")
+    parser.add_argument("command", choices=["migrate", "seed", "version", "prune"])
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.command == "version":
+        print(f"Schema version {current_version()} (latest {LATEST_VERSION})")
+        return
+    if args.command == "prune":
+        with Session(engine) as session:
+            print(f"Pruned {prune_changelog(session)} change log entries")
+        return
+    print(f"Schema at version {migrate()}")
+    if args.command == "seed":
+        seed_data()
+        print("Seeded demo data")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+from sqlalchemy import event
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger("api.metrics")
+
+# Requests running more statements than this are logged, to catch N+1 regressions
+QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", "20"))
+
+# Every worker process counts only its own requests. With METRICS_DIR set (serve.py
+# sets it when there are several workers) each one writes its samples there every
+# METRICS_FLUSH_INTERVAL seconds, and /metrics from any worker adds up all the
+# files, like Prometheus' multiprocess mode: counters and histograms include
+# workers that have exited, so totals never go backwards; gauges only live ones.
+METRICS_DIR = os.getenv("METRICS_DIR")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = ""
+    live_only = False  # Exited workers' values no longer count
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> list:
+        # JSON-ready [labels, value] pairs, as written to METRICS_DIR
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def merge(self, into: dict, samples: list):
+        for key, value in samples:
+            into[tuple(key)] = into.get(tuple(key), 0) + value
+
+    def render(self, values: Optional[dict] = None) -> List[str]:
+        if values is None:
+            with self._lock:
+                values = dict(self._values)
+        return self.header() + [f"{self.name}{_labels(self.label_names, key)} {_number(value)}" for key, value in values.items()]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+class Gauge(_Metric):
+    kind = "gauge"
+    live_only = True
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+
+    def observe(self, value: float, *labels: str):
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                # Per-bucket counts (last slot is +Inf), then sum
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+
+    def samples(self) -> list:
+        with self._lock:
+            return [[list(key), [list(counts), total]] for key, (counts, total) in self._values.items()]
+
+    def merge(self, into: dict, samples: list):
+        for key, (counts, total) in samples:
+            entry = into.setdefault(tuple(key), [[0] * (len(self.buckets) + 1), 0.0])
+            entry[0] = [a + b for a, b in zip(entry[0], counts)]
+            entry[1] += total
+
+    def render(self, values: Optional[dict] = None) -> List[str]:
+        if values is None:
+            with self._lock:
+                values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        lines = self.header()
+        for key, (counts, total) in values.items():
+            cumulative = 0
+            for bound, count in zip([*self.buckets, "+Inf"], counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == "+Inf" else f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+class Registry:
+    def __init__(self, directory: Optional[str] = METRICS_DIR, flush_interval: float = METRICS_FLUSH_INTERVAL):
+        self.metrics = []
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def flush(self):
+        """Write this process's samples to the shared directory."""
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump({metric.name: metric.samples() for metric in self.metrics}, f)
+        # Readers see the old file or the new one, never half of one
+        os.replace(path + ".tmp", path)
+
+    def _collect(self) -> dict:
+        self.flush()
+        merged = {metric.name: {} for metric in self.metrics}
+        now = time.time()
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                # A worker that stopped flushing has exited
+                live = now - os.path.getmtime(path) < 3 * self.flush_interval
+                with open(path) as f:
+                    samples = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for metric in self.metrics:
+                if live or not metric.live_only:
+                    metric.merge(merged[metric.name], samples.get(metric.name, []))
+        return merged
+
+    def render(self) -> str:
+        if self.directory is None:
+            return "\n".join(line for metric in self.metrics for line in metric.render()) + "\n"
+        merged = self._collect()
+        return "\n".join(line for metric in self.metrics for line in metric.render(merged[metric.name])) + "\n"
+
+    def _run_flushes(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError:
+                logger.exception("Writing metrics to %s failed", self.directory)
+
+    def start(self):
+        if self.directory is not None and self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run_flushes, name="metrics-flush", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            # Keep everything this worker counted after it exits
+            self.flush()
+
+registry = Registry()
+
+REQUESTS = registry.register(Counter("http_requests_total", "Requests handled", ("method", "route", "status")))
+REQUEST_LATENCY = registry.register(Histogram("http_request_duration_seconds", "Request latency", ("method", "route")))
+IN_FLIGHT = registry.register(Gauge("http_requests_in_flight", "Requests currently being handled"))
+REQUEST_QUERIES = registry.register(Histogram("http_request_db_statements", "SQL statements executed per request", ("route",), QUERY_COUNT_BUCKETS))
+DB_STATEMENTS = registry.register(Counter("db_statements_total", "SQL statements executed", ("route",)))
+DB_TIME = registry.register(Counter("db_statement_seconds_total", "Time spent executing SQL statements", ("route",)))
+JWKS_FETCH_LATENCY = registry.register(Histogram("jwks_fetch_duration_seconds", "JWKS fetch latency"))
+JWKS_FETCH_FAILURES = registry.register(Counter("jwks_fetch_failures_total", "JWKS fetches that failed"))
+JOBS_FINISHED = registry.register(Counter("jobs_finished_total", "Background job attempts by outcome", ("kind", "status")))
+JOB_DURATION = registry.register(Histogram("job_duration_seconds", "Background job attempt duration", ("kind",)))
+ADMISSION_REJECTED = registry.register(Counter("admission_rejected_total", "Requests shed by admission control", ("group", "reason")))
+ADMISSION_QUEUED = registry.register(Gauge("admission_queued", "Requests waiting for an in-flight slot"))
+
+@dataclass
+class RequestStats:
+    statements: int = 0
+    db_time: float = 0.0
+
+# Set by the middleware for the duration of a request. Threadpool handlers run
+# in a copy of the context, which still points at the same stats object.
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    stats = request_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_time += elapsed
+    else:
+        # Startup and other work outside any request
+        DB_STATEMENTS.inc("background")
+        DB_TIME.inc("background", amount=elapsed)
+
+def instrument_engine(engine):
+    """Count and time every statement run through engine (a sync Engine)."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+def _route_label(scope) -> str:
+    # Route templates keep the label set small, /clients/{client_id} not /clients/42
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency, status and SQL work per route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            IN_FLIGHT.dec()
+            request_stats.reset(token)
+            route = _route_label(scope)
+            method = scope["method"]
+            REQUESTS.inc(method, route, str(status[0]))
+            REQUEST_LATENCY.observe(elapsed, method, route)
+            REQUEST_QUERIES.observe(stats.statements, route)
+            DB_STATEMENTS.inc(route, amount=stats.statements)
+            DB_TIME.inc(route, amount=stats.db_time)
+            if stats.statements > QUERY_BUDGET:
+                logger.warning(
+                    "%s %s ran %d SQL statements (budget %d) in %.1fms, %.1fms in the database",
+                    method, scope["path"], stats.statements, QUERY_BUDGET, elapsed * 1000, stats.db_time * 1000,
+                )
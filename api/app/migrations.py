@@ -0,0 +1,196 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlmodel import SQLModel, Session, select
+from typing import Callable, List, NamedTuple
+from datetime import datetime
+from database import engine, env_bool
+from models import SchemaVersion, ContentBlob, Job, PartialSummary, SharedWorkspace, SharedWidget
+from blobs import blob_row, insert_blob, normalize_json
+import logging
+import summaries
+import search
+
+logger = logging.getLogger("api.migrations")
+
+# Apply pending migrations at startup instead of refusing to start. Off by
+# default: every worker runs startup, and on SQLite there is no advisory lock
+# to keep them from migrating at once. serve.py migrates before it starts the
+# workers; otherwise run `python manage.py migrate` first. Safe to turn on for
+# a single process.
+AUTO_MIGRATE = env_bool("AUTO_MIGRATE", "false")
+
+# Arbitrary key for the Postgres advisory lock that serializes migrating workers
+MIGRATION_LOCK_KEY = 7_310_402
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    upgrade: Callable[[Session], None]
+
+MIGRATIONS: List[Migration] = []
+
+def migration(version: int, description: str):
+    def register(upgrade):
+        MIGRATIONS.append(Migration(version, description, upgrade))
+        return upgrade
+    return register
+
+# Each migration runs once, in order, on two kinds of database: new ones,
+# where migration 1's create_all already built today's tables, and ones created
+# before schema_version existed, whose tables are still the original release's.
+# So schema changes check what is there before altering it, and data migrations
+# read only columns every version of a table has.
+
+def _columns(connection, table: str) -> set:
+    return {column["name"] for column in inspect(connection).get_columns(table)}
+
+def _has_unique(connection, table: str, columns: list) -> bool:
+    inspector = inspect(connection)
+    constraints = inspector.get_unique_constraints(table)
+    indexes = [index for index in inspector.get_indexes(table) if index["unique"]]
+    return any(item["column_names"] == columns for item in [*constraints, *indexes])
+
+def _add_column(connection, table: str, column: str, ddl: str, backfill: str = None, not_null: bool = False):
+    if column in _columns(connection, table):
+        return
+    connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+    if backfill:
+        connection.execute(text(f"UPDATE {table} SET {column} = {backfill}"))
+    if not_null and connection.dialect.name == "postgresql":
+        # SQLite can't add the constraint to an existing column; the models always set a value
+        connection.execute(text(f"ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL"))
+
+@migration(1, "Create tables")
+def _create_tables(session: Session):
+    SQLModel.metadata.create_all(session.connection())
+
+@migration(2, "Fill invoice summaries from existing invoices")
+def _backfill_invoice_summaries(session: Session):
+    summaries.backfill_invoice_summaries(session)
+
+@migration(3, "Create the full-text search index")
+def _create_search_index(session: Session):
+    search.create_search_index(session)
+
+@migration(4, "Move marketplace JSON into content-addressed blobs")
+def _marketplace_blobs(session: Session):
+    connection = session.connection()
+    ContentBlob.__table__.create(connection, checkfirst=True)
+    postgres = connection.dialect.name == "postgresql"
+    for model, old, new in ((SharedWorkspace, "layout_json", "layout_hash"), (SharedWidget, "config_json", "config_hash")):
+        table = model.__tablename__
+        columns = _columns(connection, table)
+        if old not in columns:
+            # Created by migration 1 with the blob column already
+            continue
+        if new not in columns:
+            connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {new} VARCHAR REFERENCES contentblob(hash)"))
+        for row_id, value in connection.execute(text(f"SELECT id, {old} FROM {table} WHERE {new} IS NULL")).all():
+            try:
+                value = normalize_json(value)
+            except ValueError:
+                # Shared before payloads were validated; keep the text exactly as it was
+                pass
+            row = blob_row(value)
+            insert_blob(session, row)
+            connection.execute(text(f"UPDATE {table} SET {new} = :hash WHERE id = :id"), {"hash": row["hash"], "id": row_id})
+        connection.execute(text(f"ALTER TABLE {table} DROP COLUMN {old}"))
+        if postgres:
+            connection.execute(text(f"ALTER TABLE {table} ALTER COLUMN {new} SET NOT NULL"))
+
+@migration(5, "Create the background job table")
+def _create_jobs(session: Session):
+    Job.__table__.create(session.connection(), checkfirst=True)
+
+@migration(6, "Index invoice items by invoice")
+def _index_invoice_items(session: Session):
+    session.connection().execute(text("CREATE INDEX IF NOT EXISTS ix_invoiceitem_invoice_id ON invoiceitem (invoice_id)"))
+
+@migration(7, "Add idempotency keys to clients, invoices and notes")
+def _idempotency_keys(session: Session):
+    connection = session.connection()
+    for table in ("client", "invoice", "note"):
+        _add_column(connection, table, "idempotency_key", "VARCHAR(64)")
+        if not _has_unique(connection, table, ["user_id", "idempotency_key"]):
+            connection.execute(text(f"CREATE UNIQUE INDEX uq_{table}_user_id_idempotency_key ON {table} (user_id, idempotency_key)"))
+
+@migration(8, "Add updated_at to synced tables")
+def _updated_at(session: Session):
+    connection = session.connection()
+    for table in ("client", "invoice", "note"):
+        _add_column(connection, table, "updated_at", "TIMESTAMP", backfill="created_at", not_null=True)
+    _add_column(connection, "invoiceitem", "updated_at", "TIMESTAMP", backfill="CURRENT_TIMESTAMP", not_null=True)
+
+@migration(9, "Add keyset pagination and marketplace listing indexes")
+def _listing_indexes(session: Session):
+    connection = session.connection()
+    for table in ("client", "invoice", "note"):
+        connection.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_user_id_id ON {table} (user_id, id)"))
+    for table in ("sharedworkspace", "sharedwidget"):
+        connection.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_public_likes ON {table} (is_public, likes_count)"))
+        connection.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_public_created ON {table} (is_public, created_at)"))
+
+@migration(10, "Create the partial summary table")
+def _create_partial_summaries(session: Session):
+    PartialSummary.__table__.create(session.connection(), checkfirst=True)
+
+@migration(11, "Index the change log by time for sync re-scans")
+def _index_changelog_time(session: Session):
+    session.connection().execute(text("CREATE INDEX IF NOT EXISTS ix_changelog_user_id_changed_at ON changelog (user_id, changed_at)"))
+
+@migration(12, "Index search rows by owner on SQLite")
+def _search_owner_key(session: Session):
+    connection = session.connection()
+    if connection.dialect.name == "postgresql":
+        # Already a btree index on user_id
+        return
+    columns = {row[1] for row in connection.execute(text("PRAGMA table_info(search_index)"))}
+    if "user_key" not in columns:
+        # FTS5 tables can't be altered; rebuild it from the notes and clients
+        connection.execute(text("DROP TABLE search_index"))
+        search.create_search_index(session)
+
+LATEST_VERSION = max(m.version for m in MIGRATIONS)
+
+def current_version() -> int:
+    """The applied schema version, 0 for a database that has never been migrated."""
+    try:
+        with engine.connect() as connection:
+            return connection.execute(select(SchemaVersion.version).where(SchemaVersion.id == 1)).scalar() or 0
+    except (OperationalError, ProgrammingError):
+        # No schema_version table yet
+        return 0
+
+def migrate() -> int:
+    """Apply every pending migration in order and return the resulting version."""
+    with engine.connect() as lock:
+        postgres = lock.dialect.name == "postgresql"
+        if postgres:
+            lock.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        try:
+            # Another worker may have finished while we waited for the lock
+            applied = current_version()
+            for m in sorted(MIGRATIONS, key=lambda m: m.version):
+                if m.version <= applied:
+                    continue
+                with Session(engine) as session:
+                    m.upgrade(session)
+                    session.merge(SchemaVersion(id=1, version=m.version, applied_at=datetime.utcnow()))
+                    session.commit()
+                applied = m.version
+                logger.info("Applied migration %d: %s", m.version, m.description)
+            return applied
+        finally:
+            if postgres:
+                lock.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+
+def ensure_schema(auto_migrate: bool = AUTO_MIGRATE) -> int:
+    """Startup check: one version lookup when the schema is current."""
+    version = current_version()
+    if version == LATEST_VERSION:
+        return version
+    if version > LATEST_VERSION:
+        raise RuntimeError(f"Database schema is at version {version}, newer than this code ({LATEST_VERSION})")
+    if not auto_migrate:
+        raise RuntimeError(f"Database schema is at version {version}, expected {LATEST_VERSION}; run `python manage.py migrate`")
+    return migrate()
@@ -1,7 +1,8 @@
 from datetime import datetime
-from typing import Optional, List
+from typing import Any, Optional, List
 from sqlmodel import Field, SQLModel, Relationship
-from uuid import UUID
+from sqlalchemy import Index, UniqueConstraint
+from uuid import UUID, uuid4
 
 # Client Model
 class ClientBase(SQLModel):
@@ -10,15 +11,25 @@ class ClientBase(SQLModel):
     notes: Optional[str] = None
 
 class Client(ClientBase, table=True):
+    __table_args__ = (
+        UniqueConstraint("user_id", "idempotency_key"),
+        Index("ix_client_user_id_id", "user_id", "id"), # Keyset pagination
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: str = Field(index=True) # Supabase User ID
+    idempotency_key: Optional[str] = Field(default=None, max_length=64) # Client-generated, dedupes batch replays
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow) # Bumped on every update
     invoices: List["Invoice"] = Relationship(back_populates="client")
     client_notes: List["Note"] = Relationship(back_populates="client")
 
 class ClientCreate(ClientBase):
     pass
 
+class ClientBatchCreate(ClientCreate):
+    idempotency_key: Optional[str] = Field(default=None, max_length=64)
+
 class ClientRead(ClientBase):
     id: int
 
@@ -35,15 +46,25 @@ class InvoiceBase(SQLModel):
     due_date: Optional[datetime] = None
 
 class Invoice(InvoiceBase, table=True):
+    __table_args__ = (
+        UniqueConstraint("user_id", "idempotency_key"),
+        Index("ix_invoice_user_id_id", "user_id", "id"), # Keyset pagination
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: str = Field(index=True)
+    idempotency_key: Optional[str] = Field(default=None, max_length=64) # Client-generated, dedupes batch replays
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow) # Bumped on every update
     client: Optional[Client] = Relationship(back_populates="invoices")
     items: List["InvoiceItem"] = Relationship(back_populates="invoice")
 
 class InvoiceCreate(InvoiceBase):
     pass
 
+class InvoiceBatchCreate(InvoiceCreate):
+    idempotency_key: Optional[str] = Field(default=None, max_length=64)
+
 class InvoiceRead(InvoiceBase):
     id: int
 
@@ -54,52 +75,313 @@ class InvoiceUpdate(SQLModel):
 
 # Invoice Item Model
 class InvoiceItemBase(SQLModel):
-    invoice_id: int = Field(foreign_key="invoice.id")
+    invoice_id: int = Field(foreign_key="invoice.id", index=True) # Items are always read per invoice
     description: str
     quantity: int = 1
     price: float = 0.0
 
 class InvoiceItem(InvoiceItemBase, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
     invoice: Optional[Invoice] = Relationship(back_populates="items")
 
+class InvoiceItemRead(InvoiceItemBase):
+    id: int
+
+class InvoiceReadExpanded(InvoiceRead):
+    # Only present when requested with ?expand=items,client
+    items: Optional[List[InvoiceItemRead]] = None
+    client: Optional[ClientRead] = None
+    # Sum of price * quantity over the line items, computed by the database on
+    # every expanded read; amount stays the stored figure the summaries total
+    items_total: Optional[float] = None
+
 # Note Model
 class NoteBase(SQLModel):
     client_id: int = Field(foreign_key="client.id")
     content: str
 
 class Note(NoteBase, table=True):
+    __table_args__ = (
+        UniqueConstraint("user_id", "idempotency_key"),
+        Index("ix_note_user_id_id", "user_id", "id"), # Keyset pagination
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: str = Field(index=True)
+    idempotency_key: Optional[str] = Field(default=None, max_length=64) # Client-generated, dedupes batch replays
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow) # Bumped on every update
     client: Optional[Client] = Relationship(back_populates="client_notes")
 
 class NoteCreate(NoteBase):
     pass
 
+class NoteBatchCreate(NoteCreate):
+    idempotency_key: Optional[str] = Field(default=None, max_length=64)
+
 class NoteRead(NoteBase):
     id: int
 
 class NoteUpdate(SQLModel):
     content: Optional[str] = None
 
+# Invoice Summary Models
+class InvoiceSummary(SQLModel, table=True):
+    # Running totals per (user, client, status, month), kept current on every
+    # invoice write so the dashboard never has to scan invoices
+    user_id: str = Field(primary_key=True)
+    client_id: int = Field(primary_key=True)
+    status: str = Field(primary_key=True)
+    month: str = Field(primary_key=True) # YYYY-MM of created_at
+    invoice_count: int = Field(default=0)
+    total_amount: float = Field(default=0.0)
+
+class StatusTotal(SQLModel):
+    status: str
+    invoice_count: int
+    total_amount: float
+
+class ClientTotal(SQLModel):
+    client_id: int
+    invoice_count: int
+    total_amount: float
+    outstanding_amount: float
+
+class MonthTotal(SQLModel):
+    month: str
+    invoice_count: int
+    total_amount: float
+
+class InvoiceSummaryRead(SQLModel):
+    invoice_count: int
+    total_amount: float
+    outstanding_amount: float # Everything not PAID
+    by_status: List[StatusTotal]
+    by_client: List[ClientTotal]
+    by_month: List[MonthTotal]
+
+# Change Tracking Models
+class ChangeLog(SQLModel, table=True):
+    # One row per insert, update or delete of a synced resource. The
+    # autoincrement id orders changes and is what sync tokens point at; ids
+    # are taken at flush, so sync re-scans recent changed_at for late commits.
+    __table_args__ = (
+        Index("ix_changelog_user_id_id", "user_id", "id"),
+        Index("ix_changelog_user_id_changed_at", "user_id", "changed_at"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: str
+    resource: str # clients, invoices, notes, invoice_items
+    resource_id: int
+    deleted: bool = Field(default=False)
+    changed_at: datetime = Field(default_factory=datetime.utcnow)
+
+class ClientChanges(SQLModel):
+    upserted: List[ClientRead] = []
+    deleted: List[int] = []
+
+class InvoiceChanges(SQLModel):
+    upserted: List[InvoiceRead] = []
+    deleted: List[int] = []
+
+class InvoiceItemChanges(SQLModel):
+    upserted: List[InvoiceItemRead] = []
+    deleted: List[int] = []
+
+class NoteChanges(SQLModel):
+    upserted: List[NoteRead] = []
+    deleted: List[int] = []
+
+class SyncChanges(SQLModel):
+    clients: ClientChanges
+    invoices: InvoiceChanges
+    invoice_items: InvoiceItemChanges
+    notes: NoteChanges
+    next_token: str # Pass back as ?since= to get the following changes
+    has_more: bool # More changes are waiting past next_token
+
+# Collection Versions
+class CollectionVersion(SQLModel, table=True):
+    # Replaced with a fresh token on every write to a user's collection; list
+    # ETags are derived from it so conditional GETs skip the row query
+    user_id: str = Field(primary_key=True)
+    collection: str = Field(primary_key=True)
+    version: str
+
+# Schema Version
+class SchemaVersion(SQLModel, table=True):
+    # A single row (id 1) holding the last applied migration, so startup
+    # learns whether the schema is current from one primary-key lookup
+    id: int = Field(default=1, primary_key=True)
+    version: int
+    applied_at: datetime = Field(default_factory=datetime.utcnow)
+
+# Background Jobs
+class Job(SQLModel, table=True):
+    # Persisted work for the in-process worker pool (see jobs.py). Workers
+    # claim queued rows whose run_after has passed; retries push run_after out.
+    __table_args__ = (
+        Index("ix_job_status_run_after", "status", "run_after"), # Claiming the next job
+        Index("ix_job_user_id_status", "user_id", "status"), # Per-user pending cap
+    )
+
+    id: str = Field(default_factory=lambda: uuid4().hex, primary_key=True)
+    user_id: str
+    kind: str # Registered handler name, e.g. "delete_clients"
+    payload: str # JSON keyword arguments for the handler
+    status: str = Field(default="queued") # queued, running, succeeded, failed, cancelled
+    attempts: int = Field(default=0)
+    max_attempts: int = Field(default=3)
+    result: Optional[str] = None # JSON returned by the handler
+    error: Optional[str] = None # Last failure, kept while retrying
+    run_after: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None # Start of the latest attempt
+    finished_at: Optional[datetime] = None
+
+# AI Partial Summaries
+class PartialSummary(SQLModel, table=True):
+    # Map-phase output of llm.summarize_history, keyed by the sha256 of the
+    # chunk's prompt, so a history is only ever re-summarized where it changed
+    key: str = Field(primary_key=True)
+    model: str = Field(primary_key=True) # Provider and model that wrote it
+    summary: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class JobRead(SQLModel):
+    id: str
+    kind: str
+    status: str
+    attempts: int
+    max_attempts: int
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    run_after: datetime # When a queued job becomes eligible, later than created_at after a failure
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+# Batch Models
+class BatchCreateResult(SQLModel):
+    ids: List[int] # One id per submitted item, in input order
+    created: int # Rows actually inserted; replayed idempotency keys are not counted
+
+# Import Models
+class ImportRowError(SQLModel):
+    row: int # Line number in the uploaded file, the header is line 1
+    errors: List[str]
+
+class ImportResult(SQLModel):
+    created: int
+    failed: int
+    errors: List[ImportRowError] # Capped at IMPORT_MAX_ERRORS, failed has the full count
+
+# Search Models
+class SearchHit(SQLModel):
+    kind: str # "note" or "client"
+    id: int
+    snippet: str # Matching excerpt of the indexed text
+    rank: float # Higher is a better match
+
 # Marketplace Models
+class ContentBlob(SQLModel, table=True):
+    # Marketplace JSON, stored once per distinct content and gzip-compressed.
+    # The key is the sha256 of the normalized JSON, so re-shares of the same
+    # template point at the same row.
+    hash: str = Field(primary_key=True)
+    size: int # Uncompressed bytes
+    data: bytes # gzip
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
 class SharedWorkspace(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_sharedworkspace_public_likes", "is_public", "likes_count"), # Listing sorts
+        Index("ix_sharedworkspace_public_created", "is_public", "created_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: str = Field(index=True)
     name: str
     description: Optional[str] = None
-    layout_json: str # Store the entire template/layout as JSON string
+    layout_hash: str = Field(foreign_key="contentblob.hash") # The template/layout JSON
     is_public: bool = Field(default=True)
     likes_count: int = Field(default=0)
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+class SharedWorkspaceCreate(SQLModel):
+    name: str
+    description: Optional[str] = None
+    layout_json: str # Store the entire template/layout as JSON string
+    is_public: bool = True
+
+class SharedWorkspaceRead(SQLModel):
+    id: int
+    user_id: str
+    name: str
+    description: Optional[str] = None
+    layout_json: str
+    layout_hash: str # Fetch /blobs/{hash} for a cacheable, pre-compressed copy
+    is_public: bool
+    likes_count: int
+    created_at: datetime
+
 class SharedWidget(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_sharedwidget_public_likes", "is_public", "likes_count"),
+        Index("ix_sharedwidget_public_created", "is_public", "created_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: str = Field(index=True)
     name: str
     description: Optional[str] = None
-    config_json: str # Store widget configuration
+    config_hash: str = Field(foreign_key="contentblob.hash") # The widget configuration JSON
     is_public: bool = Field(default=True)
     likes_count: int = Field(default=0)
     created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class SharedWidgetCreate(SQLModel):
+    name: str
+    description: Optional[str] = None
+    config_json: str # Store widget configuration
+    is_public: bool = True
+
+class SharedWidgetRead(SQLModel):
+    id: int
+    user_id: str
+    name: str
+    description: Optional[str] = None
+    config_json: str
+    config_hash: str
+    is_public: bool
+    likes_count: int
+    created_at: datetime
+
+# Listing rows without the layout/config payload
+class SharedWorkspaceSummary(SQLModel):
+    id: int
+    user_id: str
+    name: str
+    description: Optional[str] = None
+    likes_count: int
+    created_at: datetime
+
+class SharedWorkspaceListing(SharedWorkspaceSummary):
+    # Listing entry with ?include=layout, so a gallery renders from one request
+    layout_json: str
+    layout_hash: str
+
+class SharedWidgetSummary(SQLModel):
+    id: int
+    user_id: str
+    name: str
+    description: Optional[str] = None
+    likes_count: int
+    created_at: datetime
+
+class SharedWidgetListing(SharedWidgetSummary):
+    # Listing entry with ?include=config
+    config_json: str
+    config_hash: str
@@ -0,0 +1,243 @@
+from fastapi import Depends, Request
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from contextvars import ContextVar
+from typing import AsyncGenerator, Generator, List, Optional
+from database import engine, async_engine, split_database_url, create_engines, ASYNC_MODE
+from auth import get_current_user
+from cache import TTLCache
+import itertools
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger("api.replicas")
+
+# Comma-separated replica URLs, in the same form as DATABASE_URL. Unset means
+# every read goes to the primary, exactly as before.
+DATABASE_READ_URLS = [url.strip() for url in os.getenv("DATABASE_READ_URL", "").split(",") if url.strip()]
+READ_REPLICA_STRATEGY = os.getenv("READ_REPLICA_STRATEGY", "round_robin")  # or "least_connections"
+REPLICA_HEALTH_INTERVAL = float(os.getenv("REPLICA_HEALTH_INTERVAL", "5"))  # seconds between health checks
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", "5"))  # seconds behind the primary before a replica is skipped
+# After a user writes, their reads stay on the primary this long, so they never
+# see their own change missing. Keep it above the lag replicas normally run at.
+READ_YOUR_WRITES_WINDOW = float(os.getenv("READ_YOUR_WRITES_WINDOW", "10"))
+
+# Replay lag on Postgres, 0 when the replica has applied everything it received
+# (an idle primary would otherwise look like a lagging replica)
+POSTGRES_LAG_QUERY = text("""
+    SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END
+""")
+
+def _async_url(url: str) -> str:
+    # The async routers need an async engine for every replica too
+    sync_url, async_url = split_database_url(url)
+    return async_url or sync_url.replace("+psycopg2", "+asyncpg", 1).replace("sqlite://", "sqlite+aiosqlite://", 1)
+
+class Replica:
+    def __init__(self, url: str):
+        self.url = url
+        self.engine, self.async_engine = create_engines(split_database_url(url)[0], _async_url(url) if ASYNC_MODE else None)
+        self.healthy = True
+        self.lag = 0.0
+        self.error: Optional[str] = None
+
+    @property
+    def host(self) -> str:
+        # For status output, without credentials
+        return self.engine.url.render_as_string(hide_password=True)
+
+    def connections(self) -> int:
+        pool = (self.async_engine or self.engine).pool
+        return pool.checkedout() if hasattr(pool, "checkedout") else 0
+
+    def mark_down(self, error: Exception):
+        if self.healthy:
+            logger.warning("Read replica %s is down, reads fall back to the primary: %s", self.host, error)
+        self.healthy = False
+        self.error = str(error)
+
+    def check(self):
+        """Probe the replica and update its health; runs on the health-check thread."""
+        try:
+            with self.engine.connect() as connection:
+                if connection.dialect.name == "postgresql":
+                    self.lag = float(connection.execute(POSTGRES_LAG_QUERY).scalar() or 0)
+                else:
+                    connection.execute(text("SELECT 1"))
+        except Exception as e:
+            if not isinstance(e, DBAPIError):
+                logger.exception("Health check of read replica %s failed", self.host)
+            self.mark_down(e)
+            return
+        if self.lag > REPLICA_MAX_LAG:
+            self.mark_down(RuntimeError(f"replication lag {self.lag:.1f}s"))
+            return
+        if not self.healthy:
+            logger.info("Read replica %s is back", self.host)
+        self.healthy = True
+        self.error = None
+
+    def status(self) -> dict:
+        return {"url": self.host, "healthy": self.healthy, "lag_seconds": round(self.lag, 3), "connections": self.connections(), "error": self.error}
+
+class ReplicaSet:
+    """Picks a healthy replica per read session, or None to use the primary."""
+
+    def __init__(self, urls: List[str], strategy: str = READ_REPLICA_STRATEGY):
+        self.replicas = [Replica(url) for url in urls]
+        self.strategy = strategy
+        self._turn = itertools.count()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def choose(self) -> Optional[Replica]:
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        if self.strategy == "least_connections":
+            return min(healthy, key=Replica.connections)
+        return healthy[next(self._turn) % len(healthy)]
+
+    def _run_checks(self):
+        while not self._stop.wait(REPLICA_HEALTH_INTERVAL):
+            for replica in self.replicas:
+                replica.check()
+
+    def start(self):
+        if self.replicas and self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run_checks, name="replica-health", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=REPLICA_HEALTH_INTERVAL)
+            self._thread = None
+
+    def status(self) -> list:
+        return [replica.status() for replica in self.replicas]
+
+replica_set = ReplicaSet(DATABASE_READ_URLS)
+
+# Users who committed a write within READ_YOUR_WRITES_WINDOW, as seen by this
+# process. Another worker doesn't know about them, so write responses also
+# carry the commit time in X-Last-Write; clients send it back on their reads
+# and any worker then keeps those reads on the primary.
+recent_writers = TTLCache(ttl=READ_YOUR_WRITES_WINDOW, maxsize=100_000)
+LAST_WRITE_HEADER = "X-Last-Write"
+
+# Set per request by ReadYourWritesMiddleware. A mutable holder, so commits made
+# in threadpool threads (which run on a copy of the context) still reach it.
+request_writes: ContextVar[Optional[dict]] = ContextVar("request_writes", default=None)
+
+def record_writers(session: Session, user_ids):
+    """Remember users written for by this session; they're pinned to the primary once it commits."""
+    session.info.setdefault("written_user_ids", set()).update(user_ids)
+
+@event.listens_for(Session, "after_flush")
+def _collect_writers(session, flush_context):
+    # Every user-owned row has user_id; line items only change alongside their invoice
+    user_ids = {getattr(obj, "user_id", None) for obj in [*session.new, *session.dirty, *session.deleted]}
+    user_ids.discard(None)
+    if user_ids:
+        record_writers(session, user_ids)
+
+@event.listens_for(Session, "after_commit")
+def _pin_writers(session):
+    user_ids = session.info.pop("written_user_ids", ())
+    for user_id in user_ids:
+        recent_writers.set(user_id, True)
+    writes = request_writes.get()
+    if user_ids and writes is not None:
+        writes["at"] = time.time()
+
+@event.listens_for(Session, "after_rollback")
+def _forget_writers(session):
+    session.info.pop("written_user_ids", None)
+
+def _client_wrote_recently(request: Request) -> bool:
+    try:
+        wrote_at = float(request.headers.get(LAST_WRITE_HEADER, ""))
+    except ValueError:
+        return False
+    # Either side of now, to allow for clock differences between servers
+    return abs(time.time() - wrote_at) < READ_YOUR_WRITES_WINDOW
+
+def _reads_from_primary(user_id: Optional[str], request: Request) -> bool:
+    return (user_id is not None and recent_writers.get(user_id) is not None) or _client_wrote_recently(request)
+
+def _open_read_session(user_id: Optional[str], request: Request) -> Session:
+    replica = None if _reads_from_primary(user_id, request) else replica_set.choose()
+    if replica is not None:
+        session = Session(replica.engine)
+        try:
+            # Connect now so a dead replica falls back here rather than failing the request
+            session.connection()
+            return session
+        except DBAPIError as e:
+            session.close()
+            replica.mark_down(e)
+    return Session(engine)
+
+async def _open_async_read_session(user_id: Optional[str], request: Request) -> AsyncSession:
+    replica = None if _reads_from_primary(user_id, request) else replica_set.choose()
+    if replica is not None:
+        session = AsyncSession(replica.async_engine)
+        try:
+            await session.connection()
+            return session
+        except DBAPIError as e:
+            await session.close()
+            replica.mark_down(e)
+    return AsyncSession(async_engine)
+
+def get_read_session(request: Request, current_user: dict = Depends(get_current_user)) -> Generator[Session, None, None]:
+    """Session for a user's reads: a replica, unless the user just wrote or none is healthy."""
+    with _open_read_session(current_user["user_id"], request) as session:
+        yield session
+
+def get_public_read_session(request: Request) -> Generator[Session, None, None]:
+    # Anonymous marketplace reads only follow writes the client tells us about
+    with _open_read_session(None, request) as session:
+        yield session
+
+async def get_async_read_session(request: Request, current_user: dict = Depends(get_current_user)) -> AsyncGenerator[AsyncSession, None]:
+    async with await _open_async_read_session(current_user["user_id"], request) as session:
+        yield session
+
+async def get_async_public_read_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    async with await _open_async_read_session(None, request) as session:
+        yield session
+
+class ReadYourWritesMiddleware:
+    """Pure ASGI middleware adding X-Last-Write to responses of requests that committed a write."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not replica_set.replicas:
+            await self.app(scope, receive, send)
+            return
+
+        writes = {}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and "at" in writes:
+                message["headers"] = [*message.get("headers", []), (LAST_WRITE_HEADER.lower().encode(), f"{writes['at']:.3f}".encode())]
+            await send(message)
+
+        token = request_writes.set(writes)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_writes.reset(token)
+
+def replica_status() -> dict:
+    return {"strategy": replica_set.strategy, "replicas": replica_set.status()}
@@ -1,8 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import List, Optional
-import os
+from sqlmodel import Session, select
+from typing import AsyncIterator, List, Optional
+import json
+from database import engine, get_session
+from models import Client, Note, JobRead
 from auth import get_current_user
+from llm import Prompt, make_prompt, generate, complete, limiter, summarize_history
+from jobs import job_handler, enqueue, accepted
 
 router = APIRouter(prefix="/ai", tags=["ai"])
 
@@ -17,27 +24,132 @@ class AISummarizeRequest(BaseModel):
 class AIResponse(BaseModel):
     suggestion: str
 
+def _sse(event: Optional[str], data: dict) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+async def _event_stream(prompt: Prompt) -> AsyncIterator[str]:
+    # Each chunk is a {"delta": ...} event, then "done" or "error" ends the stream
+    try:
+        async for chunk in generate(prompt):
+            yield _sse(None, {"delta": chunk})
+    except HTTPException as e:
+        yield _sse("error", {"status": e.status_code, "detail": e.detail})
+        return
+    yield _sse("done", {})
+
+def _wants_stream(request: Request, stream: bool) -> bool:
+    return stream or "text/event-stream" in request.headers.get("accept", "")
+
+async def _respond(prompt: Prompt, streaming: bool):
+    if streaming:
+        limiter.check()
+        return StreamingResponse(
+            _event_stream(prompt),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    return AIResponse(suggestion=await complete(prompt))
+
 @router.post("/generate-email", response_model=AIResponse)
-def generate_email(
+async def generate_email(
     request: AIGenerateRequest,
+    http_request: Request,
+    stream: bool = False,
     current_user: dict = Depends(get_current_user)
 ):
-    # Mock implementation
-    api_key = os.getenv("OPENAI_API_KEY")
-    
-    if not api_key:
-        return AIResponse(suggestion=f"Subject: Follow-up regarding {request.topic}\n\nHi {request.client_name},\n\nI hope this email finds you well. I'm writing to follow up on our discussion about {request.topic}.\n\n{request.context or 'Let me know when you have a moment to chat about next steps.'}\n\nBest regards,\n[Your Name]")
-
-    # Real implementation would go here (omitted for mock mode)
-    return AIResponse(suggestion="[AI Response simulated using OpenAI]")
+    # ?stream=true or Accept: text/event-stream streams server-sent events, otherwise JSON as before
+    prompt = make_prompt("email", client_name=request.client_name, topic=request.topic, context=request.context)
+    return await _respond(prompt, _wants_stream(http_request, stream))
 
 @router.post("/summarize-notes", response_model=AIResponse)
-def summarize_notes(
+async def summarize_notes(
     request: AISummarizeRequest,
+    http_request: Request,
+    stream: bool = False,
     current_user: dict = Depends(get_current_user)
 ):
-    # Mock implementation
-    if not os.getenv("OPENAI_API_KEY"):
-        return AIResponse(suggestion=f"Summary of notes: The discussion focused on project requirements and timelines. Key takeaways include prioritizing the {request.notes[:50]}... and ensuring all stakeholders are aligned.")
+    prompt = make_prompt("summary", notes=request.notes)
+    return await _respond(prompt, _wants_stream(http_request, stream))
+
+def read_client_notes(session: Session, user_id: str, client_id: int) -> List[str]:
+    client = session.get(Client, client_id)
+    if not client or client.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Client not found")
+    statement = select(Note.content).where(Note.client_id == client_id, Note.user_id == user_id).order_by(Note.id)
+    return session.exec(statement).all()
+
+@router.post("/clients/{client_id}/summary", response_model=AIResponse)
+async def summarize_client(
+    client_id: int,
+    http_request: Request,
+    stream: bool = False,
+    session: Session = Depends(get_session),
+    current_user: dict = Depends(get_current_user)
+):
+    # Summarizes the whole note history server-side; only the final step is streamed
+    notes = await run_in_threadpool(read_client_notes, session, current_user["user_id"], client_id)
+    if not notes:
+        return AIResponse(suggestion="No notes recorded for this client yet.")
+    prompt = await summarize_history(notes)
+    return await _respond(prompt, _wants_stream(http_request, stream))
+
+# Background variants: each returns 202 with a job at once, and the suggestion
+# lands in the job's result ({"suggestion": ...}). Poll GET /jobs/{id}.
+
+@job_handler("ai.generate_email")
+async def _generate_email_job(user_id: str, client_name: str, topic: str, context: Optional[str] = None) -> dict:
+    prompt = make_prompt("email", client_name=client_name, topic=topic, context=context)
+    return {"suggestion": await complete(prompt)}
+
+@job_handler("ai.summarize_notes")
+async def _summarize_notes_job(user_id: str, notes: str) -> dict:
+    return {"suggestion": await complete(make_prompt("summary", notes=notes))}
+
+def _read_notes_for_job(user_id: str, client_id: int) -> List[str]:
+    with Session(engine) as session:
+        return read_client_notes(session, user_id, client_id)
 
-    return AIResponse(suggestion="[AI Summary simulated using OpenAI]")
+@job_handler("ai.summarize_client")
+async def _summarize_client_job(user_id: str, client_id: int) -> dict:
+    # Notes are read when the job runs, so it covers anything added while it was queued
+    notes = await run_in_threadpool(_read_notes_for_job, user_id, client_id)
+    if not notes:
+        return {"suggestion": "No notes recorded for this client yet."}
+    return {"suggestion": await complete(await summarize_history(notes))}
+
+@router.post("/jobs/generate-email", status_code=202, response_model=JobRead)
+async def generate_email_job(
+    request: AIGenerateRequest,
+    response: Response,
+    session: Session = Depends(get_session),
+    current_user: dict = Depends(get_current_user)
+):
+    job = await run_in_threadpool(enqueue, session, current_user["user_id"], "ai.generate_email", request.model_dump())
+    return accepted(response, job)
+
+@router.post("/jobs/summarize-notes", status_code=202, response_model=JobRead)
+async def summarize_notes_job(
+    request: AISummarizeRequest,
+    response: Response,
+    session: Session = Depends(get_session),
+    current_user: dict = Depends(get_current_user)
+):
+    job = await run_in_threadpool(enqueue, session, current_user["user_id"], "ai.summarize_notes", request.model_dump())
+    return accepted(response, job)
+
+def _enqueue_client_summary(session: Session, user_id: str, client_id: int):
+    client = session.get(Client, client_id)
+    if not client or client.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Client not found")
+    return enqueue(session, user_id, "ai.summarize_client", {"client_id": client_id})
+
+@router.post("/jobs/clients/{client_id}/summary", status_code=202, response_model=JobRead)
+async def summarize_client_job(
+    client_id: int,
+    response: Response,
+    session: Session = Depends(get_session),
+    current_user: dict = Depends(get_current_user)
+):
+    job = await run_in_threadpool(_enqueue_client_summary, session, current_user["user_id"], client_id)
+    return accepted(response, job)
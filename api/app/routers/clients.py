@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlmodel import Session, select
-from typing import List
+from typing import List, Optional
 from database import get_session
-from models import Client, ClientCreate, ClientRead, ClientUpdate
+from replicas import get_read_session
+from models import Client, ClientCreate, ClientBatchCreate, ClientRead, ClientUpdate, BatchCreateResult, JobRead
 from auth import get_current_user
+from crud import bulk_create, paginate, set_next_cursor, FAST_JSON, read_columns, fast_list
+from versions import collection_etag, check_etag, row_etag, set_last_modified
+from jobs import enqueue, accepted
 
 router = APIRouter(prefix="/clients", tags=["clients"])
 
@@ -13,34 +17,55 @@ def create_client(
     session: Session = Depends(get_session),
     current_user: dict = Depends(get_current_user)
 ):
-    db_client = Client.model_validate(client)
-    db_client.user_id = current_user["user_id"]
+    db_client = Client.model_validate(client, update={"user_id": current_user["user_id"]})
     
     session.add(db_client)
     session.commit()
     session.refresh(db_client)
     return db_client
 
+@router.post("/batch", response_model=BatchCreateResult)
+def create_clients_batch(
+    clients: List[ClientBatchCreate],
+    session: Session = Depends(get_session),
+    current_user: dict = Depends(get_current_user)
+):
+    # Offline sync replays the whole queue here in one round trip
+    return bulk_create(session, Client, clients, current_user["user_id"])
+
 @router.get("/", response_model=List[ClientRead])
 def read_clients(
+    request: Request,
+    response: Response,
     offset: int = 0, 
     limit: int = Query(default=100, le=100), 
-    session: Session = Depends(get_session),
+    cursor: Optional[str] = None,
+    session: Session = Depends(get_read_session),
     current_user: dict = Depends(get_current_user)
 ):
-    statement = select(Client).where(Client.user_id == current_user["user_id"]).offset(offset).limit(limit)
+    check_etag(request, response, collection_etag(session, current_user["user_id"], "clients", request))
+    # cursor takes precedence over offset; the next one comes back in X-Next-Cursor
+    if FAST_JSON:
+        statement = paginate(select(*read_columns(Client, ClientRead)).where(Client.user_id == current_user["user_id"]), Client, cursor, offset, limit)
+        return fast_list(session.exec(statement).all(), limit, response)
+    statement = paginate(select(Client).where(Client.user_id == current_user["user_id"]), Client, cursor, offset, limit)
     clients = session.exec(statement).all()
+    set_next_cursor(response, clients, limit)
     return clients
 
 @router.get("/{client_id}", response_model=ClientRead)
 def read_client(
     client_id: int, 
-    session: Session = Depends(get_session),
+    request: Request,
+    response: Response,
+    session: Session = Depends(get_read_session),
     current_user: dict = Depends(get_current_user)
 ):
     client = session.get(Client, client_id)
     if not client or client.user_id != current_user["user_id"]:
         raise HTTPException(status_code=404, detail="Client not found")
+    check_etag(request, response, row_etag(client, request))
+    set_last_modified(response, client.updated_at)
     return client
 
 @router.patch("/{client_id}", response_model=ClientRead)
@@ -62,16 +87,17 @@ def update_client(
     session.refresh(db_client)
     return db_client
 
-@router.delete("/{client_id}")
+@router.delete("/{client_id}", status_code=202, response_model=JobRead)
 def delete_client(
     client_id: int, 
+    response: Response,
     session: Session = Depends(get_session),
     current_user: dict = Depends(get_current_user)
 ):
+    # Invoices, line items and notes go with the client; poll the returned job for the outcome
     client = session.get(Client, client_id)
     if not client or client.user_id != current_user["user_id"]:
         raise HTTPException(status_code=404, detail="Client not found")
-    session.delete(client)
-    session.commit()
-    return {"ok": True}
+    job = enqueue(session, current_user["user_id"], "delete_clients", {"client_ids": [client_id]})
+    return accepted(response, job)
 
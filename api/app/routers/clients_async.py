@@ -0,0 +1,103 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import List, Optional
+from database import get_async_session
+from replicas import get_async_read_session
+from models import Client, ClientCreate, ClientBatchCreate, ClientRead, ClientUpdate, BatchCreateResult, JobRead
+from auth import get_current_user
+from crud import bulk_create, paginate, set_next_cursor, FAST_JSON, read_columns, fast_list
+from versions import collection_etag, check_etag, row_etag, set_last_modified
+from jobs import enqueue, accepted
+
+# Async counterpart of routers/clients.py, used when DATABASE_URL names an async driver
+router = APIRouter(prefix="/clients", tags=["clients"])
+
+@router.post("/", response_model=ClientRead)
+async def create_client(
+    client: ClientCreate,
+    session: AsyncSession = Depends(get_async_session),
+    current_user: dict = Depends(get_current_user)
+):
+    db_client = Client.model_validate(client, update={"user_id": current_user["user_id"]})
+
+    session.add(db_client)
+    await session.commit()
+    await session.refresh(db_client)
+    return db_client
+
+@router.post("/batch", response_model=BatchCreateResult)
+async def create_clients_batch(
+    clients: List[ClientBatchCreate],
+    session: AsyncSession = Depends(get_async_session),
+    current_user: dict = Depends(get_current_user)
+):
+    return await session.run_sync(bulk_create, Client, clients, current_user["user_id"])
+
+@router.get("/", response_model=List[ClientRead])
+async def read_clients(
+    request: Request,
+    response: Response,
+    offset: int = 0,
+    limit: int = Query(default=100, le=100),
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_async_read_session),
+    current_user: dict = Depends(get_current_user)
+):
+    check_etag(request, response, await session.run_sync(collection_etag, current_user["user_id"], "clients", request))
+    # cursor takes precedence over offset; the next one comes back in X-Next-Cursor
+    if FAST_JSON:
+        statement = paginate(select(*read_columns(Client, ClientRead)).where(Client.user_id == current_user["user_id"]), Client, cursor, offset, limit)
+        return fast_list((await session.exec(statement)).all(), limit, response)
+    statement = paginate(select(Client).where(Client.user_id == current_user["user_id"]), Client, cursor, offset, limit)
+    clients = (await session.exec(statement)).all()
+    set_next_cursor(response, clients, limit)
+    return clients
+
+@router.get("/{client_id}", response_model=ClientRead)
+async def read_client(
+    client_id: int,
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_async_read_session),
+    current_user: dict = Depends(get_current_user)
+):
+    client = await session.get(Client, client_id)
+    if not client or client.user_id != current_user["user_id"]:
+        raise HTTPException(status_code=404, detail="Client not found")
+    check_etag(request, response, row_etag(client, request))
+    set_last_modified(response, client.updated_at)
+    return client
+
+@router.patch("/{client_id}", response_model=ClientRead)
+async def update_client(
+    client_id: int,
+    client: ClientUpdate,
+    session: AsyncSession = Depends(get_async_session),
+    current_user: dict = Depends(get_current_user)
+):
+    db_client = await session.get(Client, client_id)
+    if not db_client or db_client.user_id != current_user["user_id"]:
+        raise HTTPException(status_code=404, detail="Client not found")
+
+    client_data = client.model_dump(exclude_unset=True)
+    db_client.sqlmodel_update(client_data)
+
+    session.add(db_client)
+    await session.commit()
+    await session.refresh(db_client)
+    return db_client
+
+@router.delete("/{client_id}", status_code=202, response_model=JobRead)
+async def delete_client(
+    client_id: int,
+    response: Response,
+    session: AsyncSession = Depends(get_async_session),
+    current_user: dict = Depends(get_current_user)
+):
+    # Invoices, line items and notes go with the client; poll the returned job for the outcome
+    client = await session.get(Client, client_id)
+    if not client or client.user_id != current_user["user_id"]:
+        raise HTTPException(status_code=404, detail="Client not found")
+    job = await session.run_sync(enqueue, current_user["user_id"], "delete_clients", {"client_ids": [client_id]})
+    return accepted(response, job)
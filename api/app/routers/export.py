@@ -0,0 +1,91 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session, select
+from typing import Literal
+from datetime import date, datetime
+import csv
+import io
+import json
+import os
+import zlib
+from database import engine
+from auth import get_current_user
+from changes import TRACKED_MODELS, owned_by
+
+router = APIRouter(prefix="/export", tags=["export"])
+
+# Rows fetched per round trip; memory stays at about one chunk however big the export is
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+
+MODELS = {name: model for model, name in TRACKED_MODELS.items()}
+ExportResource = Literal["clients", "invoices", "invoice_items", "notes"]
+ExportFormat = Literal["ndjson", "csv"]
+
+# Internal bookkeeping columns that don't belong in a user's copy of their data
+HIDDEN_COLUMNS = {"user_id", "idempotency_key"}
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+def _columns(model) -> list:
+    return [column for column in model.__table__.columns if column.name not in HIDDEN_COLUMNS]
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def _chunks(model, user_id: str):
+    # Own session rather than Depends(get_session): the body is produced after
+    # the endpoint returns, so the session has to live as long as the generator.
+    # yield_per streams from a server-side cursor instead of buffering the result.
+    statement = owned_by(select(*_columns(model)), model, user_id).order_by(model.id)
+    with Session(engine) as session:
+        result = session.exec(statement.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+        for chunk in result.partitions():
+            yield chunk
+
+def _ndjson(model, user_id: str):
+    for chunk in _chunks(model, user_id):
+        yield "".join(json.dumps(row._asdict(), default=_json_default) + "\n" for row in chunk).encode()
+
+def _csv(model, user_id: str):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.name for column in _columns(model)])
+    for chunk in _chunks(model, user_id):
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only, when there are no rows
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+def _gzipped(chunks):
+    compressor = zlib.compressobj(wbits=31) # 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+@router.get("/{resource}")
+def export_resource(
+    resource: ExportResource,
+    format: ExportFormat = "ndjson",
+    gzip: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    model = MODELS[resource]
+    body = (_ndjson if format == "ndjson" else _csv)(model, current_user["user_id"])
+    filename = f"{resource}.{format}"
+    media_type = MEDIA_TYPES[format]
+    if gzip:
+        body = _gzipped(body)
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,93 @@
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from pydantic import ValidationError
+from sqlmodel import Session, select
+from typing import Literal
+import csv
+import io
+import os
+from database import get_session
+from models import Client, Invoice, ClientBatchCreate, InvoiceBatchCreate, ImportResult, ImportRowError
+from auth import get_current_user
+from crud import bulk_create, BATCH_MAX_ITEMS
+
+router = APIRouter(prefix="/import", tags=["import"])
+
+# Rows validated and inserted per transaction, at most BATCH_MAX_ITEMS
+IMPORT_CHUNK_SIZE = min(int(os.getenv("IMPORT_CHUNK_SIZE", "1000")), BATCH_MAX_ITEMS)
+# Row errors listed in the response; the rest are only counted
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+
+ImportResource = Literal["clients", "invoices"]
+
+MODELS = {
+    "clients": (Client, ClientBatchCreate),
+    "invoices": (Invoice, InvoiceBatchCreate),
+}
+
+def _format_errors(error: ValidationError) -> list:
+    return [f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" for e in error.errors()]
+
+def _owned_client_ids(session: Session, user_id: str, client_ids: set) -> set:
+    if not client_ids:
+        return set()
+    statement = select(Client.id).where(Client.user_id == user_id, Client.id.in_(client_ids))
+    return set(session.exec(statement).all())
+
+class _Importer:
+    """Validates parsed rows a chunk at a time and bulk inserts the valid ones."""
+
+    def __init__(self, session: Session, resource: str, user_id: str):
+        self.session = session
+        self.model, self.schema = MODELS[resource]
+        self.user_id = user_id
+        self.result = ImportResult(created=0, failed=0, errors=[])
+
+    def fail(self, line: int, errors: list):
+        self.result.failed += 1
+        if len(self.result.errors) < IMPORT_MAX_ERRORS:
+            self.result.errors.append(ImportRowError(row=line, errors=errors))
+
+    def flush(self, chunk: list):
+        valid = []
+        for line, row in chunk:
+            try:
+                valid.append((line, self.schema.model_validate(row)))
+            except ValidationError as e:
+                self.fail(line, _format_errors(e))
+
+        if self.model is Invoice:
+            # Checked here so one bad reference fails its row, not the whole insert
+            owned = _owned_client_ids(self.session, self.user_id, {item.client_id for _, item in valid})
+            for line, item in valid:
+                if item.client_id not in owned:
+                    self.fail(line, [f"client_id: client {item.client_id} not found"])
+            valid = [(line, item) for line, item in valid if item.client_id in owned]
+
+        if valid:
+            self.result.created += bulk_create(self.session, self.model, [item for _, item in valid], self.user_id).created
+
+@router.post("/{resource}", response_model=ImportResult)
+def import_csv(
+    resource: ImportResource,
+    file: UploadFile = File(...),
+    session: Session = Depends(get_session),
+    current_user: dict = Depends(get_current_user)
+):
+    # The upload is spooled to disk by the multipart parser, read it back a row at a time
+    text = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    reader = csv.DictReader(text)
+    importer = _Importer(session, resource, current_user["user_id"])
+    chunk = []
+    try:
+        for row in reader:
+            # Blank cells fall back to the field default instead of failing validation
+            chunk.append((reader.line_num, {key: value for key, value in row.items() if key and value != ""}))
+            if len(chunk) >= IMPORT_CHUNK_SIZE:
+                importer.flush(chunk)
+                chunk = []
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse CSV at line {reader.line_num}, {importer.result.created} earlier rows were imported: {e}")
+    if chunk:
+        importer.flush(chunk)
+    importer.result.errors.sort(key=lambda error: error.row)
+    return importer.result
@@ -1,46 +1,141 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload, selectinload
 from sqlmodel import Session, select
-from typing import List
+from typing import List, Optional
 from database import get_session
-from models import Invoice, InvoiceCreate, InvoiceRead, InvoiceUpdate
+from replicas import get_read_session
+from models import Invoice, InvoiceItem, InvoiceItemRead, ClientRead, InvoiceCreate, InvoiceBatchCreate, InvoiceRead, InvoiceReadExpanded, InvoiceUpdate, BatchCreateResult, InvoiceSummaryRead
 from auth import get_current_user
+from crud import bulk_create, paginate, set_next_cursor, FAST_JSON, read_columns, fast_list
+from versions import collection_etag, check_etag, row_etag, set_last_modified
+from summaries import read_invoice_summary
 
 router = APIRouter(prefix="/invoices", tags=["invoices"])
 
+EXPANDABLE = {"items", "client"}
+
+# Line item total computed by the database, one indexed lookup per invoice
+items_total = func.coalesce(
+    select(func.sum(InvoiceItem.price * InvoiceItem.quantity))
+    .where(InvoiceItem.invoice_id == Invoice.id)
+    .correlate(Invoice)
+    .scalar_subquery(),
+    0.0,
+)
+
+def parse_expand(expand: Optional[str]) -> Optional[set]:
+    if expand is None:
+        return None
+    fields = {field.strip() for field in expand.split(",") if field.strip()}
+    unknown = fields - EXPANDABLE
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Cannot expand: {', '.join(sorted(unknown))}")
+    return fields
+
+def expanded_select(fields: set):
+    # Items load in one extra IN query and the client rides along in a join,
+    # so a page costs the same number of queries whatever its size
+    statement = select(Invoice, items_total)
+    if "items" in fields:
+        statement = statement.options(selectinload(Invoice.items))
+    if "client" in fields:
+        statement = statement.options(joinedload(Invoice.client))
+    return statement
+
+def to_expanded(invoice: Invoice, total: float, fields: set) -> InvoiceReadExpanded:
+    data = InvoiceRead.model_validate(invoice).model_dump()
+    data["items_total"] = total
+    if "items" in fields:
+        data["items"] = [InvoiceItemRead.model_validate(item) for item in invoice.items]
+    if "client" in fields:
+        data["client"] = ClientRead.model_validate(invoice.client) if invoice.client else None
+    return InvoiceReadExpanded(**data)
+
 @router.post("/", response_model=InvoiceRead)
 def create_invoice(
     invoice: InvoiceCreate, 
     session: Session = Depends(get_session),
     current_user: dict = Depends(get_current_user)
 ):
-    db_invoice = Invoice.model_validate(invoice)
-    db_invoice.user_id = current_user["user_id"]
+    db_invoice = Invoice.model_validate(invoice, update={"user_id": current_user["user_id"]})
     session.add(db_invoice)
     session.commit()
     session.refresh(db_invoice)
     return db_invoice
 
-@router.get("/", response_model=List[InvoiceRead])
+@router.post("/batch", response_model=BatchCreateResult)
+def create_invoices_batch(
+    invoices: List[InvoiceBatchCreate],
+    session: Session = Depends(get_session),
+    current_user: dict = Depends(get_current_user)
+):
+    # Offline sync replays the whole queue here in one round trip
+    return bulk_create(session, Invoice, invoices, current_user["user_id"])
+
+@router.get("/", response_model=List[InvoiceReadExpanded], response_model_exclude_unset=True)
 def read_invoices(
+    request: Request,
+    response: Response,
     offset: int = 0, 
     limit: int = Query(default=100, le=100), 
-    session: Session = Depends(get_session),
+    cursor: Optional[str] = None,
+    expand: Optional[str] = None,
+    session: Session = Depends(get_read_session),
     current_user: dict = Depends(get_current_user)
 ):
-    statement = select(Invoice).where(Invoice.user_id == current_user["user_id"]).offset(offset).limit(limit)
-    invoices = session.exec(statement).all()
+    # cursor takes precedence over offset; the next one comes back in X-Next-Cursor
+    fields = parse_expand(expand)
+    check_etag(request, response, collection_etag(session, current_user["user_id"], "invoices", request))
+    if FAST_JSON and fields is None:
+        statement = paginate(select(*read_columns(Invoice, InvoiceRead)).where(Invoice.user_id == current_user["user_id"]), Invoice, cursor, offset, limit)
+        return fast_list(session.exec(statement).all(), limit, response)
+    if fields is None:
+        statement = paginate(select(Invoice).where(Invoice.user_id == current_user["user_id"]), Invoice, cursor, offset, limit)
+        invoices = [InvoiceRead.model_validate(invoice) for invoice in session.exec(statement).all()]
+    else:
+        statement = paginate(expanded_select(fields).where(Invoice.user_id == current_user["user_id"]), Invoice, cursor, offset, limit)
+        rows = session.exec(statement).all()
+        invoices = [to_expanded(invoice, total, fields) for invoice, total in rows]
+    set_next_cursor(response, invoices, limit)
     return invoices
 
-@router.get("/{invoice_id}", response_model=InvoiceRead)
+@router.get("/summary", response_model=InvoiceSummaryRead)
+def read_invoices_summary(
+    session: Session = Depends(get_read_session),
+    current_user: dict = Depends(get_current_user)
+):
+    # Dashboard totals from the maintained summary table, independent of invoice count
+    return read_invoice_summary(session, current_user["user_id"])
+
+@router.get("/{invoice_id}", response_model=InvoiceReadExpanded, response_model_exclude_unset=True)
 def read_invoice(
     invoice_id: int, 
-    session: Session = Depends(get_session),
+    request: Request,
+    response: Response,
+    expand: Optional[str] = None,
+    session: Session = Depends(get_read_session),
     current_user: dict = Depends(get_current_user)
 ):
-    invoice = session.get(Invoice, invoice_id)
-    if not invoice or invoice.user_id != current_user["user_id"]:
+    fields = parse_expand(expand)
+    if fields is None:
+        invoice = session.get(Invoice, invoice_id)
+        if not invoice or invoice.user_id != current_user["user_id"]:
+            raise HTTPException(status_code=404, detail="Invoice not found")
+        check_etag(request, response, row_etag(invoice, request))
+        set_last_modified(response, invoice.updated_at)
+        return InvoiceRead.model_validate(invoice)
+
+    statement = expanded_select(fields).where(Invoice.id == invoice_id, Invoice.user_id == current_user["user_id"])
+    row = session.exec(statement).first()
+    if not row:
         raise HTTPException(status_code=404, detail="Invoice not found")
-    return invoice
+    invoice, total = row
+    # Expanded reads embed line items and the client, which change without
+    # touching the invoice row, so they follow the collection version
+    check_etag(request, response, collection_etag(session, current_user["user_id"], "invoices", request))
+    set_last_modified(response, invoice.updated_at)
+    return to_expanded(invoice, total, fields)
 
 @router.patch("/{invoice_id}", response_model=InvoiceRead)
 def update_invoice(
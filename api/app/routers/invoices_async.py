@@ -0,0 +1,131 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import List, Optional
+from database import get_async_session
+from replicas import get_async_read_session
+from models import Invoice, InvoiceCreate, InvoiceBatchCreate, InvoiceRead, InvoiceReadExpanded, InvoiceUpdate, BatchCreateResult, InvoiceSummaryRead
+from auth import get_current_user
+from crud import bulk_create, paginate, set_next_cursor, FAST_JSON, read_columns, fast_list
+from versions import collection_etag, check_etag, row_etag, set_last_modified
+from summaries import read_invoice_summary
+from routers.invoices import expanded_select, parse_expand, to_expanded
+
+# Async counterpart of routers/invoices.py, used when DATABASE_URL names an async driver
+router = APIRouter(prefix="/invoices", tags=["invoices"])
+
+@router.post("/", response_model=InvoiceRead)
+async def create_invoice(
+    invoice: InvoiceCreate,
+    session: AsyncSession = Depends(get_async_session),
+    current_user: dict = Depends(get_current_user)
+):
+    db_invoice = Invoice.model_validate(invoice, update={"user_id": current_user["user_id"]})
+    session.add(db_invoice)
+    await session.commit()
+    await session.refresh(db_invoice)
+    return db_invoice
+
+@router.post("/batch", response_model=BatchCreateResult)
+async def create_invoices_batch(
+    invoices: List[InvoiceBatchCreate],
+    session: AsyncSession = Depends(get_async_session),
+    current_user: dict = Depends(get_current_user)
+):
+    return await session.run_sync(bulk_create, Invoice, invoices, current_user["user_id"])
+
+@router.get("/", response_model=List[InvoiceReadExpanded], response_model_exclude_unset=True)
+async def read_invoices(
+    request: Request,
+    response: Response,
+    offset: int = 0,
+    limit: int = Query(default=100, le=100),
+    cursor: Optional[str] = None,
+    expand: Optional[str] = None,
+    session: AsyncSession = Depends(get_async_read_session),
+    current_user: dict = Depends(get_current_user)
+):
+    # cursor takes precedence over offset; the next one comes back in X-Next-Cursor
+    fields = parse_expand(expand)
+    check_etag(request, response, await session.run_sync(collection_etag, current_user["user_id"], "invoices", request))
+    if FAST_JSON and fields is None:
+        statement = paginate(select(*read_columns(Invoice, InvoiceRead)).where(Invoice.user_id == current_user["user_id"]), Invoice, cursor, offset, limit)
+        return fast_list((await session.exec(statement)).all(), limit, response)
+    if fields is None:
+        statement = paginate(select(Invoice).where(Invoice.user_id == current_user["user_id"]), Invoice, cursor, offset, limit)
+        invoices = [InvoiceRead.model_validate(invoice) for invoice in (await session.exec(statement)).all()]
+    else:
+        statement = paginate(expanded_select(fields).where(Invoice.user_id == current_user["user_id"]), Invoice, cursor, offset, limit)
+        rows = (await session.exec(statement)).all()
+        invoices = [to_expanded(invoice, total, fields) for invoice, total in rows]
+    set_next_cursor(response, invoices, limit)
+    return invoices
+
+@router.get("/summary", response_model=InvoiceSummaryRead)
+async def read_invoices_summary(
+    session: AsyncSession = Depends(get_async_read_session),
+    current_user: dict = Depends(get_current_user)
+):
+    return await session.run_sync(read_invoice_summary, current_user["user_id"])
+
+@router.get("/{invoice_id}", response_model=InvoiceReadExpanded, response_model_exclude_unset=True)
+async def read_invoice(
+    invoice_id: int,
+    request: Request,
+    response: Response,
+    expand: Optional[str] = None,
+    session: AsyncSession = Depends(get_async_read_session),
+    current_user: dict = Depends(get_current_user)
+):
+    fields = parse_expand(expand)
+    if fields is None:
+        invoice = await session.get(Invoice, invoice_id)
+        if not invoice or invoice.user_id != current_user["user_id"]:
+            raise HTTPException(status_code=404, detail="Invoice not found")
+        check_etag(request, response, row_etag(invoice, request))
+        set_last_modified(response, invoice.updated_at)
+        return InvoiceRead.model_validate(invoice)
+
+    statement = expanded_select(fields).where(Invoice.id == invoice_id, Invoice.user_id == current_user["user_id"])
+    row = (await session.exec(statement)).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Invoice not found")
+    invoice, total = row
+    # Expanded reads embed line items and the client, which change without
+    # touching the invoice row, so they follow the collection version
+    check_etag(request, response, await session.run_sync(collection_etag, current_user["user_id"], "invoices", request))
+    set_last_modified(response, invoice.updated_at)
+    return to_expanded(invoice, total, fields)
+
+@router.patch("/{invoice_id}", response_model=InvoiceRead)
+async def update_invoice(
+    invoice_id: int,
+    invoice: InvoiceUpdate,
+    session: AsyncSession = Depends(get_async_session),
+    current_user: dict = Depends(get_current_user)
+):
+    db_invoice = await session.get(Invoice, invoice_id)
+    if not db_invoice or db_invoice.user_id != current_user["user_id"]:
+        raise HTTPException(status_code=404, detail="Invoice not found")
+
+    invoice_data = invoice.model_dump(exclude_unset=True)
+    for key, value in invoice_data.items():
+        setattr(db_invoice, key, value)
+
+    session.add(db_invoice)
+    await session.commit()
+    await session.refresh(db_invoice)
+    return db_invoice
+
+@router.delete("/{invoice_id}")
+async def delete_invoice(
+    invoice_id: int,
+    session: AsyncSession = Depends(get_async_session),
+    current_user: dict = Depends(get_current_user)
+):
+    invoice = await session.get(Invoice, invoice_id)
+    if not invoice or invoice.user_id != current_user["user_id"]:
+        raise HTTPException(status_code=404, detail="Invoice not found")
+    await session.delete(invoice)
+    await session.commit()
+    return {"ok": True}
@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Depends, Query
+from sqlmodel import Session, select
+from typing import List, Literal, Optional
+from database import get_session
+from models import Job, JobRead
+from auth import get_current_user
+from jobs import get_job, job_read, cancel
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+# Status reads go to the primary: a replica may still show a finished job as running
+
+@router.get("/", response_model=List[JobRead])
+def read_jobs(
+    status: Optional[Literal["queued", "running", "succeeded", "failed", "cancelled"]] = None,
+    limit: int = Query(default=20, le=100),
+    session: Session = Depends(get_session),
+    current_user: dict = Depends(get_current_user)
+):
+    # Most recent first
+    statement = select(Job).where(Job.user_id == current_user["user_id"])
+    if status:
+        statement = statement.where(Job.status == status)
+    return [job_read(job) for job in session.exec(statement.order_by(Job.created_at.desc()).limit(limit))]
+
+@router.get("/{job_id}", response_model=JobRead)
+def read_job(
+    job_id: str,
+    session: Session = Depends(get_session),
+    current_user: dict = Depends(get_current_user)
+):
+    return job_read(get_job(session, current_user["user_id"], job_id))
+
+@router.post("/{job_id}/cancel", response_model=JobRead)
+def cancel_job(
+    job_id: str,
+    session: Session = Depends(get_session),
+    current_user: dict = Depends(get_current_user)
+):
+    # Finished jobs are returned unchanged
+    return job_read(cancel(session, get_job(session, current_user["user_id"], job_id)))
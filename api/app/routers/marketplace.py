@@ -1,68 +1,181 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import update
 from sqlmodel import Session, select
 from database import get_session
-from models import SharedWorkspace, SharedWidget
+from replicas import get_public_read_session
+from models import SharedWorkspace, SharedWorkspaceCreate, SharedWorkspaceRead, SharedWidget, SharedWidgetCreate, SharedWidgetRead, SharedWorkspaceSummary, SharedWidgetSummary, SharedWorkspaceListing, SharedWidgetListing
 from auth import get_current_user
-from typing import List
+from cache import TTLCache
+from versions import check_etag, body_etag
+from blobs import store_blob, load_payload, load_payloads, payload_response
+from typing import List, Literal, Optional, Union
+import json
+import os
 
 router = APIRouter()
 
-@router.get("/workspaces", response_model=List[SharedWorkspace])
-def get_public_workspaces(session: Session = Depends(get_session)):
-    return session.exec(select(SharedWorkspace).where(SharedWorkspace.is_public == True)).all()
+# Hot listing pages are served from memory for a few seconds; sharing clears them
+LISTING_CACHE_TTL = float(os.getenv("MARKETPLACE_CACHE_TTL", "15"))
+listing_cache = TTLCache(ttl=LISTING_CACHE_TTL, maxsize=512)
 
-@router.post("/workspaces/share")
+ListingSort = Literal["likes", "recent"]
+
+def listing_statement(model, summary_model, sort: str, offset: int, limit: int):
+    # Only the summary columns; a listing model adds the payload hash, never the payload itself
+    columns = [getattr(model, name) for name in summary_model.model_fields if hasattr(model, name)]
+    order = (model.likes_count.desc(), model.id.desc()) if sort == "likes" else (model.created_at.desc(), model.id.desc())
+    return select(*columns).where(model.is_public == True).order_by(*order).offset(offset).limit(limit)
+
+def to_summaries(summary_model, rows) -> list:
+    return [summary_model.model_validate(row._mapping) for row in rows]
+
+def to_listings(session: Session, listing_model, hash_field: str, payload_field: str, rows) -> list:
+    # Every payload on the page in one query (or from memory), instead of a detail request per item
+    payloads = load_payloads(session, [getattr(row, hash_field) for row in rows])
+    return [listing_model.model_validate({**row._mapping, payload_field: payloads[getattr(row, hash_field)].text}) for row in rows]
+
+def listing_entry(summaries: list) -> tuple:
+    # Tagged by content, so the ETag changes exactly when the cached page does
+    body = json.dumps([summary.model_dump(mode="json") for summary in summaries]).encode()
+    return summaries, body_etag(body)
+
+def increment_likes_statement(model, item_id: int):
+    # One atomic UPDATE ... RETURNING: no read-modify-write, so concurrent likes can't be lost
+    return (
+        update(model)
+        .where(model.id == item_id)
+        .values(likes_count=model.likes_count + 1)
+        .returning(model.likes_count)
+    )
+
+@router.get("/workspaces", response_model=Union[List[SharedWorkspaceListing], List[SharedWorkspaceSummary]])
+def get_public_workspaces(
+    request: Request,
+    response: Response,
+    sort: ListingSort = "recent",
+    offset: int = 0,
+    limit: int = Query(default=20, le=100),
+    include: Optional[Literal["layout"]] = None,
+    session: Session = Depends(get_public_read_session)
+):
+    key = ("workspaces", sort, offset, limit, include)
+    entry = listing_cache.get(key)
+    if entry is None:
+        if include:
+            rows = session.exec(listing_statement(SharedWorkspace, SharedWorkspaceListing, sort, offset, limit)).all()
+            entry = listing_entry(to_listings(session, SharedWorkspaceListing, "layout_hash", "layout_json", rows))
+        else:
+            rows = session.exec(listing_statement(SharedWorkspace, SharedWorkspaceSummary, sort, offset, limit)).all()
+            entry = listing_entry(to_summaries(SharedWorkspaceSummary, rows))
+        listing_cache.set(key, entry)
+    summaries, etag = entry
+    # A hot page answers 304 straight from memory, without touching the database
+    check_etag(request, response, etag)
+    return summaries
+
+@router.get("/workspaces/{workspace_id}", response_model=SharedWorkspaceRead)
+def get_public_workspace(workspace_id: int, request: Request, response: Response, session: Session = Depends(get_public_read_session)):
+    workspace = session.get(SharedWorkspace, workspace_id)
+    if not workspace or not workspace.is_public:
+        raise HTTPException(status_code=404, detail="Workspace not found")
+    read = SharedWorkspaceRead.model_validate(workspace, update={"layout_json": load_payload(session, workspace.layout_hash).text})
+    check_etag(request, response, body_etag(read.model_dump_json().encode()))
+    return read
+
+@router.post("/workspaces/share", response_model=SharedWorkspaceRead)
 def share_workspace(
-    workspace: SharedWorkspace, 
+    workspace: SharedWorkspaceCreate,
     user: dict = Depends(get_current_user), 
     session: Session = Depends(get_session)
 ):
-    workspace.user_id = user["sub"]
-    session.add(workspace)
+    try:
+        layout_hash, normalized = store_blob(session, workspace.layout_json)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="layout_json is not valid JSON")
+    db_workspace = SharedWorkspace.model_validate(workspace, update={"user_id": user["user_id"], "layout_hash": layout_hash})
+    session.add(db_workspace)
     session.commit()
-    session.refresh(workspace)
-    return workspace
+    session.refresh(db_workspace)
+    listing_cache.invalidate("workspaces")
+    return SharedWorkspaceRead.model_validate(db_workspace, update={"layout_json": normalized})
 
 @router.post("/workspaces/{workspace_id}/like")
 def like_workspace(
     workspace_id: int, 
     session: Session = Depends(get_session)
 ):
-    workspace = session.get(SharedWorkspace, workspace_id)
-    if not workspace:
+    likes_count = session.exec(increment_likes_statement(SharedWorkspace, workspace_id)).scalar_one_or_none()
+    if likes_count is None:
         raise HTTPException(status_code=404, detail="Workspace not found")
-    workspace.likes_count += 1
-    session.add(workspace)
     session.commit()
-    session.refresh(workspace)
-    return {"likes_count": workspace.likes_count}
+    return {"likes_count": likes_count}
 
-@router.get("/widgets", response_model=List[SharedWidget])
-def get_public_widgets(session: Session = Depends(get_session)):
-    return session.exec(select(SharedWidget).where(SharedWidget.is_public == True)).all()
+@router.get("/widgets", response_model=Union[List[SharedWidgetListing], List[SharedWidgetSummary]])
+def get_public_widgets(
+    request: Request,
+    response: Response,
+    sort: ListingSort = "recent",
+    offset: int = 0,
+    limit: int = Query(default=20, le=100),
+    include: Optional[Literal["config"]] = None,
+    session: Session = Depends(get_public_read_session)
+):
+    key = ("widgets", sort, offset, limit, include)
+    entry = listing_cache.get(key)
+    if entry is None:
+        if include:
+            rows = session.exec(listing_statement(SharedWidget, SharedWidgetListing, sort, offset, limit)).all()
+            entry = listing_entry(to_listings(session, SharedWidgetListing, "config_hash", "config_json", rows))
+        else:
+            rows = session.exec(listing_statement(SharedWidget, SharedWidgetSummary, sort, offset, limit)).all()
+            entry = listing_entry(to_summaries(SharedWidgetSummary, rows))
+        listing_cache.set(key, entry)
+    summaries, etag = entry
+    # A hot page answers 304 straight from memory, without touching the database
+    check_etag(request, response, etag)
+    return summaries
 
-@router.post("/widgets/share")
+@router.get("/widgets/{widget_id}", response_model=SharedWidgetRead)
+def get_public_widget(widget_id: int, request: Request, response: Response, session: Session = Depends(get_public_read_session)):
+    widget = session.get(SharedWidget, widget_id)
+    if not widget or not widget.is_public:
+        raise HTTPException(status_code=404, detail="Widget not found")
+    read = SharedWidgetRead.model_validate(widget, update={"config_json": load_payload(session, widget.config_hash).text})
+    check_etag(request, response, body_etag(read.model_dump_json().encode()))
+    return read
+
+@router.post("/widgets/share", response_model=SharedWidgetRead)
 def share_widget(
-    widget: SharedWidget, 
+    widget: SharedWidgetCreate,
     user: dict = Depends(get_current_user), 
     session: Session = Depends(get_session)
 ):
-    widget.user_id = user["sub"]
-    session.add(widget)
+    try:
+        config_hash, normalized = store_blob(session, widget.config_json)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="config_json is not valid JSON")
+    db_widget = SharedWidget.model_validate(widget, update={"user_id": user["user_id"], "config_hash": config_hash})
+    session.add(db_widget)
     session.commit()
-    session.refresh(widget)
-    return widget
+    session.refresh(db_widget)
+    listing_cache.invalidate("widgets")
+    return SharedWidgetRead.model_validate(db_widget, update={"config_json": normalized})
 
 @router.post("/widgets/{widget_id}/like")
 def like_widget(
     widget_id: int, 
     session: Session = Depends(get_session)
 ):
-    widget = session.get(SharedWidget, widget_id)
-    if not widget:
+    likes_count = session.exec(increment_likes_statement(SharedWidget, widget_id)).scalar_one_or_none()
+    if likes_count is None:
         raise HTTPException(status_code=404, detail="Widget not found")
-    widget.likes_count += 1
-    session.add(widget)
     session.commit()
-    session.refresh(widget)
-    return {"likes_count": widget.likes_count}
+    return {"likes_count": likes_count}
+
+@router.get("/blobs/{blob_hash}")
+def get_blob(blob_hash: str, request: Request, session: Session = Depends(get_public_read_session)):
+    # Layouts and configs by content hash: immutable, strongly tagged, pre-compressed
+    payload = load_payload(session, blob_hash)
+    if payload is None:
+        raise HTTPException(status_code=404, detail="Blob not found")
+    return payload_response(request, payload)
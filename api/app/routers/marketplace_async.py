@@ -0,0 +1,144 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlmodel.ext.asyncio.session import AsyncSession
+from database import get_async_session
+from replicas import get_async_public_read_session
+from models import SharedWorkspace, SharedWorkspaceCreate, SharedWorkspaceRead, SharedWidget, SharedWidgetCreate, SharedWidgetRead, SharedWorkspaceSummary, SharedWidgetSummary, SharedWorkspaceListing, SharedWidgetListing
+from auth import get_current_user
+from routers.marketplace import ListingSort, increment_likes_statement, listing_cache, listing_entry, listing_statement, to_listings, to_summaries
+from typing import List, Literal, Optional, Union
+from versions import check_etag, body_etag
+from blobs import store_blob, load_payload, payload_response
+
+# Async counterpart of routers/marketplace.py, used when DATABASE_URL names an async driver
+router = APIRouter()
+
+@router.get("/workspaces", response_model=Union[List[SharedWorkspaceListing], List[SharedWorkspaceSummary]])
+async def get_public_workspaces(
+    request: Request,
+    response: Response,
+    sort: ListingSort = "recent",
+    offset: int = 0,
+    limit: int = Query(default=20, le=100),
+    include: Optional[Literal["layout"]] = None,
+    session: AsyncSession = Depends(get_async_public_read_session)
+):
+    key = ("workspaces", sort, offset, limit, include)
+    entry = listing_cache.get(key)
+    if entry is None:
+        if include:
+            rows = (await session.exec(listing_statement(SharedWorkspace, SharedWorkspaceListing, sort, offset, limit))).all()
+            entry = listing_entry(await session.run_sync(to_listings, SharedWorkspaceListing, "layout_hash", "layout_json", rows))
+        else:
+            rows = (await session.exec(listing_statement(SharedWorkspace, SharedWorkspaceSummary, sort, offset, limit))).all()
+            entry = listing_entry(to_summaries(SharedWorkspaceSummary, rows))
+        listing_cache.set(key, entry)
+    summaries, etag = entry
+    # A hot page answers 304 straight from memory, without touching the database
+    check_etag(request, response, etag)
+    return summaries
+
+@router.get("/workspaces/{workspace_id}", response_model=SharedWorkspaceRead)
+async def get_public_workspace(workspace_id: int, request: Request, response: Response, session: AsyncSession = Depends(get_async_public_read_session)):
+    workspace = await session.get(SharedWorkspace, workspace_id)
+    if not workspace or not workspace.is_public:
+        raise HTTPException(status_code=404, detail="Workspace not found")
+    read = SharedWorkspaceRead.model_validate(workspace, update={"layout_json": (await session.run_sync(load_payload, workspace.layout_hash)).text})
+    check_etag(request, response, body_etag(read.model_dump_json().encode()))
+    return read
+
+@router.post("/workspaces/share", response_model=SharedWorkspaceRead)
+async def share_workspace(
+    workspace: SharedWorkspaceCreate,
+    user: dict = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session)
+):
+    try:
+        layout_hash, normalized = await session.run_sync(store_blob, workspace.layout_json)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="layout_json is not valid JSON")
+    db_workspace = SharedWorkspace.model_validate(workspace, update={"user_id": user["user_id"], "layout_hash": layout_hash})
+    session.add(db_workspace)
+    await session.commit()
+    await session.refresh(db_workspace)
+    listing_cache.invalidate("workspaces")
+    return SharedWorkspaceRead.model_validate(db_workspace, update={"layout_json": normalized})
+
+@router.post("/workspaces/{workspace_id}/like")
+async def like_workspace(
+    workspace_id: int,
+    session: AsyncSession = Depends(get_async_session)
+):
+    likes_count = (await session.exec(increment_likes_statement(SharedWorkspace, workspace_id))).scalar_one_or_none()
+    if likes_count is None:
+        raise HTTPException(status_code=404, detail="Workspace not found")
+    await session.commit()
+    return {"likes_count": likes_count}
+
+@router.get("/widgets", response_model=Union[List[SharedWidgetListing], List[SharedWidgetSummary]])
+async def get_public_widgets(
+    request: Request,
+    response: Response,
+    sort: ListingSort = "recent",
+    offset: int = 0,
+    limit: int = Query(default=20, le=100),
+    include: Optional[Literal["config"]] = None,
+    session: AsyncSession = Depends(get_async_public_read_session)
+):
+    key = ("widgets", sort, offset, limit, include)
+    entry = listing_cache.get(key)
+    if entry is None:
+        if include:
+            rows = (await session.exec(listing_statement(SharedWidget, SharedWidgetListing, sort, offset, limit))).all()
+            entry = listing_entry(await session.run_sync(to_listings, SharedWidgetListing, "config_hash", "config_json", rows))
+        else:
+            rows = (await session.exec(listing_statement(SharedWidget, SharedWidgetSummary, sort, offset, limit))).all()
+            entry = listing_entry(to_summaries(SharedWidgetSummary, rows))
+        listing_cache.set(key, entry)
+    summaries, etag = entry
+    # A hot page answers 304 straight from memory, without touching the database
+    check_etag(request, response, etag)
+    return summaries
+
+@router.get("/widgets/{widget_id}", response_model=SharedWidgetRead)
+async def get_public_widget(widget_id: int, request: Request, response: Response, session: AsyncSession = Depends(get_async_public_read_session)):
+    widget = await session.get(SharedWidget, widget_id)
+    if not widget or not widget.is_public:
+        raise HTTPException(status_code=404, detail="Widget not found")
+    read = SharedWidgetRead.model_validate(widget, update={"config_json": (await session.run_sync(load_payload, widget.config_hash)).text})
+    check_etag(request, response, body_etag(read.model_dump_json().encode()))
+    return read
+
+@router.post("/widgets/share", response_model=SharedWidgetRead)
+async def share_widget(
+    widget: SharedWidgetCreate,
+    user: dict = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session)
+):
+    try:
+        config_hash, normalized = await session.run_sync(store_blob, widget.config_json)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="config_json is not valid JSON")
+    db_widget = SharedWidget.model_validate(widget, update={"user_id": user["user_id"], "config_hash": config_hash})
+    session.add(db_widget)
+    await session.commit()
+    await session.refresh(db_widget)
+    listing_cache.invalidate("widgets")
+    return SharedWidgetRead.model_validate(db_widget, update={"config_json": normalized})
+
+@router.post("/widgets/{widget_id}/like")
+async def like_widget(
+    widget_id: int,
+    session: AsyncSession = Depends(get_async_session)
+):
+    likes_count = (await session.exec(increment_likes_statement(SharedWidget, widget_id))).scalar_one_or_none()
+    if likes_count is None:
+        raise HTTPException(status_code=404, detail="Widget not found")
+    await session.commit()
+    return {"likes_count": likes_count}
+
+@router.get("/blobs/{blob_hash}")
+async def get_blob(blob_hash: str, request: Request, session: AsyncSession = Depends(get_async_public_read_session)):
+    payload = await session.run_sync(load_payload, blob_hash)
+    if payload is None:
+        raise HTTPException(status_code=404, detail="Blob not found")
+    return payload_response(request, payload)
@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlmodel import Session, select
-from typing import List
+from typing import List, Optional
 from database import get_session
-from models import Note, NoteCreate, NoteRead, NoteUpdate
+from replicas import get_read_session
+from models import Note, NoteCreate, NoteBatchCreate, NoteRead, NoteUpdate, BatchCreateResult
 from auth import get_current_user
+from crud import bulk_create, paginate, set_next_cursor, FAST_JSON, read_columns, fast_list
+from versions import collection_etag, check_etag, row_etag, set_last_modified
 
 router = APIRouter(prefix="/notes", tags=["notes"])
 
@@ -13,33 +16,54 @@ def create_note(
     session: Session = Depends(get_session),
     current_user: dict = Depends(get_current_user)
 ):
-    db_note = Note.model_validate(note)
-    db_note.user_id = current_user["user_id"]
+    db_note = Note.model_validate(note, update={"user_id": current_user["user_id"]})
     session.add(db_note)
     session.commit()
     session.refresh(db_note)
     return db_note
 
+@router.post("/batch", response_model=BatchCreateResult)
+def create_notes_batch(
+    notes: List[NoteBatchCreate],
+    session: Session = Depends(get_session),
+    current_user: dict = Depends(get_current_user)
+):
+    # Offline sync replays the whole queue here in one round trip
+    return bulk_create(session, Note, notes, current_user["user_id"])
+
 @router.get("/", response_model=List[NoteRead])
 def read_notes(
+    request: Request,
+    response: Response,
     offset: int = 0, 
     limit: int = Query(default=100, le=100), 
-    session: Session = Depends(get_session),
+    cursor: Optional[str] = None,
+    session: Session = Depends(get_read_session),
     current_user: dict = Depends(get_current_user)
 ):
-    statement = select(Note).where(Note.user_id == current_user["user_id"]).offset(offset).limit(limit)
+    check_etag(request, response, collection_etag(session, current_user["user_id"], "notes", request))
+    # cursor takes precedence over offset; the next one comes back in X-Next-Cursor
+    if FAST_JSON:
+        statement = paginate(select(*read_columns(Note, NoteRead)).where(Note.user_id == current_user["user_id"]), Note, cursor, offset, limit)
+        return fast_list(session.exec(statement).all(), limit, response)
+    statement = paginate(select(Note).where(Note.user_id == current_user["user_id"]), Note, cursor, offset, limit)
     notes = session.exec(statement).all()
+    set_next_cursor(response, notes, limit)
     return notes
 
 @router.get("/{note_id}", response_model=NoteRead)
 def read_note(
     note_id: int, 
-    session: Session = Depends(get_session),
+    request: Request,
+    response: Response,
+    session: Session = Depends(get_read_session),
     current_user: dict = Depends(get_current_user)
 ):
     note = session.get(Note, note_id)
     if not note or note.user_id != current_user["user_id"]:
         raise HTTPException(status_code=404, detail="Note not found")
+    check_etag(request, response, row_etag(note, request))
+    set_last_modified(response, note.updated_at)
     return note
 
 @router.patch("/{note_id}", response_model=NoteRead)
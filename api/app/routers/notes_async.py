@@ -0,0 +1,101 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import List, Optional
+from database import get_async_session
+from replicas import get_async_read_session
+from models import Note, NoteCreate, NoteBatchCreate, NoteRead, NoteUpdate, BatchCreateResult
+from auth import get_current_user
+from crud import bulk_create, paginate, set_next_cursor, FAST_JSON, read_columns, fast_list
+from versions import collection_etag, check_etag, row_etag, set_last_modified
+
+# Async counterpart of routers/notes.py, used when DATABASE_URL names an async driver
+router = APIRouter(prefix="/notes", tags=["notes"])
+
+@router.post("/", response_model=NoteRead)
+async def create_note(
+    note: NoteCreate,
+    session: AsyncSession = Depends(get_async_session),
+    current_user: dict = Depends(get_current_user)
+):
+    db_note = Note.model_validate(note, update={"user_id": current_user["user_id"]})
+    session.add(db_note)
+    await session.commit()
+    await session.refresh(db_note)
+    return db_note
+
+@router.post("/batch", response_model=BatchCreateResult)
+async def create_notes_batch(
+    notes: List[NoteBatchCreate],
+    session: AsyncSession = Depends(get_async_session),
+    current_user: dict = Depends(get_current_user)
+):
+    return await session.run_sync(bulk_create, Note, notes, current_user["user_id"])
+
+@router.get("/", response_model=List[NoteRead])
+async def read_notes(
+    request: Request,
+    response: Response,
+    offset: int = 0,
+    limit: int = Query(default=100, le=100),
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_async_read_session),
+    current_user: dict = Depends(get_current_user)
+):
+    check_etag(request, response, await session.run_sync(collection_etag, current_user["user_id"], "notes", request))
+    # cursor takes precedence over offset; the next one comes back in X-Next-Cursor
+    if FAST_JSON:
+        statement = paginate(select(*read_columns(Note, NoteRead)).where(Note.user_id == current_user["user_id"]), Note, cursor, offset, limit)
+        return fast_list((await session.exec(statement)).all(), limit, response)
+    statement = paginate(select(Note).where(Note.user_id == current_user["user_id"]), Note, cursor, offset, limit)
+    notes = (await session.exec(statement)).all()
+    set_next_cursor(response, notes, limit)
+    return notes
+
+@router.get("/{note_id}", response_model=NoteRead)
+async def read_note(
+    note_id: int,
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_async_read_session),
+    current_user: dict = Depends(get_current_user)
+):
+    note = await session.get(Note, note_id)
+    if not note or note.user_id != current_user["user_id"]:
+        raise HTTPException(status_code=404, detail="Note not found")
+    check_etag(request, response, row_etag(note, request))
+    set_last_modified(response, note.updated_at)
+    return note
+
+@router.patch("/{note_id}", response_model=NoteRead)
+async def update_note(
+    note_id: int,
+    note: NoteUpdate,
+    session: AsyncSession = Depends(get_async_session),
+    current_user: dict = Depends(get_current_user)
+):
+    db_note = await session.get(Note, note_id)
+    if not db_note or db_note.user_id != current_user["user_id"]:
+        raise HTTPException(status_code=404, detail="Note not found")
+
+    note_data = note.model_dump(exclude_unset=True)
+    for key, value in note_data.items():
+        setattr(db_note, key, value)
+
+    session.add(db_note)
+    await session.commit()
+    await session.refresh(db_note)
+    return db_note
+
+@router.delete("/{note_id}")
+async def delete_note(
+    note_id: int,
+    session: AsyncSession = Depends(get_async_session),
+    current_user: dict = Depends(get_current_user)
+):
+    note = await session.get(Note, note_id)
+    if not note or note.user_id != current_user["user_id"]:
+        raise HTTPException(status_code=404, detail="Note not found")
+    await session.delete(note)
+    await session.commit()
+    return {"ok": True}
@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Depends, Query
+from sqlmodel import Session
+from typing import List, Literal, Optional
+from replicas import get_read_session
+from models import SearchHit
+from auth import get_current_user
+from search import search_documents
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+@router.get("/", response_model=List[SearchHit])
+def search(
+    q: str = Query(min_length=1, max_length=200),
+    kind: Optional[Literal["note", "client"]] = None,
+    offset: int = 0,
+    limit: int = Query(default=20, le=100),
+    session: Session = Depends(get_read_session),
+    current_user: dict = Depends(get_current_user)
+):
+    return search_documents(session, current_user["user_id"], q, kind, offset, limit)
@@ -0,0 +1,123 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func
+from sqlmodel import Session, select
+from typing import Optional
+from datetime import datetime
+import base64
+import json
+import os
+import time
+from database import get_session
+from models import ChangeLog, SyncChanges
+from auth import get_current_user
+from changes import CHANGELOG_RETENTION_DAYS, TRACKED_MODELS, owned_by, read_rows
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+
+# Change log entries (or snapshot rows) returned per call; has_more tells the client to ask again
+SYNC_PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", "1000"))
+# Change log ids are taken at flush, not commit, so on Postgres an entry can
+# become visible after a higher id was already synced past. Each call also
+# re-sends entries logged this long before its token was issued; clients
+# apply upserts and deletes idempotently, so repeats are harmless.
+SYNC_RESCAN_WINDOW = float(os.getenv("SYNC_RESCAN_WINDOW", "60"))  # seconds, longer than any write transaction
+
+# Tokens hold the last change log id sent, when they were issued, and while
+# the first sync is still paging through current rows, where it got to
+def encode_token(state: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(state).encode()).decode().rstrip("=")
+
+def decode_token(token: str) -> dict:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded))
+        state["id"] = int(state["id"])
+        # Tokens from before they carried a time count as expired
+        state["at"] = float(state.get("at", 0))
+        return state
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+
+def empty_changes() -> dict:
+    return {name: {"upserted": [], "deleted": []} for name in TRACKED_MODELS.values()}
+
+def read_snapshot(session: Session, user_id: str, state: dict) -> SyncChanges:
+    # The first sync sends current rows model by model in id order; the last
+    # page hands over to the change log where it stood when the snapshot began
+    changes = empty_changes()
+    models = list(TRACKED_MODELS.items())
+    index, after = state["snapshot"]
+    budget = SYNC_PAGE_SIZE
+    while index < len(models) and budget > 0:
+        model, name = models[index]
+        statement = owned_by(select(model), model, user_id).where(model.id > after).order_by(model.id).limit(budget + 1)
+        rows = session.exec(statement).all()
+        if len(rows) > budget:
+            rows = rows[:budget]
+            after = rows[-1].id
+        else:
+            index, after = index + 1, 0
+        changes[name]["upserted"] = rows
+        budget -= len(rows)
+
+    if index < len(models):
+        return SyncChanges(**changes, next_token=encode_token({**state, "snapshot": [index, after]}), has_more=True)
+    return SyncChanges(**changes, next_token=encode_token({"id": state["id"], "at": state["at"]}), has_more=False)
+
+def read_log(session: Session, user_id: str, state: dict) -> SyncChanges:
+    last_id = state["id"]
+    issued = time.time()
+    # Late commits at or below the token, found by when they were logged. Not
+    # counted against the page, so they can never hold the token back.
+    rescan_from = datetime.utcfromtimestamp(state["at"] - SYNC_RESCAN_WINDOW)
+    late = session.exec(
+        select(ChangeLog)
+        .where(ChangeLog.user_id == user_id, ChangeLog.changed_at >= rescan_from, ChangeLog.id <= last_id)
+        .order_by(ChangeLog.id)
+    ).all()
+    statement = (
+        select(ChangeLog)
+        .where(ChangeLog.user_id == user_id, ChangeLog.id > last_id)
+        .order_by(ChangeLog.id)
+        .limit(SYNC_PAGE_SIZE + 1)
+    )
+    entries = session.exec(statement).all()
+    has_more = len(entries) > SYNC_PAGE_SIZE
+    entries = entries[:SYNC_PAGE_SIZE]
+
+    # Collapse to the latest change per row
+    latest = {}
+    for entry in [*late, *entries]:
+        latest[(entry.resource, entry.resource_id)] = entry.deleted
+
+    changes = empty_changes()
+    for model, name in TRACKED_MODELS.items():
+        upserted_ids = [row_id for (resource, row_id), deleted in latest.items() if resource == name and not deleted]
+        changes[name]["deleted"] = [row_id for (resource, row_id), deleted in latest.items() if resource == name and deleted]
+        # Rows deleted after this page was logged are simply missing; their tombstone comes later
+        changes[name]["upserted"] = read_rows(session, model, user_id, upserted_ids)
+
+    next_id = entries[-1].id if entries else last_id
+    return SyncChanges(**changes, next_token=encode_token({"id": next_id, "at": issued}), has_more=has_more)
+
+@router.get("/changes", response_model=SyncChanges)
+def read_changes(
+    since: Optional[str] = None,
+    session: Session = Depends(get_session),
+    current_user: dict = Depends(get_current_user)
+):
+    user_id = current_user["user_id"]
+
+    if since is None:
+        # No token yet: snapshot everything, then follow the log from the newest
+        # change we know of. Anything written meanwhile is re-sent, upserts are idempotent.
+        last_id = session.exec(select(func.max(ChangeLog.id)).where(ChangeLog.user_id == user_id)).one() or 0
+        return read_snapshot(session, user_id, {"id": last_id, "at": time.time(), "snapshot": [0, 0]})
+
+    state = decode_token(since)
+    if state["at"] - SYNC_RESCAN_WINDOW < time.time() - CHANGELOG_RETENTION_DAYS * 86400:
+        # Entries this token still needs may have been pruned
+        raise HTTPException(status_code=410, detail="Sync token expired, sync again without since")
+    if "snapshot" in state:
+        return read_snapshot(session, user_id, state)
+    return read_log(session, user_id, state)
@@ -0,0 +1,154 @@
+from sqlalchemy import event, text
+from sqlmodel import Session, select
+from typing import Iterable, List, Optional
+from models import Client, Note, SearchHit
+import re
+
+# Full-text index over notes and clients. SQLite keeps it in an FTS5 virtual
+# table, Postgres in a table with a generated tsvector column under a GIN
+# index. Either way rows are (kind, resource_id, user_id, body) and are
+# rewritten by the session hooks below whenever a note or client changes.
+# FTS5 can't index a column for equality, so there each row also carries its
+# owner as one indexed token (user_key) that every query matches first.
+INDEXED_MODELS = {Note: "note", Client: "client"}
+INDEXED_COLUMNS = {Note: (Note.content,), Client: (Client.name, Client.email, Client.notes)}
+
+SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        body, user_key, kind UNINDEXED, resource_id UNINDEXED, user_id UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+]
+
+POSTGRES_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS search_index (
+        kind TEXT NOT NULL,
+        resource_id INTEGER NOT NULL,
+        user_id TEXT NOT NULL,
+        body TEXT NOT NULL,
+        tsv TSVECTOR GENERATED ALWAYS AS (to_tsvector('simple', body)) STORED,
+        PRIMARY KEY (kind, resource_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_search_index_tsv ON search_index USING GIN (tsv)",
+    "CREATE INDEX IF NOT EXISTS ix_search_index_user_id ON search_index (user_id)",
+]
+
+def _is_postgres(session: Session) -> bool:
+    return session.connection().dialect.name == "postgresql"
+
+def user_key(user_id: str) -> str:
+    # Hex is a single unicode61 token whatever the id contains, and never equals another user's
+    return "u" + user_id.encode().hex()
+
+def _document(model, resource_id: int, user_id: str, get) -> dict:
+    # get reads a field, so ORM objects and plain row dicts index the same way
+    if model is Note:
+        body = get("content") or ""
+    else:
+        body = " ".join(part for part in (get("name"), get("email"), get("notes")) if part)
+    return {"kind": INDEXED_MODELS[model], "resource_id": resource_id, "user_id": user_id, "user_key": user_key(user_id), "body": body}
+
+def _documents(objs: Iterable) -> list:
+    return [_document(type(obj), obj.id, obj.user_id, obj.__getattribute__) for obj in objs]
+
+def _remove(session: Session, keys: list):
+    if keys:
+        session.connection().execute(
+            text("DELETE FROM search_index WHERE kind = :kind AND resource_id = :resource_id"),
+            [{"kind": kind, "resource_id": resource_id} for kind, resource_id in keys],
+        )
+
+def _insert(session: Session, documents: list):
+    if not documents:
+        return
+    if _is_postgres(session):
+        statement = "INSERT INTO search_index (body, kind, resource_id, user_id) VALUES (:body, :kind, :resource_id, :user_id)"
+    else:
+        statement = "INSERT INTO search_index (body, user_key, kind, resource_id, user_id) VALUES (:body, :user_key, :kind, :resource_id, :user_id)"
+    session.connection().execute(text(statement), documents)
+
+def create_search_index(session: Session):
+    """Create the index if needed and fill it from existing rows the first time."""
+    for statement in POSTGRES_DDL if _is_postgres(session) else SQLITE_DDL:
+        session.connection().execute(text(statement))
+    if session.connection().execute(text("SELECT 1 FROM search_index LIMIT 1")).first() is None:
+        for model, columns in INDEXED_COLUMNS.items():
+            # Only the indexed columns: this runs as a migration, before later ones add columns to older databases
+            statement = select(model.id, model.user_id, *columns)
+            for chunk in session.exec(statement.execution_options(yield_per=1000)).partitions():
+                _insert(session, [_document(model, row.id, row.user_id, row._mapping.get) for row in chunk])
+    session.commit()
+
+def index_bulk(session: Session, model, ids: List[int], rows: List[dict]):
+    """Index rows inserted outside the unit of work (the batch endpoints)."""
+    if model not in INDEXED_MODELS:
+        return
+    _insert(session, [_document(model, row_id, row["user_id"], row.get) for row_id, row in zip(ids, rows)])
+
+def unindex_bulk(session: Session, model, ids: List[int]):
+    """Drop index rows for rows deleted outside the unit of work (set-based deletes)."""
+    if model in INDEXED_MODELS:
+        _remove(session, [(INDEXED_MODELS[model], row_id) for row_id in ids])
+
+@event.listens_for(Session, "after_flush")
+def _update_search_index(session, flush_context):
+    stale = []
+    fresh = []
+    for obj in session.new:
+        if type(obj) in INDEXED_MODELS:
+            fresh.append(obj)
+    for obj in session.dirty:
+        if type(obj) in INDEXED_MODELS and session.is_modified(obj, include_collections=False):
+            stale.append((INDEXED_MODELS[type(obj)], obj.id))
+            fresh.append(obj)
+    for obj in session.deleted:
+        if type(obj) in INDEXED_MODELS:
+            stale.append((INDEXED_MODELS[type(obj)], obj.id))
+    _remove(session, stale)
+    _insert(session, _documents(fresh))
+
+def _fts5_query(q: str) -> str:
+    # Quote every term so user input can't inject FTS5 syntax; the last one is a prefix match
+    terms = [term.replace('"', '""') for term in re.findall(r"\w+", q)]
+    if not terms:
+        return ""
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+def search_documents(session: Session, user_id: str, q: str, kind: Optional[str], offset: int, limit: int) -> List[SearchHit]:
+    params = {"user_id": user_id, "kind": kind, "limit": limit, "offset": offset}
+    kind_filter = "AND kind = :kind" if kind else ""
+    if _is_postgres(session):
+        params["q"] = q
+        statement = text(f"""
+            SELECT kind, resource_id, ts_headline('simple', body, query, 'MaxFragments=1,MaxWords=20') AS snippet,
+                   ts_rank(tsv, query) AS rank
+            FROM search_index, websearch_to_tsquery('simple', :q) AS query
+            WHERE user_id = :user_id AND tsv @@ query {kind_filter}
+            ORDER BY rank DESC, resource_id DESC
+            LIMIT :limit OFFSET :offset
+        """)
+    else:
+        terms = _fts5_query(q)
+        if not terms:
+            return []
+        # The owner's token narrows the match to their rows inside FTS5, rather than
+        # filtering every user's hits afterwards; user_id = :user_id stays as a check
+        params["q"] = f'user_key : "{user_key(user_id)}" AND body : ({terms})'
+        # bm25() is lower for better matches, flip it so higher rank means better on both backends.
+        # user_key matches all of the user's rows, so it gets no weight.
+        statement = text(f"""
+            SELECT kind, resource_id, snippet(search_index, 0, '', '', '...', 16) AS snippet,
+                   -bm25(search_index, 1.0, 0.0) AS rank
+            FROM search_index
+            WHERE search_index MATCH :q AND user_id = :user_id {kind_filter}
+            ORDER BY rank DESC, resource_id DESC
+            LIMIT :limit OFFSET :offset
+        """)
+    rows = session.connection().execute(statement, params).all()
+    return [SearchHit(kind=row.kind, id=row.resource_id, snippet=row.snippet, rank=row.rank) for row in rows]
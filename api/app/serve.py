@@ -0,0 +1,83 @@
+"""Production server: `python serve.py` (the Docker image's command).
+
+Runs uvicorn's process supervisor with one worker per available CPU by
+default, restarting workers that die or reach MAX_REQUESTS. Every setting
+below comes from the environment.
+"""
+import importlib.util
+import logging
+import math
+import os
+import tempfile
+import uvicorn
+from database import env_bool
+
+def available_cpus() -> int:
+    """CPUs this container may actually use: affinity mask, capped by a cgroup quota."""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    try:
+        # cgroup v2, e.g. "200000 100000" for --cpus=2, or "max 100000" for no limit
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY") or available_cpus())  # worker processes
+BACKLOG = int(os.getenv("BACKLOG", "2048"))  # pending connections the kernel queues per socket
+# Keep idle connections open longer than the load balancer does, or it reuses
+# a connection the server just closed and answers 502
+KEEP_ALIVE_TIMEOUT = int(os.getenv("KEEP_ALIVE_TIMEOUT", "75"))
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", "30"))  # seconds to drain in-flight requests on SIGTERM
+# Recycle a worker after this many requests (0 = never), to bound slow leaks;
+# the jitter keeps all workers from restarting at the same moment
+MAX_REQUESTS = int(os.getenv("MAX_REQUESTS", "0"))
+MAX_REQUESTS_JITTER = int(os.getenv("MAX_REQUESTS_JITTER", str(MAX_REQUESTS // 4)))
+ACCESS_LOG = env_bool("ACCESS_LOG", "false")  # /metrics already counts every request
+
+def _best(module: str, fallback: str) -> str:
+    # uvloop and httptools are C extensions that aren't available everywhere (Windows)
+    return module if importlib.util.find_spec(module) else fallback
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:     %(message)s")
+    # Migrate once here rather than racing in every worker's startup
+    from migrations import ensure_schema
+    from database import engine
+    ensure_schema(auto_migrate=True)
+    engine.dispose()
+
+    # Workers split the admission in-flight cap between them (see admission.py)
+    os.environ["WEB_CONCURRENCY"] = str(WEB_CONCURRENCY)
+    if WEB_CONCURRENCY > 1:
+        # Workers share their metrics through files (see metrics.py); start from
+        # empty so a previous run's counts aren't added in
+        metrics_dir = os.environ["METRICS_DIR"] = os.getenv("METRICS_DIR") or tempfile.mkdtemp(prefix="flowspace-metrics-")
+        for name in os.listdir(metrics_dir):
+            if name.endswith((".json", ".tmp")):
+                os.remove(os.path.join(metrics_dir, name))
+
+    uvicorn.run(
+        "main:app",
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+        host=HOST,
+        port=PORT,
+        workers=WEB_CONCURRENCY,
+        loop=_best("uvloop", "asyncio"),
+        http=_best("httptools", "h11"),
+        backlog=BACKLOG,
+        timeout_keep_alive=KEEP_ALIVE_TIMEOUT,
+        timeout_graceful_shutdown=GRACEFUL_TIMEOUT,
+        limit_max_requests=MAX_REQUESTS or None,
+        limit_max_requests_jitter=MAX_REQUESTS_JITTER if MAX_REQUESTS else 0,
+        access_log=ACCESS_LOG,
+        proxy_headers=True,
+        forwarded_allow_ips=os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+    )
+
+if __name__ == "__main__":
+    main()
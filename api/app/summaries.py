@@ -0,0 +1,124 @@
+from collections import defaultdict
+from sqlalchemy import event, func, case
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session, select
+from models import (
+    Invoice, InvoiceSummary, InvoiceSummaryRead, StatusTotal, ClientTotal, MonthTotal,
+)
+
+PAID_STATUS = "PAID"
+
+def _month(created_at) -> str:
+    return created_at.strftime("%Y-%m")
+
+def _old_value(state, name):
+    history = state.attrs[name].history
+    if history.deleted:
+        return history.deleted[0]
+    return history.unchanged[0] if history.unchanged else getattr(state.object, name)
+
+def _apply_deltas(session: Session, deltas: dict):
+    """Add (count, amount) deltas to the summary rows with a single upsert."""
+    rows = [
+        {"user_id": user_id, "client_id": client_id, "status": status, "month": month,
+         "invoice_count": count, "total_amount": amount}
+        for (user_id, client_id, status, month), (count, amount) in deltas.items()
+        if count or amount
+    ]
+    if not rows:
+        return
+    connection = session.connection()
+    dialect_insert = postgresql.insert if connection.dialect.name == "postgresql" else sqlite.insert
+    statement = dialect_insert(InvoiceSummary).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=["user_id", "client_id", "status", "month"],
+        set_={
+            "invoice_count": InvoiceSummary.invoice_count + statement.excluded.invoice_count,
+            "total_amount": InvoiceSummary.total_amount + statement.excluded.total_amount,
+        },
+    )
+    connection.execute(statement)
+
+def record_bulk_invoices(session: Session, rows: list):
+    """Count invoices inserted outside the unit of work (the batch endpoint)."""
+    deltas = defaultdict(lambda: [0, 0.0])
+    for row in rows:
+        key = (row["user_id"], row["client_id"], row["status"], _month(row["created_at"]))
+        deltas[key][0] += 1
+        deltas[key][1] += row["amount"] or 0.0
+    _apply_deltas(session, deltas)
+
+@event.listens_for(Session, "after_flush")
+def _update_invoice_summaries(session, flush_context):
+    deltas = defaultdict(lambda: [0, 0.0])
+
+    for obj in session.new:
+        if isinstance(obj, Invoice):
+            key = (obj.user_id, obj.client_id, obj.status, _month(obj.created_at))
+            deltas[key][0] += 1
+            deltas[key][1] += obj.amount or 0.0
+
+    for obj in session.deleted:
+        if isinstance(obj, Invoice):
+            state = sa_inspect(obj)
+            key = (obj.user_id, _old_value(state, "client_id"), _old_value(state, "status"), _month(obj.created_at))
+            deltas[key][0] -= 1
+            deltas[key][1] -= _old_value(state, "amount") or 0.0
+
+    for obj in session.dirty:
+        if isinstance(obj, Invoice) and session.is_modified(obj, include_collections=False):
+            state = sa_inspect(obj)
+            month = _month(obj.created_at)
+            old_key = (obj.user_id, _old_value(state, "client_id"), _old_value(state, "status"), month)
+            new_key = (obj.user_id, obj.client_id, obj.status, month)
+            deltas[old_key][0] -= 1
+            deltas[old_key][1] -= _old_value(state, "amount") or 0.0
+            deltas[new_key][0] += 1
+            deltas[new_key][1] += obj.amount or 0.0
+
+    if deltas:
+        _apply_deltas(session, deltas)
+
+def rebuild_invoice_summaries(session: Session):
+    """Recompute the summary table from the invoices themselves."""
+    session.exec(InvoiceSummary.__table__.delete())
+    statement = select(Invoice.user_id, Invoice.client_id, Invoice.status, Invoice.created_at, Invoice.amount)
+    deltas = defaultdict(lambda: [0, 0.0])
+    for user_id, client_id, status, created_at, amount in session.exec(statement.execution_options(yield_per=1000)):
+        key = (user_id, client_id, status, _month(created_at))
+        deltas[key][0] += 1
+        deltas[key][1] += amount or 0.0
+    _apply_deltas(session, deltas)
+    session.commit()
+
+def backfill_invoice_summaries(session: Session):
+    # Databases created before the summary table existed start out empty
+    if session.exec(select(InvoiceSummary).limit(1)).first() is None and session.exec(select(Invoice.id).limit(1)).first() is not None:
+        rebuild_invoice_summaries(session)
+
+def _grouped(session: Session, user_id: str, column, *extra):
+    count = func.sum(InvoiceSummary.invoice_count)
+    total = func.sum(InvoiceSummary.total_amount)
+    statement = (
+        select(column, count, total, *extra)
+        .where(InvoiceSummary.user_id == user_id, InvoiceSummary.invoice_count > 0)
+        .group_by(column)
+        .order_by(column)
+    )
+    return session.exec(statement).all()
+
+def read_invoice_summary(session: Session, user_id: str) -> InvoiceSummaryRead:
+    outstanding = func.sum(case((InvoiceSummary.status != PAID_STATUS, InvoiceSummary.total_amount), else_=0.0))
+    by_status = _grouped(session, user_id, InvoiceSummary.status)
+    by_client = _grouped(session, user_id, InvoiceSummary.client_id, outstanding)
+    by_month = _grouped(session, user_id, InvoiceSummary.month)
+
+    return InvoiceSummaryRead(
+        invoice_count=sum(row[1] for row in by_status),
+        total_amount=sum(row[2] for row in by_status),
+        outstanding_amount=sum(row[2] for row in by_status if row[0] != PAID_STATUS),
+        by_status=[StatusTotal(status=s, invoice_count=c, total_amount=t) for s, c, t in by_status],
+        by_client=[ClientTotal(client_id=i, invoice_count=c, total_amount=t, outstanding_amount=o) for i, c, t, o in by_client],
+        by_month=[MonthTotal(month=m, invoice_count=c, total_amount=t) for m, c, t in by_month],
+    )
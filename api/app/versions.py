@@ -0,0 +1,98 @@
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session, select
+from typing import Iterable, Optional
+from models import Client, Invoice, InvoiceItem, Note, CollectionVersion
+from changes import item_owners
+from datetime import datetime, timezone
+from email.utils import format_datetime
+import hashlib
+import uuid
+
+# Collections whose responses change when a model is written. Invoice reads
+# embed line items and (with ?expand=client) the client, so those bump invoices too.
+COLLECTIONS = {
+    Client: ("clients", "invoices"),
+    Invoice: ("invoices",),
+    InvoiceItem: ("invoices",),
+    Note: ("notes",),
+}
+
+def bump_versions(session: Session, model, user_ids: Iterable[str]):
+    """Give every affected collection of these users a new version token."""
+    rows = [
+        {"user_id": user_id, "collection": collection, "version": uuid.uuid4().hex}
+        for user_id in set(user_ids)
+        for collection in COLLECTIONS[model]
+    ]
+    if not rows:
+        return
+    connection = session.connection()
+    dialect_insert = postgresql.insert if connection.dialect.name == "postgresql" else sqlite.insert
+    statement = dialect_insert(CollectionVersion).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=["user_id", "collection"],
+        set_={"version": statement.excluded.version},
+    )
+    connection.execute(statement)
+
+@event.listens_for(Session, "after_flush")
+def _bump_flushed_versions(session, flush_context):
+    changed = [
+        obj for obj in [*session.new, *session.dirty, *session.deleted]
+        if type(obj) in COLLECTIONS and (obj not in session.dirty or session.is_modified(obj, include_collections=False))
+    ]
+    if not changed:
+        return
+    owners = item_owners(session, [obj for obj in changed if isinstance(obj, InvoiceItem)])
+    by_model = {}
+    for obj in changed:
+        user_id = owners.get(obj.invoice_id) if isinstance(obj, InvoiceItem) else obj.user_id
+        if user_id is not None:
+            by_model.setdefault(type(obj), set()).add(user_id)
+    for model, user_ids in by_model.items():
+        bump_versions(session, model, user_ids)
+
+def version_statement(user_id: str, collection: str):
+    return select(CollectionVersion.version).where(
+        CollectionVersion.user_id == user_id,
+        CollectionVersion.collection == collection,
+    )
+
+def make_etag(version: Optional[str], user_id: str, request: Request) -> str:
+    # One version covers every page and filter of the collection, so the
+    # request URL is mixed in to give each representation its own tag
+    digest = hashlib.sha256(f"{version}|{user_id}|{request.url.path}?{request.url.query}".encode()).hexdigest()[:32]
+    return f'W/"{digest}"'
+
+def collection_etag(session: Session, user_id: str, collection: str, request: Request) -> str:
+    return make_etag(session.exec(version_statement(user_id, collection)).first(), user_id, request)
+
+def row_etag(row, request: Request) -> str:
+    # A single row's representation changes only when the row itself does, so
+    # writes elsewhere in the collection leave its tag alone
+    return make_etag(f"{row.id}@{row.updated_at.isoformat()}", row.user_id, request)
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    # Weak comparison, as If-None-Match requires
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+def check_etag(request: Request, response: Response, etag: str):
+    """Answer 304 if the client already has this representation, otherwise tag the response."""
+    # Browsers may keep the body but must revalidate it, per user
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+    if etag_matches(request, etag):
+        raise HTTPException(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+def set_last_modified(response: Response, modified_at: datetime):
+    # Timestamps are stored as naive UTC
+    response.headers["Last-Modified"] = format_datetime(modified_at.replace(tzinfo=timezone.utc), usegmt=True)
+
+def body_etag(body: bytes) -> str:
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
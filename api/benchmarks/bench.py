@@ -0,0 +1,67 @@
+"""Run the endpoint scenarios in-process through httpx's ASGI transport.
+
+No server or network is involved, so the numbers measure the app itself:
+routing, validation, the ORM and the database. Seed first with seed.py, then
+
+    cd api && DATABASE_URL=sqlite:///bench.db python benchmarks/bench.py --save
+    cd api && DATABASE_URL=sqlite:///bench.db python benchmarks/bench.py --compare benchmarks/baselines/sqlite.json
+
+--compare exits non-zero when a scenario's p95 or throughput regressed past --threshold.
+"""
+import argparse
+import asyncio
+import importlib
+import os
+import sys
+import time
+
+from common import APP_DIR, BASELINE_DIR, select_scenarios, run_scenario, print_report, environment, save_baseline, compare_baseline
+
+sys.path.insert(0, APP_DIR)
+# Measure capacity, not the per-user rate limits every scenario would run into
+os.environ.setdefault("ADMISSION_CONTROL", "false")
+
+import httpx  # noqa: E402
+
+async def run(args, startup: dict) -> dict:
+    # Cold start is importing the app plus its lifespan startup (the schema check)
+    start = time.perf_counter()
+    app = importlib.import_module("main").app
+    startup["import_ms"] = (time.perf_counter() - start) * 1000
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    start = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        startup["lifespan_ms"] = (time.perf_counter() - start) * 1000
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for scenario in select_scenarios(args.scenarios):
+                # Warm caches and connection pools outside the measurement
+                await run_scenario(client, scenario, args.concurrency, requests=args.concurrency)
+                results[scenario.name] = await run_scenario(client, scenario, args.concurrency, requests=args.requests)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500, help="per scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--scenarios", help="comma-separated names, default all")
+    parser.add_argument("--save", nargs="?", const="", metavar="PATH", help="write results as a baseline (default baselines/<database>.json)")
+    parser.add_argument("--compare", metavar="PATH", help="baseline to check against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed p95/throughput change, default 15%%")
+    args = parser.parse_args()
+
+    startup = {}
+    results = asyncio.run(run(args, startup))
+    from database import DATABASE_URL
+    meta = environment(DATABASE_URL)
+    meta.update(requests=args.requests, concurrency=args.concurrency, startup=startup)
+    print(f"Startup: import {startup['import_ms']:.0f}ms, lifespan {startup['lifespan_ms']:.1f}ms")
+    print_report(results, f"In-process benchmark, {meta['database']}, {args.requests} requests x {args.concurrency} concurrent")
+
+    if args.save is not None:
+        save_baseline(args.save or os.path.join(BASELINE_DIR, f"{meta['database'].split('+')[0]}.json"), results, meta)
+    if args.compare and not compare_baseline(args.compare, results, args.threshold):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Scenarios, timing and reporting shared by bench.py and loadgen.py."""
+import asyncio
+import json
+import os
+import platform
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+import httpx
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    path: str
+    body: Optional[Callable[[int], dict]] = None
+
+SCENARIOS = [
+    Scenario("clients.list", "GET", "/clients/?limit=100"),
+    Scenario("clients.get", "GET", "/clients/1"),
+    Scenario("invoices.list", "GET", "/invoices/?limit=100"),
+    Scenario("invoices.expanded", "GET", "/invoices/?limit=50&expand=items,client"),
+    Scenario("invoices.summary", "GET", "/invoices/summary"),
+    Scenario("notes.list", "GET", "/notes/?limit=100"),
+    Scenario("search", "GET", "/search/?q=budget"),
+    Scenario("marketplace.workspaces", "GET", "/workspaces?sort=likes"),
+    Scenario("notes.create", "POST", "/notes/", lambda i: {"client_id": 1, "content": f"Benchmark note {i}"}),
+]
+
+def select_scenarios(names: Optional[str]) -> List[Scenario]:
+    if not names:
+        return SCENARIOS
+    wanted = set(names.split(","))
+    return [scenario for scenario in SCENARIOS if scenario.name in wanted]
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+    values = sorted(latencies)
+    return {
+        "requests": len(values) + errors,
+        "errors": errors,
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+        "rps": len(values) / elapsed if elapsed else 0.0,
+    }
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, concurrency: int,
+                       requests: Optional[int] = None, duration: Optional[float] = None) -> dict:
+    """Drive one scenario with a fixed number of workers until the request count or duration is reached."""
+    latencies = []
+    errors = 0
+    sent = 0
+    deadline = time.perf_counter() + duration if duration else None
+
+    def more() -> bool:
+        if deadline is not None:
+            return time.perf_counter() < deadline
+        return sent < requests
+
+    async def worker():
+        nonlocal errors, sent
+        while more():
+            i = sent
+            sent += 1
+            kwargs = {"json": scenario.body(i)} if scenario.body else {}
+            start = time.perf_counter()
+            try:
+                response = await client.request(scenario.method, scenario.path, **kwargs)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+def print_report(results: dict, title: str):
+    print(title)
+    print(f"{'scenario':<26}{'reqs':>7}{'errs':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}")
+    for name, r in results.items():
+        print(f"{name:<26}{r['requests']:>7}{r['errors']:>6}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['rps']:>10.1f}")
+
+def environment(database_url: str) -> dict:
+    return {
+        "database": database_url.split(":", 1)[0],
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+def save_baseline(path: str, results: dict, meta: dict):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2)
+    print(f"Saved baseline to {path}")
+
+def compare_baseline(path: str, results: dict, threshold: float) -> bool:
+    """Print p95/throughput changes against a saved run; False if any scenario regressed past threshold."""
+    with open(path) as f:
+        baseline = json.load(f)["results"]
+    ok = True
+    print(f"\nAgainst {path} (regression threshold {threshold:.0%})")
+    for name, r in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        p95_change = (r["p95_ms"] - base["p95_ms"]) / base["p95_ms"] if base["p95_ms"] else 0.0
+        rps_change = (r["rps"] - base["rps"]) / base["rps"] if base["rps"] else 0.0
+        regressed = p95_change > threshold or rps_change < -threshold
+        ok = ok and not regressed
+        flag = "REGRESSION" if regressed else ""
+        print(f"{name:<26} p95 {p95_change:+7.1%}   req/s {rps_change:+7.1%}   {flag}")
+    return ok
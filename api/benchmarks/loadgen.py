@@ -0,0 +1,58 @@
+"""Drive a running API over HTTP with the same scenarios as bench.py.
+
+Use this against a real server (uvicorn, docker compose) to include the
+network stack and server workers in the numbers:
+
+    python api/benchmarks/loadgen.py --url http://localhost:8000 --duration 30 --concurrency 50
+
+Without --token requests run as the mock user, so point it at a server
+running with mock auth and a database seeded by seed.py. Every request is
+then the same user, so start the server with ADMISSION_CONTROL=false unless
+the rate limits are what you want to measure.
+"""
+import argparse
+import asyncio
+import sys
+
+import httpx
+
+from common import select_scenarios, run_scenario, print_report, save_baseline, compare_baseline
+
+async def run(args) -> dict:
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+    async with httpx.AsyncClient(base_url=args.url, headers=headers, limits=limits, timeout=args.timeout) as client:
+        for scenario in select_scenarios(args.scenarios):
+            results[scenario.name] = await run_scenario(
+                client, scenario, args.concurrency,
+                requests=None if args.duration else args.requests,
+                duration=args.duration,
+            )
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--token", help="bearer token, omit for mock auth")
+    parser.add_argument("--requests", type=int, default=1000, help="per scenario")
+    parser.add_argument("--duration", type=float, help="seconds per scenario, overrides --requests")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--scenarios", help="comma-separated names, default all")
+    parser.add_argument("--save", metavar="PATH", help="write results as a baseline")
+    parser.add_argument("--compare", metavar="PATH", help="baseline to check against")
+    parser.add_argument("--threshold", type=float, default=0.15)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    load = f"{args.duration}s" if args.duration else f"{args.requests} requests"
+    print_report(results, f"Load against {args.url}, {load} x {args.concurrency} concurrent")
+
+    if args.save:
+        save_baseline(args.save, results, {"url": args.url, "concurrency": args.concurrency})
+    if args.compare and not compare_baseline(args.compare, results, args.threshold):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
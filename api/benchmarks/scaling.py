@@ -0,0 +1,83 @@
+"""Measure throughput against the production server at several worker counts.
+
+Starts app/serve.py with WEB_CONCURRENCY set to each count in turn, drives
+it over HTTP like loadgen.py, and prints req/s per scenario and the speedup
+over one worker. Seed the database first (seed.py); numbers only scale up
+to the number of CPUs the machine has.
+
+    cd api && DATABASE_URL=sqlite:///bench.db python benchmarks/scaling.py --workers 1,2,4,8
+"""
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import httpx
+
+from common import APP_DIR, select_scenarios, run_scenario
+
+DEFAULT_SCENARIOS = "clients.list,invoices.summary,search"
+
+def start_server(workers: int, port: int) -> subprocess.Popen:
+    # Rate limits would cap every worker count at the same per-user rate
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), PORT=str(port), HOST="127.0.0.1")
+    env.setdefault("ADMISSION_CONTROL", "false")
+    return subprocess.Popen([sys.executable, os.path.join(APP_DIR, "serve.py")], env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def wait_until_ready(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{url}/", timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not start within {timeout}s")
+
+async def measure(url: str, args) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        for scenario in select_scenarios(args.scenarios):
+            # Every worker imports and connects lazily; warm them all up first
+            await run_scenario(client, scenario, args.concurrency, duration=1)
+            results[scenario.name] = await run_scenario(client, scenario, args.concurrency, duration=args.duration)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per scenario")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--scenarios", default=DEFAULT_SCENARIOS)
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+
+    url = f"http://127.0.0.1:{args.port}"
+    table = {}
+    for workers in [int(w) for w in args.workers.split(",")]:
+        server = start_server(workers, args.port)
+        try:
+            wait_until_ready(url)
+            table[workers] = asyncio.run(measure(url, args))
+        finally:
+            # Exercise the same graceful drain a deploy would
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=60)
+        print(f"{workers} workers: " + ", ".join(f"{name} {r['rps']:.0f} req/s" for name, r in table[workers].items()))
+
+    names = list(next(iter(table.values())))
+    base = min(table)
+    print(f"\nThroughput (req/s) by worker count, {os.cpu_count()} CPUs, {args.concurrency} concurrent")
+    print(f"{'workers':<10}" + "".join(f"{name:>22}" for name in names))
+    for workers, results in table.items():
+        cells = "".join(f"{results[n]['rps']:>12.0f} ({results[n]['rps'] / table[base][n]['rps']:.2f}x)" for n in names)
+        print(f"{workers:<10}{cells}")
+
+if __name__ == "__main__":
+    main()
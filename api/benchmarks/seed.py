@@ -0,0 +1,180 @@
+"""Fill a database with synthetic users, clients, invoices, line items and notes.
+
+Sizes multiply: --users x --clients (per user) x --invoices / --notes (per
+client) x --items (per invoice). Rows are written with batched Core inserts
+and explicit ids, then the derived tables (invoice summaries, search index)
+are rebuilt once at the end, so millions of rows take minutes, not hours.
+The first user is the mock user, which is who unauthenticated benchmark
+requests run as.
+
+    cd api && DATABASE_URL=sqlite:///bench.db python benchmarks/seed.py --reset --users 20 --clients 100
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from sqlalchemy import insert, text  # noqa: E402
+from sqlmodel import SQLModel, Session, select  # noqa: E402
+from database import engine  # noqa: E402
+from migrations import migrate  # noqa: E402
+import search  # noqa: E402
+import summaries  # noqa: E402
+from models import Client, Invoice, InvoiceItem, Note, ContentBlob, SharedWorkspace, SharedWidget  # noqa: E402
+from blobs import blob_row, normalize_json  # noqa: E402
+
+MOCK_USER_ID = "mock-user-123"
+STATUSES = ["DRAFT", "SENT", "PAID"]
+WORDS = (
+    "budget timeline website redesign invoice payment logo branding meeting call "
+    "contract scope launch review feedback deadline retainer proposal analytics hosting "
+    "migration mobile campaign content strategy onboarding support renewal discount"
+).split()
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+def created_at(rng: random.Random, now: datetime) -> datetime:
+    # Spread over two years so the summary table has many months
+    return now - timedelta(days=rng.randrange(730), seconds=rng.randrange(86400))
+
+class BatchWriter:
+    """Buffers rows per table and flushes them with executemany."""
+
+    def __init__(self, batch_size: int):
+        self.batch_size = batch_size
+        self.pending = {}
+        self.counts = {}
+
+    def add(self, model, row: dict):
+        rows = self.pending.setdefault(model, [])
+        rows.append(row)
+        if len(rows) >= self.batch_size:
+            self.flush(model)
+
+    def flush(self, model=None):
+        for m in [model] if model else list(self.pending):
+            rows = self.pending.get(m)
+            if rows:
+                with engine.begin() as connection:
+                    connection.execute(insert(m.__table__), rows)
+                self.counts[m.__name__] = self.counts.get(m.__name__, 0) + len(rows)
+                self.pending[m] = []
+
+def reset():
+    SQLModel.metadata.drop_all(engine)
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE IF EXISTS search_index"))
+
+def fix_sequences():
+    # Explicit ids leave Postgres sequences behind; move them past the seeded rows
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as connection:
+        for model in (Client, Invoice, InvoiceItem, Note, SharedWorkspace, SharedWidget):
+            table = model.__tablename__
+            connection.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)"
+            ))
+
+def seed(args):
+    rng = random.Random(args.seed)
+    now = datetime.utcnow()
+    writer = BatchWriter(args.batch_size)
+    client_id = invoice_id = item_id = note_id = 0
+
+    for u in range(args.users):
+        user_id = MOCK_USER_ID if u == 0 else f"bench-user-{u}"
+        for _ in range(args.clients):
+            client_id += 1
+            stamp = created_at(rng, now)
+            writer.add(Client, {
+                "id": client_id, "user_id": user_id, "name": f"Client {client_id} {rng.choice(WORDS).title()}",
+                "email": f"client{client_id}@example.com", "notes": sentence(rng, 6),
+                "idempotency_key": None, "created_at": stamp, "updated_at": stamp,
+            })
+            for _ in range(args.invoices):
+                invoice_id += 1
+                stamp = created_at(rng, now)
+                prices = [round(rng.uniform(50, 2000), 2) for _ in range(args.items)]
+                writer.add(Invoice, {
+                    "id": invoice_id, "user_id": user_id, "client_id": client_id, "status": rng.choice(STATUSES),
+                    "amount": round(sum(prices), 2), "due_date": stamp + timedelta(days=30),
+                    "idempotency_key": None, "created_at": stamp, "updated_at": stamp,
+                })
+                for price in prices:
+                    item_id += 1
+                    writer.add(InvoiceItem, {
+                        "id": item_id, "invoice_id": invoice_id, "description": sentence(rng, 3),
+                        "quantity": 1, "price": price, "updated_at": stamp,
+                    })
+            for _ in range(args.notes):
+                note_id += 1
+                stamp = created_at(rng, now)
+                writer.add(Note, {
+                    "id": note_id, "user_id": user_id, "client_id": client_id, "content": sentence(rng, rng.randint(8, 60)),
+                    "idempotency_key": None, "created_at": stamp, "updated_at": stamp,
+                })
+
+    # A handful of templates, re-shared many times, as in the real marketplace
+    layouts = [blob_row(normalize_json(json.dumps({"widgets": [{"type": rng.choice(WORDS), "x": x, "y": y, "w": 4, "h": 3} for x in range(4) for y in range(n)]}))) for n in range(1, 9)]
+    configs = [blob_row(normalize_json(json.dumps({"title": rng.choice(WORDS), "refresh": n * 30}))) for n in range(1, 9)]
+    for row in layouts + configs:
+        writer.add(ContentBlob, row)
+
+    for i in range(args.shared):
+        stamp = created_at(rng, now)
+        writer.add(SharedWorkspace, {
+            "id": i + 1, "user_id": f"bench-user-{i % max(args.users, 1)}", "name": f"Workspace {i}",
+            "description": sentence(rng, 8), "layout_hash": rng.choice(layouts)["hash"], "is_public": True,
+            "likes_count": rng.randrange(500), "created_at": stamp,
+        })
+        writer.add(SharedWidget, {
+            "id": i + 1, "user_id": f"bench-user-{i % max(args.users, 1)}", "name": f"Widget {i}",
+            "description": sentence(rng, 8), "config_hash": rng.choice(configs)["hash"], "is_public": True,
+            "likes_count": rng.randrange(500), "created_at": stamp,
+        })
+    writer.flush()
+    return writer.counts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--clients", type=int, default=50, help="per user")
+    parser.add_argument("--invoices", type=int, default=20, help="per client")
+    parser.add_argument("--items", type=int, default=3, help="per invoice")
+    parser.add_argument("--notes", type=int, default=10, help="per client")
+    parser.add_argument("--shared", type=int, default=500, help="public workspaces and widgets")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42, help="random seed, runs are reproducible")
+    parser.add_argument("--reset", action="store_true", help="drop and recreate every table first")
+    args = parser.parse_args()
+
+    if args.reset:
+        reset()
+    migrate()
+    with Session(engine) as session:
+        if session.exec(select(Client.id).limit(1)).first() is not None:
+            sys.exit("Database already has clients; pass --reset to start from an empty one")
+
+    start = time.perf_counter()
+    counts = seed(args)
+    fix_sequences()
+    inserted = time.perf_counter() - start
+    # Summary table and search index are rebuilt from the rows in one pass each
+    with Session(engine) as session:
+        summaries.rebuild_invoice_summaries(session)
+        search.create_search_index(session)
+    total = time.perf_counter() - start
+
+    rows = sum(counts.values())
+    print(", ".join(f"{count} {name}" for name, count in counts.items()))
+    print(f"{rows} rows inserted in {inserted:.1f}s ({rows / inserted:.0f} rows/s), derived tables built in {total - inserted:.1f}s")
+
+if __name__ == "__main__":
+    main()
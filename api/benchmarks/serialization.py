@@ -0,0 +1,61 @@
+"""CPU per list request with and without FAST_JSON.
+
+Runs GET /notes/?limit=100 in-process against a throwaway SQLite database,
+once per mode in a fresh interpreter (FAST_JSON is read at import time),
+and reports CPU time per request.
+
+    cd api && python benchmarks/serialization.py [--requests 2000]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+
+def run(requests: int):
+    sys.path.insert(0, APP_DIR)
+    from fastapi.testclient import TestClient
+    from main import app
+
+    with TestClient(app) as client:
+        client.post("/notes/batch", json=[{"client_id": 1, "content": f"Benchmark note {i} " * 8} for i in range(100)])
+        for _ in range(50):
+            client.get("/notes/?limit=100")
+        start = time.process_time()
+        for _ in range(requests):
+            response = client.get("/notes/?limit=100")
+            assert response.status_code == 200
+        elapsed = time.process_time() - start
+    print(elapsed / requests * 1e6)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run(args.requests)
+        return
+
+    results = {}
+    for fast in ("0", "1"):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, FAST_JSON=fast, DATABASE_URL=f"sqlite:///{tmp}/bench.db")
+            output = subprocess.run(
+                [sys.executable, __file__, "--child", "--requests", str(args.requests)],
+                env=env, check=True, capture_output=True, text=True,
+            ).stdout
+            results[fast] = float(output.strip().splitlines()[-1])
+
+    slow, fast = results["0"], results["1"]
+    print(f"GET /notes/?limit=100, {args.requests} requests")
+    print(f"  default    {slow:8.0f} us CPU/request")
+    print(f"  FAST_JSON  {fast:8.0f} us CPU/request")
+    print(f"  saved      {slow - fast:8.0f} us ({(slow - fast) / slow:.0%})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+-- Tables as the original release's create_all built them (SQLite), before
+-- schema_version existed. test_migrations.py upgrades a database made from this.
+CREATE TABLE client (
+	name VARCHAR NOT NULL, 
+	email VARCHAR, 
+	notes VARCHAR, 
+	id INTEGER NOT NULL, 
+	user_id VARCHAR NOT NULL, 
+	created_at DATETIME NOT NULL, 
+	PRIMARY KEY (id)
+);
+CREATE INDEX ix_client_email ON client (email);
+CREATE INDEX ix_client_user_id ON client (user_id);
+CREATE INDEX ix_client_name ON client (name);
+CREATE TABLE sharedworkspace (
+	id INTEGER NOT NULL, 
+	user_id VARCHAR NOT NULL, 
+	name VARCHAR NOT NULL, 
+	description VARCHAR, 
+	layout_json VARCHAR NOT NULL, 
+	is_public BOOLEAN NOT NULL, 
+	likes_count INTEGER NOT NULL, 
+	created_at DATETIME NOT NULL, 
+	PRIMARY KEY (id)
+);
+CREATE INDEX ix_sharedworkspace_user_id ON sharedworkspace (user_id);
+CREATE TABLE sharedwidget (
+	id INTEGER NOT NULL, 
+	user_id VARCHAR NOT NULL, 
+	name VARCHAR NOT NULL, 
+	description VARCHAR, 
+	config_json VARCHAR NOT NULL, 
+	is_public BOOLEAN NOT NULL, 
+	likes_count INTEGER NOT NULL, 
+	created_at DATETIME NOT NULL, 
+	PRIMARY KEY (id)
+);
+CREATE INDEX ix_sharedwidget_user_id ON sharedwidget (user_id);
+CREATE TABLE invoice (
+	client_id INTEGER NOT NULL, 
+	status VARCHAR NOT NULL, 
+	amount FLOAT NOT NULL, 
+	due_date DATETIME, 
+	id INTEGER NOT NULL, 
+	user_id VARCHAR NOT NULL, 
+	created_at DATETIME NOT NULL, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(client_id) REFERENCES client (id)
+);
+CREATE INDEX ix_invoice_user_id ON invoice (user_id);
+CREATE TABLE note (
+	client_id INTEGER NOT NULL, 
+	content VARCHAR NOT NULL, 
+	id INTEGER NOT NULL, 
+	user_id VARCHAR NOT NULL, 
+	created_at DATETIME NOT NULL, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(client_id) REFERENCES client (id)
+);
+CREATE INDEX ix_note_user_id ON note (user_id);
+CREATE TABLE invoiceitem (
+	invoice_id INTEGER NOT NULL, 
+	description VARCHAR NOT NULL, 
+	quantity INTEGER NOT NULL, 
+	price FLOAT NOT NULL, 
+	id INTEGER NOT NULL, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(invoice_id) REFERENCES invoice (id)
+);
@@ -0,0 +1,43 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+sys.path.insert(0, APP_DIR)
+
+# The app reads its settings at import time, so these must be set first. An
+# async driver builds both engines on the one file: the app serves CRUD from
+# the async routers, and sync_app below serves the same routes from the sync ones.
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/test.db")
+os.environ.setdefault("ADMISSION_CONTROL", "false")
+# One process, so startup may migrate the fresh test database itself
+os.environ.setdefault("AUTO_MIGRATE", "true")
+# Tests claim and run background jobs themselves, see test_jobs.py
+os.environ.setdefault("JOB_WORKERS", "0")
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from main import app
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture(scope="session")
+def sync_client(client):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from main import app
+    from routers import clients, invoices, notes, marketplace
+    # The routers main.py includes when DATABASE_URL names a sync driver
+    sync_app = FastAPI(default_response_class=app.router.default_response_class)
+    for module in (clients, invoices, notes, marketplace):
+        sync_app.include_router(module.router)
+    with TestClient(sync_app) as sync_client:
+        yield sync_client
+
+@pytest.fixture(params=["sync", "async"])
+def api(request):
+    """A client for the routes that come in sync and *_async variants, once with each."""
+    return request.getfixturevalue("sync_client" if request.param == "sync" else "client")
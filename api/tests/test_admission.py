@@ -0,0 +1,80 @@
+import asyncio
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+import admission
+
+def make_app(release: asyncio.Event = None):
+    async def endpoint(request):
+        if release is not None:
+            await release.wait()
+        return PlainTextResponse("ok")
+
+    return admission.AdmissionMiddleware(Starlette(routes=[Route("/clients/", endpoint), Route("/health/db", endpoint)]))
+
+@pytest.fixture
+def admission_on(monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_CONTROL", True)
+    monkeypatch.setattr(admission, "in_flight", admission.InFlightLimiter(limit=64, max_queue=64, timeout=1))
+    return monkeypatch
+
+def client_for(app):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app, client=("203.0.113.7", 4000)), base_url="http://test")
+
+@pytest.mark.parametrize("user", [{"user_id": "u1"}, None], ids=["user", "anonymous"])
+def test_rate_limit_answers_429_with_retry_after(admission_on, user):
+    # Known users are limited by id, anyone else by client IP
+    admission_on.setattr(admission, "cached_user", lambda token: user)
+    admission_on.setattr(admission, "LIMITS", {"crud": admission.GroupLimits(
+        user=admission.TokenBuckets(rate=0.5, burst=2), ip=admission.TokenBuckets(rate=0.25, burst=2),
+    )})
+
+    async def run():
+        async with client_for(make_app()) as client:
+            statuses = [(await client.get("/clients/")).status_code for _ in range(2)]
+            limited = await client.get("/clients/")
+            # Exempt paths are never limited
+            health = await client.get("/health/db")
+        return statuses, limited, health
+
+    statuses, limited, health = asyncio.run(run())
+    assert statuses == [200, 200]
+    assert limited.status_code == 429
+    assert limited.headers["Retry-After"] == ("2" if user else "4")
+    assert health.status_code == 200
+
+def test_full_server_answers_503_with_retry_after(admission_on):
+    admission_on.setattr(admission, "in_flight", admission.InFlightLimiter(limit=1, max_queue=0, timeout=3))
+
+    async def run():
+        release = asyncio.Event()
+        async with client_for(make_app(release)) as client:
+            first = asyncio.create_task(client.get("/clients/"))
+            while admission.in_flight._semaphore._value:
+                await asyncio.sleep(0.01)
+            shed = await client.get("/clients/")
+            release.set()
+            return (await first), shed
+
+    first, shed = asyncio.run(run())
+    assert first.status_code == 200
+    assert shed.status_code == 503
+    assert shed.headers["Retry-After"] == "3"
+
+def test_buckets_are_not_split_between_workers(monkeypatch):
+    # A keep-alive client stays on one worker, so each worker allows the full quota
+    monkeypatch.setattr(admission, "ADMISSION_WORKERS", 4)
+    limits = admission._group_limits("test", "20", "40", "0.2", "2")
+    assert (limits.user.rate, limits.user.burst) == (20, 40)
+    assert (limits.ip.rate, limits.ip.burst) == (0.2, 2)
+
+def test_buckets_refill_at_the_rate():
+    buckets = admission.TokenBuckets(rate=10, burst=2)
+    assert buckets.take("u") == 0
+    assert buckets.take("u") == 0
+    assert 0 < buckets.take("u") <= 0.1
+    assert buckets.take("other") == 0
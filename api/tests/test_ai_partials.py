@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+import llm
+
+class CountingProvider(llm.LocalProvider):
+    def __init__(self):
+        self.prompts = []
+
+    async def stream(self, prompt):
+        self.prompts.append(prompt)
+        async for chunk in super().stream(prompt):
+            yield chunk
+
+@pytest.fixture
+def provider(client, monkeypatch):
+    # client runs the migrations; a fresh cache means anything reused came from the table
+    counting = CountingProvider()
+    monkeypatch.setattr(llm, "provider", counting)
+    monkeypatch.setattr(llm, "response_cache", llm.TTLCache(ttl=60))
+    return counting
+
+def test_partials_survive_the_memory_cache(provider, monkeypatch):
+    notes = [f"Call {n}: " + "discussed the roadmap " * 50 for n in range(12)]
+    asyncio.run(llm.summarize_history(notes))
+    generated = len(provider.prompts)
+    assert generated > 1
+
+    # As after a restart or on another worker: nothing in memory, no generations repeated
+    monkeypatch.setattr(llm, "response_cache", llm.TTLCache(ttl=60))
+    asyncio.run(llm.summarize_history(notes))
+    assert len(provider.prompts) == generated
+
+    # A new note only costs the chunk it lands in
+    provider.prompts.clear()
+    llm.response_cache.clear()
+    asyncio.run(llm.summarize_history(notes + ["Call 12: signed off"]))
+    assert [prompt.task for prompt in provider.prompts] == ["summary"]
+    assert "Call 12" in provider.prompts[0].get("notes")
+
+def test_map_steps_leave_global_slots_free(provider, monkeypatch):
+    monkeypatch.setattr(llm, "map_limiter", llm.ConcurrencyLimiter(limit=1))
+    monkeypatch.setattr(llm, "limiter", llm.ConcurrencyLimiter(limit=2))
+    peak = 0
+
+    async def stream(prompt):
+        nonlocal peak
+        peak = max(peak, llm.limiter.running)
+        await asyncio.sleep(0.01)
+        yield "partial "
+
+    monkeypatch.setattr(provider, "stream", stream)
+    notes = [f"Meeting {n} " + "x" * 3000 for n in range(8)]
+    asyncio.run(llm.summarize_history(notes))
+    # With one map slot, a global slot is always left for interactive generations
+    assert peak == 1
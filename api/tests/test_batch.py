@@ -0,0 +1,84 @@
+from uuid import uuid4
+
+import pytest
+from sqlmodel import Session
+
+import crud
+from database import engine
+from models import Client, ClientBatchCreate
+
+USER_ID = "mock-user-123"
+
+def keyed(count):
+    prefix = uuid4().hex[:8]
+    return [f"{prefix}-{n}" for n in range(count)]
+
+@pytest.fixture
+def client_id(api):
+    return api.post("/clients/", json={"name": "Batch owner"}).json()["id"]
+
+def batch_rows(collection, client_id, keys):
+    if collection == "clients":
+        return [{"name": f"Batch {key}", "idempotency_key": key} for key in keys]
+    if collection == "invoices":
+        return [{"client_id": client_id, "amount": float(n), "idempotency_key": key} for n, key in enumerate(keys)]
+    return [{"client_id": client_id, "content": f"Batch {key}", "idempotency_key": key} for key in keys]
+
+@pytest.mark.parametrize("collection", ["clients", "invoices", "notes"])
+def test_replayed_batch_returns_the_same_ids(api, client_id, collection):
+    rows = batch_rows(collection, client_id, keyed(3))
+    first = api.post(f"/{collection}/batch", json=rows).json()
+    assert first["created"] == 3 and len(set(first["ids"])) == 3
+
+    replay = api.post(f"/{collection}/batch", json=rows).json()
+    assert replay == {"ids": first["ids"], "created": 0}
+
+def test_repeated_key_in_one_batch_is_created_once(api):
+    key, other = keyed(2)
+    result = api.post("/clients/batch", json=[
+        {"name": "First", "idempotency_key": key},
+        {"name": "Other", "idempotency_key": other},
+        {"name": "Second", "idempotency_key": key},
+    ]).json()
+    assert result["created"] == 2
+    assert result["ids"][0] == result["ids"][2] != result["ids"][1]
+    assert api.get(f"/clients/{result['ids'][0]}").json()["name"] == "First"
+
+def test_ids_come_back_in_input_order(api):
+    known, fresh = keyed(2)
+    known_id = api.post("/clients/batch", json=[{"name": "Known", "idempotency_key": known}]).json()["ids"][0]
+    names = ["Unkeyed A", "Known", "Fresh", "Unkeyed B"]
+    result = api.post("/clients/batch", json=[
+        {"name": "Unkeyed A"},
+        {"name": "Known", "idempotency_key": known},
+        {"name": "Fresh", "idempotency_key": fresh},
+        {"name": "Unkeyed B"},
+    ]).json()
+    assert result["created"] == 3 and result["ids"][1] == known_id
+    assert [api.get(f"/clients/{row_id}").json()["name"] for row_id in result["ids"]] == names
+
+def test_oversized_batch_is_refused(api, monkeypatch):
+    monkeypatch.setattr(crud, "BATCH_MAX_ITEMS", 2)
+    response = api.post("/clients/batch", json=[{"name": f"Too many {n}"} for n in range(3)])
+    assert response.status_code == 413
+    assert api.post("/clients/batch", json=[{"name": f"Just enough {n}"} for n in range(2)]).json()["created"] == 2
+
+def test_concurrent_replay_is_picked_up_on_retry(monkeypatch):
+    keys = keyed(2)
+    items = [ClientBatchCreate(name=f"Raced {key}", idempotency_key=key) for key in keys]
+    with Session(engine) as session:
+        earlier = crud.bulk_create(session, Client, items[:1], USER_ID)
+
+    # The first lookup misses the row another request just committed, so the
+    # insert hits the unique constraint and the second pass finds it
+    lookup = crud._existing_ids
+    calls = []
+    def racing_lookup(*args):
+        calls.append(args)
+        return {} if len(calls) == 1 else lookup(*args)
+    monkeypatch.setattr(crud, "_existing_ids", racing_lookup)
+
+    with Session(engine) as session:
+        result = crud.bulk_create(session, Client, items, USER_ID)
+    assert len(calls) == 2
+    assert result.ids[0] == earlier.ids[0] and result.created == 1
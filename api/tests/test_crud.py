@@ -0,0 +1,30 @@
+def test_note_lifecycle(api):
+    client_id = api.post("/clients/", json={"name": "Globex", "email": "ap@globex.test"}).json()["id"]
+    note = api.post("/notes/", json={"client_id": client_id, "content": "Intro call"}).json()
+    assert api.get(f"/notes/{note['id']}").json()["content"] == "Intro call"
+
+    assert api.patch(f"/notes/{note['id']}", json={"content": "Intro call, follow up Friday"}).json()["content"] == "Intro call, follow up Friday"
+    assert api.delete(f"/notes/{note['id']}").status_code == 200
+    assert api.get(f"/notes/{note['id']}").status_code == 404
+
+def test_client_and_invoice_updates(api):
+    created = api.post("/clients/", json={"name": "Umbrella", "email": "ap@umbrella.test"}).json()
+    assert api.patch(f"/clients/{created['id']}", json={"notes": "Net 30"}).json() == {**created, "notes": "Net 30"}
+
+    invoice = api.post("/invoices/", json={"client_id": created["id"], "amount": 40.0}).json()
+    assert invoice["status"] == "DRAFT"
+    assert api.patch(f"/invoices/{invoice['id']}", json={"status": "SENT"}).json()["status"] == "SENT"
+    assert api.patch("/invoices/999999", json={"status": "SENT"}).status_code == 404
+
+def test_cursor_pagination_walks_every_row(api):
+    ids = {api.post("/clients/", json={"name": f"Paged {n}"}).json()["id"] for n in range(5)}
+    seen = []
+    cursor = None
+    while True:
+        response = api.get("/clients/", params={"limit": 2, **({"cursor": cursor} if cursor else {})})
+        seen += [row["id"] for row in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == sorted(seen) and len(seen) == len(set(seen))
+    assert ids <= set(seen)
@@ -0,0 +1,75 @@
+from email.utils import parsedate_to_datetime
+
+import pytest
+from sqlmodel import Session
+
+from database import engine
+from models import Client, Invoice, Note
+
+MODELS = {"clients": Client, "invoices": Invoice, "notes": Note}
+
+def revalidate(api, path, etag, **params):
+    return api.get(path, params=params, headers={"If-None-Match": etag})
+
+def test_list_reads_answer_304_until_the_collection_changes(api):
+    api.post("/clients/", json={"name": "Listed"})
+    first = api.get("/clients/")
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "private, no-cache"
+
+    assert revalidate(api, "/clients/", etag).status_code == 304
+    # Each page and filter is its own representation
+    assert revalidate(api, "/clients/", etag, limit=1).status_code == 200
+
+    api.post("/clients/", json={"name": "Listed later"})
+    changed = revalidate(api, "/clients/", etag)
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+
+@pytest.mark.parametrize("collection, body, update", [
+    ("clients", {"name": "Tagged"}, {"name": "Retagged"}),
+    ("notes", {"content": "Tagged"}, {"content": "Retagged"}),
+    ("invoices", {"amount": 12.0}, {"amount": 13.0}),
+])
+def test_item_reads_carry_etag_and_last_modified(api, collection, body, update):
+    if collection != "clients":
+        body = {**body, "client_id": api.post("/clients/", json={"name": "Owner"}).json()["id"]}
+    created = api.post(f"/{collection}/", json=body).json()
+    first = api.get(f"/{collection}/{created['id']}")
+    etag = first.headers["ETag"]
+    with Session(engine) as session:
+        updated_at = session.get(MODELS[collection], created["id"]).updated_at
+    assert parsedate_to_datetime(first.headers["Last-Modified"]).replace(tzinfo=None) == updated_at.replace(microsecond=0)
+
+    assert revalidate(api, f"/{collection}/{created['id']}", etag).status_code == 304
+
+    # Writing another row of the same collection leaves this item's tag alone
+    api.post(f"/{collection}/", json=body)
+    assert revalidate(api, f"/{collection}/{created['id']}", etag).status_code == 304
+
+    # Writing the row itself does not
+    api.patch(f"/{collection}/{created['id']}", json=update)
+    changed = revalidate(api, f"/{collection}/{created['id']}", etag)
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+
+def test_missing_and_foreign_items_are_404_whatever_the_tag(api):
+    etag = api.get("/clients/").headers["ETag"]
+    with Session(engine) as session:
+        foreign = Client(name="Someone else's", user_id="other-user")
+        session.add(foreign)
+        session.commit()
+        foreign_id = foreign.id
+
+    for path in ["/clients/999999", f"/clients/{foreign_id}"]:
+        assert revalidate(api, path, etag).status_code == 404
+        assert revalidate(api, path, "*").status_code == 404
+
+def test_expanded_invoice_reads_follow_the_line_items(api):
+    client_id = api.post("/clients/", json={"name": "Expanded"}).json()["id"]
+    invoice_id = api.post("/invoices/", json={"client_id": client_id, "amount": 5.0}).json()["id"]
+    etag = api.get(f"/invoices/{invoice_id}", params={"expand": "client"}).headers["ETag"]
+    assert revalidate(api, f"/invoices/{invoice_id}", etag, expand="client").status_code == 304
+
+    # Renaming the client changes the embedded copy but not the invoice row
+    api.patch(f"/clients/{client_id}", json={"name": "Expanded, renamed"})
+    changed = revalidate(api, f"/invoices/{invoice_id}", etag, expand="client")
+    assert changed.status_code == 200 and changed.json()["client"]["name"] == "Expanded, renamed"
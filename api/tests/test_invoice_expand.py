@@ -0,0 +1,39 @@
+from sqlmodel import Session
+
+from database import engine
+from models import InvoiceItem
+
+def add_items(invoice_id, *lines):
+    with Session(engine) as session:
+        items = [InvoiceItem(invoice_id=invoice_id, description=f"Line {n}", quantity=quantity, price=price) for n, (quantity, price) in enumerate(lines)]
+        session.add_all(items)
+        session.commit()
+        return [item.id for item in items]
+
+def test_items_total_is_derived_from_the_line_items(api):
+    client_id = api.post("/clients/", json={"name": "Initech", "email": "ap@initech.test"}).json()["id"]
+    invoice_id = api.post("/invoices/", json={"client_id": client_id, "amount": 99.0}).json()["id"]
+    item_ids = add_items(invoice_id, (2, 60.0), (1, 15.5))
+
+    invoice = api.get(f"/invoices/{invoice_id}", params={"expand": "items"}).json()
+    assert invoice["items_total"] == sum(item["quantity"] * item["price"] for item in invoice["items"]) == 135.5
+    # The stored amount, the figure the summaries total, is left alone
+    assert invoice["amount"] == 99.0
+    assert "items_total" not in api.get(f"/invoices/{invoice_id}").json()
+
+    with Session(engine) as session:
+        item = session.get(InvoiceItem, item_ids[0])
+        item.quantity, item.price = 3, 50.0
+        session.add(item)
+        session.commit()
+
+    invoice = api.get(f"/invoices/{invoice_id}", params={"expand": "items,client"}).json()
+    assert invoice["items_total"] == sum(item["quantity"] * item["price"] for item in invoice["items"]) == 165.5
+    listed = {row["id"]: row for row in api.get("/invoices/", params={"expand": "client"}).json()}
+    assert listed[invoice_id]["items_total"] == 165.5
+    assert listed[invoice_id]["amount"] == 99.0
+
+def test_invoice_without_items_totals_zero(api):
+    client_id = api.post("/clients/", json={"name": "Hooli", "email": "ap@hooli.test"}).json()["id"]
+    invoice_id = api.post("/invoices/", json={"client_id": client_id, "amount": 10.0}).json()["id"]
+    assert api.get(f"/invoices/{invoice_id}", params={"expand": "items"}).json()["items_total"] == 0.0
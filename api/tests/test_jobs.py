@@ -0,0 +1,173 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlmodel import Session, select
+
+import jobs
+from database import engine
+from jobs import JobRunner, cancel, claim_next, enqueue, job_handler
+from models import Client, Job
+
+USER_ID = "mock-user-123"
+
+@job_handler("test.echo")
+def echo(session, user_id, value):
+    return {"value": value}
+
+@job_handler("test.flaky")
+def flaky(session, user_id, status_code=None, retry_after=None):
+    if status_code is None:
+        raise RuntimeError("upstream hiccup")
+    raise HTTPException(status_code=status_code, detail="nope", headers={"Retry-After": retry_after} if retry_after else None)
+
+@job_handler("test.create_client")
+def create_client(session, user_id, name, seconds=0, done=None):
+    # Slow before writing: SQLite has one writer, so a requeue or cancel
+    # would otherwise wait for this transaction to end
+    time.sleep(seconds)
+    session.add(Client(name=name, user_id=user_id))
+    session.flush()
+    if done:
+        finished[done].set()
+    return {}
+
+finished = {}
+
+def add_job(kind, payload, **kwargs):
+    with Session(engine) as session:
+        return enqueue(session, USER_ID, kind, payload, **kwargs).id
+
+def load(job_id):
+    with Session(engine) as session:
+        return session.get(Job, job_id)
+
+def set_job(job_id, **values):
+    with Session(engine) as session:
+        job = session.get(Job, job_id)
+        for name, value in values.items():
+            setattr(job, name, value)
+        session.add(job)
+        session.commit()
+
+def run(job):
+    asyncio.run(JobRunner(workers=0)._run(job))
+
+def run_next():
+    job = claim_next()
+    assert job is not None
+    run(job)
+    return load(job.id)
+
+def client_named(name):
+    with Session(engine) as session:
+        return session.exec(select(Client).where(Client.name == name)).first()
+
+def test_claims_are_compare_and_set():
+    job_id = add_job("test.echo", {"value": 1})
+    first = claim_next()
+    assert first.id == job_id and first.attempts == 1
+    # Already running, so nobody else gets it
+    assert claim_next() is None
+
+    # Until it looks lost with its process: the new attempt owns it and the old one can't finish
+    set_job(job_id, started_at=datetime.utcnow() - timedelta(seconds=jobs.JOB_TIMEOUT + 1))
+    second = claim_next()
+    assert second.id == job_id and second.attempts == 2
+    assert jobs._finish(first, {"value": 1}) is False
+    assert jobs._finish(second, {"value": 1}) is True
+    assert load(job_id).status == "succeeded"
+
+def test_failures_retry_with_backoff_until_attempts_run_out():
+    job_id = add_job("test.flaky", {}, max_attempts=2)
+    before = datetime.utcnow()
+    job = run_next()
+    assert (job.status, job.attempts, job.error) == ("queued", 1, "RuntimeError: upstream hiccup")
+    assert job.run_after >= before + timedelta(seconds=jobs.JOB_RETRY_BASE * 0.5)
+    # Not due yet
+    assert claim_next() is None
+
+    set_job(job_id, run_after=datetime.utcnow())
+    job = run_next()
+    assert (job.status, job.attempts) == ("failed", 2)
+
+def test_retry_waits_at_least_retry_after():
+    job_id = add_job("test.flaky", {"status_code": 503, "retry_after": "30"})
+    before = datetime.utcnow()
+    job = run_next()
+    assert job.status == "queued" and job.run_after >= before + timedelta(seconds=30)
+    set_job(job_id, status="cancelled")
+
+def test_client_errors_fail_without_retrying():
+    add_job("test.flaky", {"status_code": 404}, max_attempts=3)
+    job = run_next()
+    assert (job.status, job.attempts, job.error) == ("failed", 1, "nope")
+
+def test_cancel_queued_job(client):
+    job_id = add_job("test.echo", {"value": 2})
+    cancelled = client.post(f"/jobs/{job_id}/cancel").json()
+    assert cancelled["status"] == "cancelled"
+    assert claim_next() is None
+    # Finished jobs are left as they are
+    assert client.post(f"/jobs/{job_id}/cancel").json() == cancelled
+
+def test_cancel_running_sync_job_rolls_back_its_writes():
+    job_id = add_job("test.create_client", {"name": "Cancelled mid-run"})
+    job = claim_next()
+    with Session(engine) as session:
+        cancel(session, session.get(Job, job_id))
+    run(job)
+    assert load(job_id).status == "cancelled"
+    assert client_named("Cancelled mid-run") is None
+
+@pytest.mark.parametrize("shutdown_timeout, status", [(5, "succeeded"), (0.05, "queued")])
+def test_stop_lets_running_sync_jobs_finish(monkeypatch, shutdown_timeout, status):
+    monkeypatch.setattr(jobs, "JOB_SHUTDOWN_TIMEOUT", shutdown_timeout)
+    name = f"Written during shutdown {status}"
+    finished[name] = threading.Event()
+    job_id = add_job("test.create_client", {"name": name, "seconds": 0.3, "done": name})
+
+    async def start_then_stop():
+        runner = JobRunner(workers=1)
+        runner.start()
+        while load(job_id).status != "running":
+            await asyncio.sleep(0.01)
+        await runner.stop()
+
+    asyncio.run(start_then_stop())
+    finished[name].wait(5)
+    job = load(job_id)
+    assert job.status == status
+    if status == "succeeded":
+        assert client_named(name) is not None
+    else:
+        # Handed back for the next process without using up an attempt; the
+        # thread ran on but its writes were rolled back
+        assert job.attempts == 0
+        assert client_named(name) is None
+        set_job(job_id, status="cancelled")
+
+def test_delete_client_cascades_in_a_job(api, client):
+    client_id = api.post("/clients/", json={"name": "Going away"}).json()["id"]
+    invoice_id = api.post("/invoices/", json={"client_id": client_id, "amount": 10.0}).json()["id"]
+    note_id = api.post("/notes/", json={"client_id": client_id, "content": "Last words"}).json()["id"]
+
+    response = api.delete(f"/clients/{client_id}")
+    assert response.status_code == 202
+    job = response.json()
+    assert response.headers["Location"] == f"/jobs/{job['id']}" and job["status"] == "queued"
+    # Nothing is deleted until the job runs
+    assert api.get(f"/clients/{client_id}").status_code == 200
+
+    run_next()
+    done = client.get(f"/jobs/{job['id']}").json()
+    assert done["status"] == "succeeded"
+    assert done["result"] == {"clients": 1, "invoices": 1, "invoice_items": 0, "notes": 1}
+    for path in [f"/clients/{client_id}", f"/invoices/{invoice_id}", f"/notes/{note_id}"]:
+        assert api.get(path).status_code == 404
+
+    # Missing clients are refused up front rather than queued
+    assert api.delete(f"/clients/{client_id}").status_code == 404
@@ -0,0 +1,116 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+
+import auth
+
+def make_key(kid):
+    private = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+    public = jwk.construct(pem, auth.ALGORITHM).public_key().to_dict()
+    return pem, {**public, "kid": kid}
+
+class StandInJWKS:
+    """Serves a JWKS document like Supabase does, counting fetches; status can be set to simulate an outage."""
+
+    def __init__(self):
+        self.keys = []
+        self.status = 200
+        self.fetches = 0
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stand_in.fetches += 1
+                body = json.dumps({"keys": stand_in.keys}).encode()
+                self.send_response(stand_in.status)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/auth/v1/.well-known/jwks.json"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+@pytest.fixture
+def jwks(monkeypatch):
+    stand_in = StandInJWKS()
+    monkeypatch.setattr(auth, "JWKS_URL", stand_in.url)
+    yield stand_in
+    stand_in.server.shutdown()
+
+def test_keys_are_refetched_after_the_ttl(jwks):
+    jwks.keys = [make_key("k1")[1]]
+    cache = auth.JWKSCache(ttl=0.3, min_refresh_interval=0)
+
+    async def run():
+        assert await cache.get_key("k1") is not None
+        assert await cache.get_key("k1") is not None
+        assert jwks.fetches == 1
+        await asyncio.sleep(0.4)
+        assert await cache.get_key("k1") is not None
+        assert jwks.fetches == 2
+    asyncio.run(run())
+
+def test_unknown_kid_refreshes_at_most_once_per_interval(jwks):
+    jwks.keys = [make_key("k1")[1]]
+    cache = auth.JWKSCache(ttl=60, min_refresh_interval=0.3)
+
+    async def run():
+        await cache.get_key("k1")
+        # Bogus kids right after a fetch don't trigger another one
+        assert await asyncio.gather(*[cache.get_key("bogus") for _ in range(20)]) == [None] * 20
+        assert jwks.fetches == 1
+        # A rotated key is picked up once the interval has passed
+        jwks.keys.append(make_key("k2")[1])
+        await asyncio.sleep(0.4)
+        assert await cache.get_key("k2") is not None
+        assert jwks.fetches == 2
+    asyncio.run(run())
+
+def test_outage_backs_off_and_serves_stale_keys(jwks):
+    jwks.keys = [make_key("k1")[1]]
+    cache = auth.JWKSCache(ttl=0.1, min_refresh_interval=0, failure_backoff=0.5)
+
+    async def run():
+        key = await cache.get_key("k1")
+        await asyncio.sleep(0.2)
+        jwks.status = 503
+        # One failed fetch, then every request keeps using the stale key without waiting
+        keys = await asyncio.gather(*[cache.get_key("k1") for _ in range(20)])
+        assert all(k is key for k in keys)
+        assert jwks.fetches == 2
+        assert await cache.get_key("k1") is key
+        assert jwks.fetches == 2
+        # After the backoff the next request tries again and recovers
+        jwks.status = 200
+        await asyncio.sleep(0.6)
+        assert await cache.get_key("k1") is not None
+        assert jwks.fetches == 3
+    asyncio.run(run())
+
+def test_get_current_user_verifies_against_the_jwks(jwks, monkeypatch):
+    pem, public = make_key("k1")
+    jwks.keys = [public]
+    monkeypatch.setattr(auth, "SUPABASE_URL", "https://project.supabase.co")
+    monkeypatch.setattr(auth, "jwks_cache", auth.JWKSCache())
+    monkeypatch.setattr(auth, "token_cache", auth.TokenCache())
+    token = jwt.encode({"sub": "user-1", "email": "u@example.com", "exp": int(time.time()) + 60}, pem, algorithm=auth.ALGORITHM, headers={"kid": "k1"})
+
+    async def run():
+        assert await auth.get_current_user(token) == {"user_id": "user-1", "email": "u@example.com"}
+        # Verified claims are cached, so a repeat costs neither a fetch nor a signature check
+        assert auth.token_cache.get(token) == {"user_id": "user-1", "email": "u@example.com"}
+        assert await auth.get_current_user(token) == {"user_id": "user-1", "email": "u@example.com"}
+        assert jwks.fetches == 1
+    asyncio.run(run())
@@ -0,0 +1,25 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+LIKES = 50
+
+@pytest.mark.parametrize("kind, payload", [
+    ("workspaces", {"name": "Board", "layout_json": '{"columns": 3}'}),
+    ("widgets", {"name": "Clock", "config_json": '{"tz": "UTC"}'}),
+])
+def test_concurrent_likes_are_not_lost(api, kind, payload):
+    item_id = api.post(f"/{kind}/share", json=payload).json()["id"]
+
+    # Sync handlers run in the threadpool and async ones interleave on the loop, so these overlap
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        responses = list(pool.map(lambda _: api.post(f"/{kind}/{item_id}/like"), range(LIKES)))
+
+    assert [response.status_code for response in responses] == [200] * LIKES
+    # Every like saw its own increment: no two read the same old value
+    assert sorted(response.json()["likes_count"] for response in responses) == list(range(1, LIKES + 1))
+    assert api.get(f"/{kind}/{item_id}").json()["likes_count"] == LIKES
+
+@pytest.mark.parametrize("kind", ["workspaces", "widgets"])
+def test_like_missing_item(api, kind):
+    assert api.post(f"/{kind}/999999/like").status_code == 404
@@ -0,0 +1,24 @@
+import json
+
+def test_listing_includes_layouts_on_request(api):
+    ids = [
+        api.post("/workspaces/share", json={"name": f"Board {n}", "layout_json": json.dumps({"columns": n})}).json()["id"]
+        for n in range(3)
+    ]
+
+    plain = {item["id"]: item for item in api.get("/workspaces", params={"limit": 100}).json()}
+    assert "layout_json" not in plain[ids[0]]
+
+    # One request carries everything the gallery renders, no detail fetch per item
+    listed = {item["id"]: item for item in api.get("/workspaces", params={"limit": 100, "include": "layout"}).json()}
+    for n, workspace_id in enumerate(ids):
+        detail = api.get(f"/workspaces/{workspace_id}").json()
+        assert listed[workspace_id]["layout_json"] == detail["layout_json"]
+        assert json.loads(listed[workspace_id]["layout_json"]) == {"columns": n}
+        assert listed[workspace_id]["layout_hash"] == detail["layout_hash"]
+
+def test_widget_listing_includes_configs(api):
+    widget_id = api.post("/widgets/share", json={"name": "Clock", "config_json": '{"tz": "UTC"}'}).json()["id"]
+    listed = {item["id"]: item for item in api.get("/widgets", params={"limit": 100, "include": "config"}).json()}
+    assert json.loads(listed[widget_id]["config_json"]) == {"tz": "UTC"}
+    assert api.get("/widgets", params={"include": "layout"}).status_code == 422
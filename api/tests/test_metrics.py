@@ -0,0 +1,40 @@
+import json
+import os
+import time
+
+import metrics
+
+def make_registry(directory):
+    registry = metrics.Registry(directory, flush_interval=1)
+    requests = registry.register(metrics.Counter("requests_total", "Requests", ("route",)))
+    in_flight = registry.register(metrics.Gauge("in_flight", "In flight"))
+    latency = registry.register(metrics.Histogram("latency_seconds", "Latency", buckets=(0.1, 1.0)))
+    return registry, requests, in_flight, latency
+
+def write_worker(directory, pid, samples, age=0):
+    path = os.path.join(directory, f"{pid}.json")
+    with open(path, "w") as f:
+        json.dump(samples, f)
+    os.utime(path, (time.time() - age, time.time() - age))
+
+def test_workers_are_added_up(tmp_path):
+    registry, requests, in_flight, latency = make_registry(str(tmp_path))
+    requests.inc("/clients")
+    in_flight.inc()
+    latency.observe(0.05)
+    other = {"requests_total": [[["/clients"], 2]], "in_flight": [[[], 3]], "latency_seconds": [[[], [[0, 1, 0], 0.5]]]}
+    write_worker(tmp_path, "live", other)
+    write_worker(tmp_path, "exited", other, age=60)
+
+    lines = registry.render().splitlines()
+    # Counters and histograms keep what exited workers counted, gauges only count live ones
+    assert 'requests_total{route="/clients"} 5' in lines
+    assert "in_flight 4" in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1.0"} 3' in lines
+    assert "latency_seconds_count 3" in lines
+
+def test_single_process_renders_its_own_values():
+    registry, requests, in_flight, latency = make_registry(None)
+    requests.inc("/notes", amount=2)
+    assert 'requests_total{route="/notes"} 2' in registry.render().splitlines()
@@ -0,0 +1,78 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+from conftest import APP_DIR
+
+BASELINE_SCHEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline_schema.sql")
+
+def manage(db_path, *args):
+    # A fresh process per database: the engine is bound to DATABASE_URL at import
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}")
+    return subprocess.run([sys.executable, "manage.py", *args], cwd=APP_DIR, env=env, capture_output=True, text=True)
+
+def schema(db_path):
+    with sqlite3.connect(db_path) as db:
+        tables = {
+            table: {row[1] for row in db.execute(f"PRAGMA table_info({table})")}
+            for table in ("client", "invoice", "invoiceitem", "note", "sharedworkspace", "sharedwidget")
+        }
+        indexes = {row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'ix_%'")}
+    return tables, indexes
+
+def make_baseline(db_path):
+    with sqlite3.connect(db_path) as db:
+        db.executescript(open(BASELINE_SCHEMA).read())
+        db.execute("INSERT INTO client (id, name, email, user_id, created_at) VALUES (1, 'Acme', 'a@acme.test', 'u1', '2024-03-01 10:00:00')")
+        db.execute("INSERT INTO invoice (id, client_id, status, amount, user_id, created_at) VALUES (1, 1, 'SENT', 120.0, 'u1', '2024-03-02 10:00:00')")
+        db.execute("INSERT INTO invoiceitem (id, invoice_id, description, quantity, price) VALUES (1, 1, 'Design', 2, 60.0)")
+        db.execute("INSERT INTO note (id, client_id, content, user_id, created_at) VALUES (1, 1, 'Kickoff call', 'u1', '2024-03-01 11:00:00')")
+        db.execute(
+            "INSERT INTO sharedworkspace (id, user_id, name, layout_json, is_public, likes_count, created_at) "
+            "VALUES (1, 'u1', 'Board', '{\"b\": 1, \"a\": 2}', 1, 0, '2024-03-01 12:00:00')"
+        )
+
+def test_baseline_database_upgrades_to_latest(tmp_path):
+    legacy = tmp_path / "legacy.db"
+    make_baseline(legacy)
+    result = manage(legacy, "migrate")
+    assert result.returncode == 0, result.stderr
+
+    fresh = tmp_path / "fresh.db"
+    assert manage(fresh, "migrate").returncode == 0
+    # The upgraded tables end up with the same columns and indexes as new ones
+    assert schema(legacy) == schema(fresh)
+
+    with sqlite3.connect(legacy) as db:
+        assert db.execute("SELECT updated_at FROM client").fetchone()[0] == "2024-03-01 10:00:00"
+        assert db.execute("SELECT invoice_count, total_amount FROM invoicesummary").fetchall() == [(1, 120.0)]
+        assert db.execute("SELECT kind, resource_id FROM search_index ORDER BY kind").fetchall() == [("client", 1), ("note", 1)]
+        layout_hash = db.execute("SELECT layout_hash FROM sharedworkspace").fetchone()[0]
+        assert db.execute("SELECT size FROM contentblob WHERE hash = ?", (layout_hash,)).fetchone()[0] == len('{"a":2,"b":1}')
+        # Batch replays still dedupe on the keys added to the old tables
+        db.execute("INSERT INTO note (client_id, content, user_id, idempotency_key, created_at, updated_at) VALUES (1, 'x', 'u1', 'k1', '2024-03-03', '2024-03-03')")
+        try:
+            db.execute("INSERT INTO note (client_id, content, user_id, idempotency_key, created_at, updated_at) VALUES (1, 'x', 'u1', 'k1', '2024-03-03', '2024-03-03')")
+            assert False, "duplicate idempotency key was accepted"
+        except sqlite3.IntegrityError:
+            pass
+
+def test_migrate_is_a_no_op_when_current(tmp_path):
+    db_path = tmp_path / "app.db"
+    assert manage(db_path, "migrate").returncode == 0
+    result = manage(db_path, "migrate")
+    assert result.returncode == 0
+    assert "Applied migration" not in result.stdout + result.stderr
+
+def test_startup_refuses_a_stale_schema_unless_told_to_migrate(tmp_path):
+    # Workers would race to migrate, so by default startup only checks
+    env = {name: value for name, value in os.environ.items() if name != "AUTO_MIGRATE"}
+    env["DATABASE_URL"] = f"sqlite:///{tmp_path / 'app.db'}"
+    check = [sys.executable, "-c", "from migrations import ensure_schema; print(ensure_schema())"]
+    result = subprocess.run(check, cwd=APP_DIR, env=env, capture_output=True, text=True)
+    assert result.returncode != 0 and "run `python manage.py migrate`" in result.stderr
+
+    result = subprocess.run(check, cwd=APP_DIR, env=dict(env, AUTO_MIGRATE="true"), capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert subprocess.run(check, cwd=APP_DIR, env=env, capture_output=True, text=True).returncode == 0
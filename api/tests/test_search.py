@@ -0,0 +1,24 @@
+from sqlmodel import Session
+
+from database import engine
+from models import Client
+import search
+
+def test_search_only_sees_the_callers_rows(client):
+    with Session(engine) as session:
+        # Ids that tokenize alike must still not see each other's rows
+        for user_id in ("owner-1", "owner-1-2", "owner 1"):
+            session.add(Client(name=f"Quarterly review for {user_id}", email="q@example.com", user_id=user_id))
+        session.commit()
+
+        hits = search.search_documents(session, "owner-1", "quarterly", None, 0, 20)
+        assert [hit.snippet for hit in hits] == ["Quarterly review for owner-1 q@example.com"]
+        # The owner's key is not searchable text
+        assert search.search_documents(session, "owner-1", search.user_key("owner-1"), None, 0, 20) == []
+
+def test_search_api_matches_prefixes(client):
+    client_id = client.post("/clients/", json={"name": "Northwind", "email": "nw@example.com"}).json()["id"]
+    client.post("/notes/", json={"client_id": client_id, "content": "Renewal negotiation next week"})
+    hits = client.get("/search/", params={"q": "negot"}).json()
+    assert [(hit["kind"], hit["snippet"]) for hit in hits] == [("note", "Renewal negotiation next week")]
+    assert client.get("/search/", params={"q": "negot", "kind": "client"}).json() == []
@@ -0,0 +1,90 @@
+import pytest
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from database import engine
+from models import Invoice, InvoiceSummary
+
+def from_invoices(client_ids):
+    statement = (
+        select(Invoice.client_id, Invoice.status, func.count(), func.sum(Invoice.amount))
+        .where(Invoice.client_id.in_(client_ids))
+        .group_by(Invoice.client_id, Invoice.status)
+    )
+    with Session(engine) as session:
+        return {(client_id, status): (count, pytest.approx(total)) for client_id, status, count, total in session.exec(statement)}
+
+def from_summary(client_ids):
+    # Rows emptied by updates and deletes stay behind with a zero count
+    statement = (
+        select(InvoiceSummary.client_id, InvoiceSummary.status, func.sum(InvoiceSummary.invoice_count), func.sum(InvoiceSummary.total_amount))
+        .where(InvoiceSummary.client_id.in_(client_ids), InvoiceSummary.invoice_count > 0)
+        .group_by(InvoiceSummary.client_id, InvoiceSummary.status)
+    )
+    with Session(engine) as session:
+        return {(client_id, status): (count, total) for client_id, status, count, total in session.exec(statement)}
+
+def assert_in_step(api, client_ids):
+    expected = from_invoices(client_ids)
+    assert from_summary(client_ids) == expected
+
+    by_client = {row["client_id"]: row for row in api.get("/invoices/summary").json()["by_client"]}
+    for client_id in client_ids:
+        rows = {status: totals for (owner, status), totals in expected.items() if owner == client_id}
+        if not rows:
+            assert client_id not in by_client
+            continue
+        assert by_client[client_id]["invoice_count"] == sum(count for count, _ in rows.values())
+        assert by_client[client_id]["total_amount"] == pytest.approx(sum(total.expected for _, total in rows.values()))
+        assert by_client[client_id]["outstanding_amount"] == pytest.approx(
+            sum(total.expected for status, (_, total) in rows.items() if status != "PAID")
+        )
+
+def move_invoice(invoice_id, client_id):
+    # Invoices can't be moved through the API; the summaries follow ORM writes all the same
+    with Session(engine) as session:
+        invoice = session.get(Invoice, invoice_id)
+        invoice.client_id = client_id
+        session.add(invoice)
+        session.commit()
+
+def test_summary_follows_every_invoice_write(api):
+    first, second = [api.post("/clients/", json={"name": name}).json()["id"] for name in ("Summed", "Summed too")]
+    clients = [first, second]
+
+    ids = [api.post("/invoices/", json={"client_id": first, "amount": amount}).json()["id"] for amount in (100.0, 250.0, 40.0)]
+    assert_in_step(api, clients)
+
+    api.patch(f"/invoices/{ids[0]}", json={"status": "PAID"})
+    api.patch(f"/invoices/{ids[1]}", json={"amount": 275.5})
+    assert_in_step(api, clients)
+
+    move_invoice(ids[2], second)
+    assert_in_step(api, clients)
+
+    api.delete(f"/invoices/{ids[1]}")
+    assert_in_step(api, clients)
+
+    api.post("/invoices/batch", json=[
+        {"client_id": second, "amount": 10.0},
+        {"client_id": second, "amount": 12.5, "status": "PAID"},
+        {"client_id": first, "amount": 7.0},
+    ])
+    assert_in_step(api, clients)
+
+    api.delete(f"/invoices/{ids[0]}")
+    assert_in_step(api, clients)
+
+def test_summary_totals(api):
+    client_id = api.post("/clients/", json={"name": "Totalled"}).json()["id"]
+    before = api.get("/invoices/summary").json()
+    api.post("/invoices/batch", json=[
+        {"client_id": client_id, "amount": 30.0, "status": "PAID"},
+        {"client_id": client_id, "amount": 20.0},
+    ])
+    after = api.get("/invoices/summary").json()
+    assert after["invoice_count"] == before["invoice_count"] + 2
+    assert after["total_amount"] == pytest.approx(before["total_amount"] + 50.0)
+    assert after["outstanding_amount"] == pytest.approx(before["outstanding_amount"] + 20.0)
+    assert sum(row["invoice_count"] for row in after["by_status"]) == after["invoice_count"]
+    assert sum(row["invoice_count"] for row in after["by_month"]) == after["invoice_count"]
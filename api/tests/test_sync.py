@@ -0,0 +1,55 @@
+from sqlalchemy import delete, insert, select
+from sqlmodel import Session
+
+from database import engine
+from models import ChangeLog
+from routers import sync
+
+def sync_all(client, since=None):
+    """Follow has_more to the end; returns every page and the final token."""
+    pages = []
+    while True:
+        page = client.get("/sync/changes", params={"since": since} if since else {}).json()
+        pages.append(page)
+        since = page["next_token"]
+        if not page["has_more"]:
+            return pages, since
+
+def test_first_sync_is_paged(client, monkeypatch):
+    created = {client.post("/clients/", json={"name": f"Client {n}", "email": f"c{n}@example.com"}).json()["id"] for n in range(7)}
+    monkeypatch.setattr(sync, "SYNC_PAGE_SIZE", 3)
+    monkeypatch.setattr(sync, "SYNC_RESCAN_WINDOW", 0)
+
+    pages, token = sync_all(client)
+    sent = [row["id"] for page in pages for row in page["clients"]["upserted"]]
+    assert all(sum(len(page[name]["upserted"]) for name in ("clients", "invoices", "invoice_items", "notes")) <= 3 for page in pages)
+    assert len(sent) == len(set(sent)) and created <= set(sent)
+
+    # The snapshot hands over to the change log: only what came after it follows
+    new_id = client.post("/clients/", json={"name": "Later", "email": "later@example.com"}).json()["id"]
+    pages, _ = sync_all(client, token)
+    assert [row["id"] for page in pages for row in page["clients"]["upserted"]] == [new_id]
+
+def test_late_commit_below_the_token_is_not_skipped(client):
+    _, token = sync_all(client)
+    late_id = client.post("/clients/", json={"name": "Slow", "email": "slow@example.com"}).json()["id"]
+    other_id = client.post("/clients/", json={"name": "Fast", "email": "fast@example.com"}).json()["id"]
+    with Session(engine) as session:
+        # Hide the first entry, as if its transaction were still open while the second commits and syncs
+        entry = session.exec(select(ChangeLog).where(ChangeLog.resource == "clients", ChangeLog.resource_id == late_id)).one()[0]
+        row = entry.model_dump()
+        session.exec(delete(ChangeLog).where(ChangeLog.id == entry.id))
+        session.commit()
+    pages, token = sync_all(client, token)
+    sent = [row["id"] for page in pages for row in page["clients"]["upserted"]]
+    assert other_id in sent and late_id not in sent
+
+    with Session(engine) as session:
+        session.exec(insert(ChangeLog).values(row))
+        session.commit()
+    pages, _ = sync_all(client, token)
+    assert late_id in [row["id"] for page in pages for row in page["clients"]["upserted"]]
+
+def test_expired_token_is_rejected(client):
+    assert client.get("/sync/changes", params={"since": sync.encode_token({"id": 1, "at": 0})}).status_code == 410
+    assert client.get("/sync/changes", params={"since": "not-a-token"}).status_code == 400
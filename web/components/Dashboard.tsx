@@ -458,9 +458,9 @@ function RevenueWidget({ template }: { template: Template }) {
     const [loading, setLoading] = useState(true);
 
     useEffect(() => {
-        api.get('/invoices').then(res => {
-            const total = res.data.reduce((acc: number, inv: any) => acc + (inv.status === 'PAID' ? inv.amount : 0), 0);
-            setStats({ total, count: res.data.length });
+        api.get('/invoices/summary').then(res => {
+            const paid = res.data.by_status.find((row: any) => row.status === 'PAID');
+            setStats({ total: paid?.total_amount ?? 0, count: res.data.invoice_count });
             setLoading(false);
         }).catch(() => setLoading(false));
     }, []);
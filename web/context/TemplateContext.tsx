@@ -76,7 +76,8 @@ export function TemplateProvider({ children }: { children: React.ReactNode }) {
 
     const fetchMarketplace = useCallback(async () => {
         try {
-            const res = await api.get("/marketplace/workspaces");
+            // include=layout returns each layout with the listing, so the gallery needs one request
+            const res = await api.get("/workspaces", { params: { sort: "likes", include: "layout" } });
             // Map SharedWorkspace from backend to frontend Template type
             const mapped: Template[] = res.data.map((sw: any) => {
                 const layout = JSON.parse(sw.layout_json);
@@ -174,7 +175,7 @@ export function TemplateProvider({ children }: { children: React.ReactNode }) {
                 layout_json: JSON.stringify(template),
                 is_public: true
             };
-            await api.post("/marketplace/workspaces/share", payload);
+            await api.post("/workspaces/share", payload);
             fetchMarketplace(); // Refresh list
             alert("Workspace shared with the community!");
         } catch (e) {
@@ -188,7 +189,7 @@ export function TemplateProvider({ children }: { children: React.ReactNode }) {
         if (!template || !('realId' in template)) return;
 
         try {
-            const res = await api.post(`/marketplace/workspaces/${(template as any).realId}/like`);
+            const res = await api.post(`/workspaces/${(template as any).realId}/like`);
             setMarketplaceWorkspaces(prev => prev.map(t =>
                 t.id === id ? { ...t, likesCount: res.data.likes_count } : t
             ));
@@ -10,13 +10,28 @@ const api = axios.create({
     },
 });
 
+// Commit time of our latest write. Sent back on every request so reads that
+// follow it skip lagging read replicas, whichever API worker serves them.
+let lastWrite: string | null = null;
+
 api.interceptors.request.use(async (config) => {
     const { data: { session } } = await supabase.auth.getSession();
     if (session?.access_token) {
         config.headers.Authorization = `Bearer ${session.access_token}`;
     }
+    if (lastWrite) {
+        config.headers['X-Last-Write'] = lastWrite;
+    }
     return config;
 });
 
+api.interceptors.response.use((response) => {
+    const wroteAt = response.headers['x-last-write'];
+    if (wroteAt) {
+        lastWrite = wroteAt;
+    }
+    return response;
+});
+
 export default api;
 
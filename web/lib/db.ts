@@ -6,6 +6,7 @@ export interface LocalNote {
     client_id: number;
     created_at: string;
     is_synced: number; // 0 for unsynced, 1 for synced
+    sync_key?: string; // Idempotency key sent with batch sync so replays don't duplicate
 }
 
 export interface LocalClient {
@@ -15,6 +16,7 @@ export interface LocalClient {
     user_id: string;
     created_at: string;
     is_synced: number;
+    sync_key?: string; // Idempotency key sent with batch sync so replays don't duplicate
 }
 
 export interface LocalInvoice {
@@ -25,6 +27,7 @@ export interface LocalInvoice {
     due_date?: string;
     created_at: string;
     is_synced: number;
+    sync_key?: string; // Idempotency key sent with batch sync so replays don't duplicate
 }
 
 export interface LocalTask {
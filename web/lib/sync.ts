@@ -1,34 +1,51 @@
+import type { Table } from 'dexie';
 import { db } from './db';
 import api from './api';
 
-export async function syncNotes() {
-    const unsynced = await db.notes.where('is_synced').equals(0).toArray();
-    for (const item of unsynced) {
+// Server-side cap is 1000 records per /batch request
+const BATCH_SIZE = 500;
+
+// Replays an offline queue through the resource's /batch endpoint, one request per chunk.
+// Each record gets a stable sync_key first, so a retried batch is deduplicated server-side.
+async function syncBatch<T extends { id?: number; sync_key?: string }>(
+    table: Table<T>,
+    unsynced: T[],
+    endpoint: string,
+    toPayload: (item: T) => Record<string, unknown>
+) {
+    for (let start = 0; start < unsynced.length; start += BATCH_SIZE) {
+        const chunk = unsynced.slice(start, start + BATCH_SIZE);
         try {
-            const res = await api.post('/notes/', { content: item.content, client_id: item.client_id });
-            await db.notes.update(item.id!, { id: res.data.id, is_synced: 1 });
+            for (const item of chunk) {
+                if (!item.sync_key) {
+                    item.sync_key = crypto.randomUUID();
+                    await table.update(item.id!, { sync_key: item.sync_key } as any);
+                }
+            }
+            const res = await api.post(endpoint, chunk.map(item => ({ ...toPayload(item), idempotency_key: item.sync_key })));
+            const ids: number[] = res.data.ids;
+            await db.transaction('rw', table, async () => {
+                for (let i = 0; i < chunk.length; i++) {
+                    await table.update(chunk[i].id!, { id: ids[i], is_synced: 1 } as any);
+                }
+            });
         } catch (e) { console.error('Sync failed', e); }
     }
 }
 
+export async function syncNotes() {
+    const unsynced = await db.notes.where('is_synced').equals(0).toArray();
+    await syncBatch(db.notes, unsynced, '/notes/batch', item => ({ content: item.content, client_id: item.client_id }));
+}
+
 export async function syncClients() {
     const unsynced = await db.clients.where('is_synced').equals(0).toArray();
-    for (const item of unsynced) {
-        try {
-            const res = await api.post('/clients/', { name: item.name, email: item.email });
-            await db.clients.update(item.id!, { id: res.data.id, is_synced: 1 });
-        } catch (e) { console.error('Sync failed', e); }
-    }
+    await syncBatch(db.clients, unsynced, '/clients/batch', item => ({ name: item.name, email: item.email }));
 }
 
 export async function syncInvoices() {
     const unsynced = await db.invoices.where('is_synced').equals(0).toArray();
-    for (const item of unsynced) {
-        try {
-            const res = await api.post('/invoices/', { client_id: item.client_id, amount: item.amount, status: item.status });
-            await db.invoices.update(item.id!, { id: res.data.id, is_synced: 1 });
-        } catch (e) { console.error('Sync failed', e); }
-    }
+    await syncBatch(db.invoices, unsynced, '/invoices/batch', item => ({ client_id: item.client_id, amount: item.amount, status: item.status }));
 }
 
 export async function syncTasks() {